@@ -0,0 +1,40 @@
+# time of the rest/push loop over an array, run on the vm
+#   python -m benchmarks.array_builtins -n 50000
+import argparse
+import time
+
+from compiler.compiler import Compiler
+from compiler.vm import VM
+from lexer.lexer import Lexer
+from parser.parser import Parser
+
+SOURCE = """
+let map = function(arr, acc) {
+    if (len(arr) == 0) { return acc; }
+    map(rest(arr), push(acc, first(arr) * 2))
+};
+let build = function(n, acc) {
+    if (n == 0) { return acc; }
+    build(n - 1, push(acc, n))
+};
+len(map(build(%d, []), []));
+"""
+
+
+def run(n: int) -> float:
+    compiler = Compiler()
+    compiler.compile(Parser(Lexer(SOURCE % n)).parse_program())
+    vm = VM(compiler.bytecodes())
+    start = time.perf_counter()
+    vm.run()
+    elapsed = time.perf_counter() - start
+    assert vm.last_pop().value == n
+    return elapsed
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="time building and mapping an array with push and rest")
+    arg_parser.add_argument("-n", type=int, default=50_000)
+    args = arg_parser.parse_args()
+    print(f"n={args.n}: {run(args.n):.2f}s")
@@ -0,0 +1,44 @@
+# bytes per ast node kept by a parsed program
+#   python -m benchmarks.ast_memory -n 20000
+import argparse
+import gc
+import tracemalloc
+
+from benchmarks.lexer import CHUNK
+from eval.modify import modify
+from lexer.lexer import Lexer
+from parser.parser import Parser
+
+
+def count_nodes(program) -> int:
+    count = 0
+
+    def visit(node):
+        nonlocal count
+        if node is not None:
+            count += 1
+        return node
+    modify(program, visit)
+    return count
+
+
+def measure(n: int):
+    source = "".join(CHUNK % ((i,) * 6) for i in range(n))
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    program = Parser(Lexer(source)).parse_program()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size, count_nodes(program)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="memory kept by the ast of a generated program")
+    arg_parser.add_argument("-n", type=int, default=20_000,
+                            help="number of generated code chunks")
+    args = arg_parser.parse_args()
+    size, nodes = measure(args.n)
+    print(f"{nodes} nodes, {size / 1024 / 1024:.1f} MB, {size / nodes:.1f} bytes per node")
@@ -0,0 +1,55 @@
+# ycEval against closureEval on evaluator style programs
+#   python -m benchmarks.closure_eval
+import argparse
+import time
+
+from eval.closure_eval import closureEval
+from eval.env import Environment
+from eval.eval import ycEval
+from lexer.lexer import Lexer
+from parser.parser import Parser
+
+PROGRAMS = {
+    "fib": """
+let fib = function(n) { if (n < 2) { return n; }; fib(n - 1) + fib(n - 2) };
+fib(20);
+""",
+    "map": """
+let map = function(arr, f, acc) {
+    if (len(arr) == 0) { acc } else { map(rest(arr), f, push(acc, f(first(arr)))) }
+};
+let sum = function(arr, acc) { if (len(arr) == 0) { acc } else { sum(rest(arr), acc + first(arr)) } };
+let loop = function(n, acc) { if (n == 0) { acc } else { loop(n - 1, acc + sum(map([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], function(x) { x * 2 + 1 }, []), 0)) } };
+loop(50, 0);
+""",
+    "nested": """
+let make = function(a) { function(b) { function(c) {
+    let loop = function(n, acc) { if (n == 0) { acc } else { loop(n - 1, acc + a + b + c + n) } };
+    loop(80, 0) + loop(80, 0) + loop(80, 0)
+} } };
+make(1)(2)(3);
+""",
+    "hash": """
+let h = {"a": 1, "b": 2, "c": 3};
+let loop = function(n, acc) { if (n == 0) { acc } else { loop(n - 1, acc + h["a"] + h["c"]) } };
+loop(50, 0) + loop(50, 0);
+""",
+}
+
+
+def timed(evaluate, program, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        evaluate(program, Environment())
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="compare ycEval and closureEval")
+    arg_parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    for name, source in PROGRAMS.items():
+        program = Parser(Lexer(source)).parse_program()
+        tree = timed(ycEval, program, args.repeat)
+        closures = timed(closureEval, program, args.repeat)
+        print(f"{name:>5}: ycEval {tree:.3f}s, closureEval {closures:.3f}s, {tree / closures:.1f}x")
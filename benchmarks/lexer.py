@@ -0,0 +1,62 @@
+# tokens per second of the lexer over a generated source file
+#   python -m benchmarks.lexer --size-mb 10
+#   python -m benchmarks.lexer --stream   (StreamLexer reading the file)
+import argparse
+import os
+import tempfile
+import time
+
+from lexer.lexer import Lexer
+from lexer.stream import StreamLexer
+from lexer.token import TokenTypes
+
+CHUNK = """
+let add_%d = function(x, y) { x + y * %d };
+let table_%d = {"name": "row %d", "values": [1, 22, 333, 4444], "ok": true};
+if (add_%d(10, 20) >= 5 == !false) { table_%d["values"][2] } else { -1 };
+"""
+
+
+def write_source(path: str, size: int):
+    with open(path, "w") as file:
+        written = 0
+        n = 0
+        while written < size:
+            written += file.write(CHUNK % ((n,) * 6))
+            n += 1
+
+
+def lex(lexer):
+    count = 0
+    start = time.perf_counter()
+    while lexer.next_token().TokenType != TokenTypes.EOF:
+        count += 1
+    return count, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="tokens per second of the lexer")
+    arg_parser.add_argument("--size-mb", type=float, default=10)
+    arg_parser.add_argument("--file", help="lex this file instead of a generated one")
+    arg_parser.add_argument("--stream", action="store_true",
+                            help="lex the file with StreamLexer instead of reading it first")
+    args = arg_parser.parse_args()
+    if args.file:
+        path = args.file
+    else:
+        fd, path = tempfile.mkstemp(suffix=".yc")
+        os.close(fd)
+        write_source(path, int(args.size_mb * 1024 * 1024))
+    try:
+        size = os.path.getsize(path)
+        if args.stream:
+            count, elapsed = lex(StreamLexer(path))
+        else:
+            with open(path) as file:
+                count, elapsed = lex(Lexer(file.read()))
+    finally:
+        if not args.file:
+            os.remove(path)
+    print(f"{size / 1024 / 1024:.1f} MB, {count} tokens in {elapsed:.2f}s, "
+          f"{count / elapsed:,.0f} tokens/s")
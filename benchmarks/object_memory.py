@@ -0,0 +1,33 @@
+# bytes per element of a large Array of Integer, with the __slots__ object
+# model of eval/object.py and with the former __dict__ based Integer.
+#   python -m benchmarks.object_memory -n 1000000
+import argparse
+import tracemalloc
+
+from eval.object import Array, Integer
+
+
+class DictInteger:
+    # Integer as it was before __slots__: one __dict__ per instance
+    def __init__(self, value: int):
+        self.value = value
+
+
+def bytes_per_element(integer_class, n: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    # values above the small int cache, every element is its own object
+    array = Array([integer_class(1000 + i) for i in range(n)])
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(array.elements) == n
+    return (after - before) / n
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="memory used per element by an Array of Integer")
+    arg_parser.add_argument("-n", type=int, default=1_000_000)
+    args = arg_parser.parse_args()
+    for name, integer_class in (("__dict__", DictInteger), ("__slots__", Integer)):
+        print(f"{name:>10}: {bytes_per_element(integer_class, args.n):6.1f} bytes per element")
@@ -0,0 +1,41 @@
+# cost of building a VM for a small program: time per VM() and the memory
+# a VM holds before it runs anything
+#   python -m benchmarks.vm_startup -n 2000
+import argparse
+import time
+import tracemalloc
+
+from compiler.compiler import Compiler
+from compiler.vm import VM
+from lexer.lexer import Lexer
+from parser.parser import Parser
+
+CODE = 'let total = function(a, b) { a + b }; let x = 1; let y = 2; total(x, y)'
+
+
+def construct(bytecode, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        VM(bytecode)
+    return (time.perf_counter() - start) / n
+
+
+def held_memory(bytecode) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    vm = VM(bytecode)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del vm
+    return size
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="cost of VM construction")
+    arg_parser.add_argument("-n", type=int, default=2000, help="number of VMs built")
+    args = arg_parser.parse_args()
+    compiler = Compiler()
+    compiler.compile(Parser(Lexer(CODE)).parse_program())
+    bytecode = compiler.bytecodes()
+    print(f"{construct(bytecode, args.n) * 1e6:.1f} us per VM(), "
+          f"{held_memory(bytecode) / 1024:.1f} KB held before running")
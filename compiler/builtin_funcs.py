@@ -8,9 +8,9 @@ def builtin_len(stringObj: Optional[String] = None):
     if stringObj is None:
         return Error("No string provided")
     if isinstance(stringObj, Array):
-        return Integer(len(stringObj.elements))
+        return make_integer(len(stringObj.elements))
     try:
-        return Integer(len(stringObj.value))
+        return make_integer(len(stringObj.value))
     except Exception as e:
         return Error(str(e))
 
@@ -21,7 +21,7 @@ def builtin_first(arrayObj: Optional[Array] = None):
     if not isinstance(arrayObj, Array):
         return Error("Not an array")
     if len(arrayObj.elements) == 0:
-        return Null()
+        return NULL
     return arrayObj.elements[0]
 
 
@@ -31,7 +31,7 @@ def builtin_last(arrayObj: Optional[Array] = None):
     if not isinstance(arrayObj, Array):
         return Error("Not an array")
     if len(arrayObj.elements) == 0:
-        return Null()
+        return NULL
     return arrayObj.elements[-1]
 
 
@@ -41,8 +41,8 @@ def builtin_rest(arrayObj: Optional[Array] = None):
     if not isinstance(arrayObj, Array):
         return Error("Not an array")
     if len(arrayObj.elements) == 0:
-        return Null()
-    return Array(arrayObj.elements[1:])
+        return NULL
+    return Array(arrayObj.elements.rest())
 
 
 def builtin_push(arrayObj: Optional[Array] = None, value: Optional[ycObject] = None):
@@ -52,17 +52,14 @@ def builtin_push(arrayObj: Optional[Array] = None, value: Optional[ycObject] = N
         return Error("Not an array")
     if value is None:
         return Error("No value provided")
-    newarray = Array(arrayObj.elements.copy())
-
-    newarray.elements.append(value)
-    return newarray
+    return Array(arrayObj.elements.append(value))
 
 
 def builtin_print(value: Optional[ycObject] = None):
     if value is None:
         return Error("No value provided")
     print(value.inspect())
-    return Null()
+    return NULL
 
 
 BuiltinFunction = [
@@ -77,6 +74,8 @@ BuiltinFunction = [
 
 
 class BuiltinWrapper:
+    __slots__ = ("name", "func")
+
     def __init__(self, name, func):
         self.name = name
         self.func = func
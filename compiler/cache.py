@@ -0,0 +1,152 @@
+import hashlib
+import importlib
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Optional
+
+from compiler.code import OPCODE_TABLE_HASH
+from compiler.compiler import Bytecode, Compiler
+from compiler.optimizer import optimize_bytecode
+from compiler.superinstruction import fuse_bytecode
+from eval.env import Environment
+from eval.macro import expand_macro, handle_macro
+from lexer.lexer import Lexer
+from parser.node import Program
+from parser.parser import ParseException, Parser
+
+# on disk cache of the front end's work, like __pycache__: the compiled
+# bytecode of a script, or its macro expanded ast for the evaluators.
+# an entry is a pickle file named after the sha256 of the source and what
+# it holds, in a __yccache__ directory next to the script
+#
+#   bytecode = cached_bytecode(source, cache_directory(path))
+#   vm = VM(bytecode)
+#
+# every entry starts with CACHE_MAGIC, OPCODE_TABLE_HASH and
+# FRONT_END_HASH. an entry written by a build with a different opcode table,
+# cache layout or front end (a change to the lexer, parser, macros, compiler
+# or optimizer) is a miss and gets overwritten. the cache directory is
+# trusted the way __pycache__ is, entries are unpickled
+
+CACHE_DIRECTORY = "__yccache__"
+# bump when the pickled objects change shape (ast nodes, ycObjects, Bytecode)
+CACHE_MAGIC = b"yccache3"
+
+# the modules whose code decides what goes into an entry
+FRONT_END_MODULES = (
+    "lexer.lexer", "lexer.token", "parser.node", "parser.parser", "parser.trampoline",
+    "eval.eval", "eval.macro", "eval.modify",
+    "compiler.code", "compiler.make", "compiler.symtable", "compiler.compiler",
+    "compiler.optimizer", "compiler.superinstruction",
+)
+
+
+def front_end_hash() -> str:
+    # sha256 of the front end's source files, any edit to them is a new
+    # build as far as the cache is concerned
+    digest = hashlib.sha256()
+    for name in FRONT_END_MODULES:
+        digest.update(name.encode())
+        try:
+            with open(importlib.import_module(name).__file__, "rb") as file:
+                digest.update(file.read())
+        except (OSError, TypeError):
+            # no source next to the module, its name stands in
+            pass
+    return digest.hexdigest()
+
+
+FRONT_END_HASH = front_end_hash()
+
+
+def cache_directory(script_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(script_path)), CACHE_DIRECTORY)
+
+
+def source_key(source: str, kind: str) -> str:
+    return f"{hashlib.sha256(source.encode()).hexdigest()}.{kind}"
+
+
+def load(directory: str, key: str) -> Optional[Any]:
+    # the cached object, None on a miss, a stale entry or a broken file.
+    # a corrupt pickle fails in many ways (KeyError, OverflowError,
+    # MemoryError for a huge length...), all of them are a miss
+    try:
+        with open(os.path.join(directory, key), "rb") as file:
+            magic, table_hash, front_end, payload = pickle.load(file)
+    except Exception:
+        return None
+    if magic != CACHE_MAGIC or table_hash != OPCODE_TABLE_HASH or front_end != FRONT_END_HASH:
+        return None
+    return payload
+
+
+def store(directory: str, key: str, payload: Any) -> bool:
+    # written to a temporary file and renamed, so a reader sees the old
+    # entry or the whole new one. False when the entry can't be written,
+    # the cache is only ever an optimization
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix=key, suffix=".tmp")
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump((CACHE_MAGIC, OPCODE_TABLE_HASH, FRONT_END_HASH, payload), file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, os.path.join(directory, key))
+        return True
+    except (OSError, RecursionError, pickle.PicklingError):
+        # an ast nested deeper than pickle can recurse is not cached
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        return False
+
+
+def cached(source: str, kind: str, build: Callable[[str], Any], directory: Optional[str]) -> Any:
+    # build(source) once, later calls with the same source load the result.
+    # no directory, no cache
+    if directory is None:
+        return build(source)
+    key = source_key(source, kind)
+    payload = load(directory, key)
+    if payload is None:
+        payload = build(source)
+        store(directory, key, payload)
+    return payload
+
+
+def parse_source(source: str) -> Program:
+    parser = Parser(Lexer(source))
+    program = parser.parse_program()
+    if parser.errors:
+        # programs with errors are never cached. the exception carries every
+        # error, one per line
+        raise ParseException("\n".join(str(error) for error in parser.errors))
+    return program
+
+
+def compile_source(source: str) -> Bytecode:
+    compiler = Compiler()
+    compiler.compile(parse_source(source))
+    return fuse_bytecode(optimize_bytecode(compiler.bytecodes()))
+
+
+def expand_source(source: str) -> Program:
+    # the macros are expanded in a throwaway environment, the result needs
+    # none of them any more
+    program = parse_source(source)
+    env = Environment()
+    handle_macro(program, env)
+    return expand_macro(program, env)
+
+
+def cached_bytecode(source: str, directory: Optional[str]) -> Bytecode:
+    return cached(source, "bytecode", compile_source, directory)
+
+
+def cached_program(source: str, directory: Optional[str]) -> Program:
+    return cached(source, "ast", expand_source, directory)
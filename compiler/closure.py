@@ -4,6 +4,8 @@ from eval.object import ObjectType, ycObject
 
 
 class Closure(ycObject):
+    __slots__ = ("compiled_function", "free_variables")
+
     def __init__(self, compiled_function: CompiledFunction, free_variables: List[ycObject]):
         self.compiled_function = compiled_function
         self.free_variables = free_variables
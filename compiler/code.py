@@ -1,3 +1,4 @@
+import hashlib
 from enum import Enum
 from typing import Dict, List, TypedDict
 
@@ -32,6 +33,19 @@ class OpCode(Enum):
     GETLOCAL = 26
     LOAD_BUILTIN = 27
     GETCLOSURE = 28
+    # superinstructions, see compiler/superinstruction.py
+    GETLOCAL_GETLOCAL = 29
+    GETLOCAL_CONST_ADD = 30
+    GETLOCAL_CONST_SUB = 31
+    GT_JUMP_IF_NOT_TRUE = 32
+    EQ_JUMP_IF_NOT_TRUE = 33
+    GETLOCAL_GETLOCAL_GT_JUMP_IF_NOT_TRUE = 34
+    GETLOCAL_CONST_GT_JUMP_IF_NOT_TRUE = 35
+    CONST_GETLOCAL_GT_JUMP_IF_NOT_TRUE = 36
+    # prefix carrying the high bits of the next instruction's argument
+    EXTENDED_ARG = 37
+    # CALL whose result is returned right away, the callee reuses the frame
+    TAIL_CALL = 38
 
     @property
     def bytes(self):
@@ -73,5 +87,41 @@ OpCodeInfo: Dict[OpCode, OpcodeInfoPair] = {
     OpCode.GETLOCAL: {"name": "GETLOCAL", "args_length": [2]},
     OpCode.LOAD_BUILTIN: {"name": "LOAD_BUILTIN", "args_length": [1]},
     OpCode.GETCLOSURE: {"name": "GETCLOSURE", "args_length": [2,1]},
+    # superinstructions take the arguments of the instructions they replace
+    OpCode.GETLOCAL_GETLOCAL: {"name": "GETLOCAL_GETLOCAL", "args_length": [2, 2]},
+    OpCode.GETLOCAL_CONST_ADD: {"name": "GETLOCAL_CONST_ADD", "args_length": [2, 2]},
+    OpCode.GETLOCAL_CONST_SUB: {"name": "GETLOCAL_CONST_SUB", "args_length": [2, 2]},
+    OpCode.GT_JUMP_IF_NOT_TRUE: {"name": "GT_JUMP_IF_NOT_TRUE", "args_length": [2]},
+    OpCode.EQ_JUMP_IF_NOT_TRUE: {"name": "EQ_JUMP_IF_NOT_TRUE", "args_length": [2]},
+    OpCode.GETLOCAL_GETLOCAL_GT_JUMP_IF_NOT_TRUE: {"name": "GETLOCAL_GETLOCAL_GT_JUMP_IF_NOT_TRUE", "args_length": [2, 2, 2]},
+    OpCode.GETLOCAL_CONST_GT_JUMP_IF_NOT_TRUE: {"name": "GETLOCAL_CONST_GT_JUMP_IF_NOT_TRUE", "args_length": [2, 2, 2]},
+    OpCode.CONST_GETLOCAL_GT_JUMP_IF_NOT_TRUE: {"name": "CONST_GETLOCAL_GT_JUMP_IF_NOT_TRUE", "args_length": [2, 2, 2]},
+    OpCode.EXTENDED_ARG: {"name": "EXTENDED_ARG", "args_length": [2]},
+    OpCode.TAIL_CALL: {"name": "TAIL_CALL", "args_length": [1]},
     
-}
\ No newline at end of file
+}
+
+
+# opcodes whose operand is an absolute jump target (a byte offset in the raw
+# instructions), mapped to the position of that operand in args_length.
+JumpOperand: Dict[OpCode, int] = {
+    OpCode.JUMP: 0,
+    OpCode.JUMP_IF_NOT_TRUE: 0,
+    OpCode.GT_JUMP_IF_NOT_TRUE: 0,
+    OpCode.EQ_JUMP_IF_NOT_TRUE: 0,
+    OpCode.GETLOCAL_GETLOCAL_GT_JUMP_IF_NOT_TRUE: 2,
+    OpCode.GETLOCAL_CONST_GT_JUMP_IF_NOT_TRUE: 2,
+    OpCode.CONST_GETLOCAL_GT_JUMP_IF_NOT_TRUE: 2,
+}
+
+
+def opcode_table_hash() -> str:
+    # changes with any op code number, operand width or jump operand. saved
+    # bytecode (compiler/cache.py, compiler/mbc.py) records it and is only
+    # run by a build with the same table
+    table = sorted((op_code.value, info["name"], tuple(info["args_length"]), JumpOperand.get(op_code))
+                   for op_code, info in OpCodeInfo.items())
+    return hashlib.sha256(repr(table).encode()).hexdigest()
+
+
+OPCODE_TABLE_HASH = opcode_table_hash()
@@ -1,8 +1,11 @@
 from typing import List
+from compiler.make import decode
 from eval.object import ObjectType, ycObject
 
 
 class CompiledFunction(ycObject):
+    __slots__ = ("instructions", "value", "num_locals", "num_args", "_code")
+
     def __init__(self, instructions: bytes, num_locals: int = 0, num_args: int = 0):
 
         self.instructions = instructions
@@ -11,18 +14,31 @@ class CompiledFunction(ycObject):
         self.value = instructions
         self.num_locals = num_locals
         self.num_args = num_args
+        # pre-decoded instructions, built the first time the function is called
+        self._code = None
+
+    def __reduce__(self):
+        # pickled without the decoded instructions, as bytes even when they
+        # are a view of mapped .mbc data (compiler/mapped.py)
+        return (CompiledFunction, (bytes(self.instructions), self.num_locals, self.num_args))
+
+    @property
+    def code(self) -> List[int]:
+        if self._code is None:
+            self._code = decode(self.instructions)
+        return self._code
 
     def type(self) -> ObjectType:
         return ObjectType.COMPILED_FUNCTION
 
     def inspect(self):
-        return f"compiled function{self.instructions}"
+        return f"compiled function{bytes(self.instructions)}"
 
     def __eq__(self, other):
         return isinstance(other, CompiledFunction) and self.instructions == other.instructions
 
     def __str__(self):
-        return f"CompiledFunction({self.instructions})"
+        return f"CompiledFunction({bytes(self.instructions)})"
 
     @staticmethod
     def from_bytes_array(list: List[bytes]):
@@ -1,22 +1,33 @@
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from compiler.builtin_funcs import BuiltinFunction
-from compiler.code import OpCode
+from compiler.code import JumpOperand, OpCode
 from compiler.compiledfunction import CompiledFunction
 from compiler.compiler_exception import CompilerException
-from compiler.make import make, print_bytecode
+from compiler.make import assemble_instructions, make_wide, print_bytecode, unmake_wide
 from compiler.symtable import Scope, SymTable, ycSymbol
-from eval.object import Integer, String, ycObject
+from eval.object import Integer, String, make_integer, ycObject
 from lexer.token import TokenTypes
+from parser.trampoline import run
 from parser.node import ArrayExpression, BlockStatement, BooleanLiteral, CallExpression, ExpressionStatement, FunctionLiteral, HashLiteral, Identifier, IfExpression, IndexExpression, InfixExpression, IntegerLiteral, LetStatement, Node, PreFixExpression, Program, ReturnStatement, StringLiteral
 
 
+def constant_key(obj: ycObject):
+    # equal immutable constants share one slot of the constant pool,
+    # None for constants that are never shared (compiled functions)
+    if type(obj) == Integer or type(obj) == String:
+        return (type(obj), obj.value)
+    return None
+
+
 class Bytecode:
-    def __init__(self, constants: Optional[List[ycObject]] = None, instructions: Optional[List[bytes]] = None) -> None:
+    def __init__(self, constants: Optional[List[ycObject]] = None, instructions: Optional[List[bytes]] = None, num_globals: int = 0) -> None:
         self.constants: List[ycObject] = constants.copy() if constants is not None else [
         ]
         self.instructions: bytes = b''.join(
             instructions) if instructions is not None else b''
+        # the number of global symbols, the vm sizes its globals with it
+        self.num_globals = num_globals
 
     def to_string(self):
         return print_bytecode(self.instructions)
@@ -32,11 +43,15 @@ class CompileScope:
         self.previous_instruction = b''
         self.byteslen = 0
         self.symtable = symtable
+        # indices of the jump instructions whose target is already patched
+        self.jumps: List[int] = []
 
 
 class Compiler:
     def __init__(self,) -> None:
         self.constants: List[ycObject] = []
+        # constant_key -> index in self.constants
+        self.constant_index: Dict[Tuple[type, Any], int] = {}
         self.scopes = [CompileScope(SymTable())]
         self.scope_index = 0
         self.init_builtins()
@@ -47,12 +62,27 @@ class Compiler:
             self.symtable.add_builtin_symbol(obj["name"])
 
     def bytecodes(self):
-        return Bytecode(constants=self.constants, instructions=self.instructions)
+        return Bytecode(constants=self.constants, instructions=self.instructions,
+                        num_globals=len(self.scopes[0].symtable.symbols))
 
     def add_const(self, obj: ycObject):
+        key = constant_key(obj)
+        if key is not None and key in self.constant_index:
+            return self.constant_index[key]
         self.constants.append(obj)
+        if key is not None:
+            self.constant_index[key] = len(self.constants) - 1
         return len(self.constants) - 1
 
+    def index_constants(self):
+        # rebuild constant_index after self.constants was replaced, e.g. by a
+        # pool shared between repl inputs
+        self.constant_index = {}
+        for index, obj in enumerate(self.constants):
+            key = constant_key(obj)
+            if key is not None:
+                self.constant_index.setdefault(key, index)
+
     def enter_scope(self):
         self.scope_index += 1
         self.scopes.append(CompileScope(
@@ -109,30 +139,98 @@ class Compiler:
         self.scopes[self.scope_index].byteslen = byteslen
 
     def add_instruction(self, op_code: OpCode, *args):
-        self.instructions.append(make(op_code, *args))
+        self.instructions.append(make_wide(op_code, *args))
         self.last_instruction = self.instructions[-1]
         self.previous_instruction = self.instructions[-2] if len(
             self.instructions) > 1 else b''
         self.byteslen += len(self.instructions[-1])
         return len(self.instructions) - 1
 
+    def patch_jump(self, position: int):
+        # point the jump at instructions[position] to the current end
+        op_code, _, _ = unmake_wide(self.instructions[position])
+        patched = make_wide(op_code, self.byteslen)
+        self.current_scope.jumps.append(position)
+        if len(patched) == len(self.instructions[position]):
+            self.instructions[position] = patched
+        else:
+            self.relayout(position)
+
+    def relayout(self, position: int):
+        # the jump at position needs an EXTENDED_ARG prefix to reach the end.
+        # that moves every instruction after it, so the scope is encoded again
+        # with the jump targets turned into instruction indices
+        index_of_offset = {}
+        offset = 0
+        for index, ins in enumerate(self.instructions):
+            index_of_offset[offset] = index
+            offset += len(ins)
+        index_of_offset[offset] = len(self.instructions)
+        instructions = []
+        for index, ins in enumerate(self.instructions):
+            op_code, args, _ = unmake_wide(ins)
+            if op_code in JumpOperand:
+                if index == position:
+                    args[JumpOperand[op_code]] = len(self.instructions)
+                elif index in self.current_scope.jumps:
+                    args[JumpOperand[op_code]] = index_of_offset[args[JumpOperand[op_code]]]
+                else:
+                    # not patched yet, any valid target will do
+                    args[JumpOperand[op_code]] = index
+            instructions.append([op_code, args])
+        self.instructions = assemble_instructions(instructions)
+        self.byteslen = sum(len(ins) for ins in self.instructions)
+        self.last_instruction = self.instructions[-1]
+        self.previous_instruction = self.instructions[-2] if len(
+            self.instructions) > 1 else b''
+
+    def mark_tail_calls(self):
+        # a CALL whose value goes straight to RETURN, directly or through
+        # JUMPs (the end of an if branch), becomes a TAIL_CALL. both take
+        # the same space, nothing moves
+        offsets = []
+        offset = 0
+        for ins in self.instructions:
+            offsets.append(offset)
+            offset += len(ins)
+        index_of_offset = {offset: index for index, offset in enumerate(offsets)}
+        decoded = [unmake_wide(ins) for ins in self.instructions]
+        for index, (op_code, args, _) in enumerate(decoded):
+            if op_code != OpCode.CALL:
+                continue
+            next_index = index + 1
+            seen = set()
+            while next_index < len(decoded) and decoded[next_index][0] == OpCode.JUMP and next_index not in seen:
+                seen.add(next_index)
+                next_index = index_of_offset.get(decoded[next_index][1][0], len(decoded))
+            if next_index < len(decoded) and decoded[next_index][0] == OpCode.RETURN:
+                self.instructions[index] = make_wide(OpCode.TAIL_CALL, *args)
+        if self.instructions:
+            self.last_instruction = self.instructions[-1]
+
     def compile(self, node: Node | None):
+        # go through the ast tree and add instructions to the bytecode.
+        # compile_node yields the compile_node of each child where it needs
+        # its instructions, run() keeps the pending parents on a stack of its
+        # own instead of the python one, deep trees compile too
+        run(self.compile_node(node))
+
+    def compile_node(self, node: Node | None):
         try:
-            # go through the ast tree and add instructions to the bytecode
             if type(node) == Program:
                 for statement in node.statements:
-                    self.compile(statement)
+                    yield self.compile_node(statement)
             elif type(node) == ExpressionStatement:
-                self.compile(node.expression)
+                yield self.compile_node(node.expression)
                 self.add_instruction(OpCode.POP)
             elif type(node) == InfixExpression:
-                if node.token.TokenType == TokenTypes.LT:  # type:ignore
-                    self.compile(node.right)
-                    self.compile(node.left)
+                if node.operator == TokenTypes.LT:  # type:ignore
+                    yield self.compile_node(node.right)
+                    yield self.compile_node(node.left)
                 else:
-                    self.compile(node.left)
-                    self.compile(node.right)
-                match node.token.TokenType:  # type: ignore
+                    yield self.compile_node(node.left)
+                    yield self.compile_node(node.right)
+                match node.operator:  # type: ignore
                     case TokenTypes.PLUS:
                         self.add_instruction(OpCode.ADD)
                     case TokenTypes.MINUS:
@@ -150,7 +248,7 @@ class Compiler:
                     case _:
                         pass
             elif type(node) == IntegerLiteral:
-                integer_obj = Integer(value=node.value)
+                integer_obj = make_integer(node.value)
                 index = self.add_const(integer_obj)
                 self.add_instruction(OpCode.CONST, index)
             elif type(node) == StringLiteral:
@@ -160,15 +258,15 @@ class Compiler:
             elif type(node) == ArrayExpression:
                 if node.elements is not None:
                     for element in node.elements:
-                        self.compile(element)
+                        yield self.compile_node(element)
                     self.add_instruction(OpCode.ARRAY, len(node.elements))
                 else:
                     self.add_instruction(OpCode.ARRAY, 0)
             elif type(node) == HashLiteral:
                 if node.raw_keys is not None and node.raw_values is not None:
                     for k, v in zip(node.raw_keys, node.raw_values):
-                        self.compile(k)
-                        self.compile(v)
+                        yield self.compile_node(k)
+                        yield self.compile_node(v)
                     self.add_instruction(OpCode.HASH, len(node.raw_keys) * 2)
                 else:
                     self.add_instruction(OpCode.HASH, 0)
@@ -178,45 +276,49 @@ class Compiler:
                 else:
                     self.add_instruction(OpCode.FALSE)
             elif type(node) == PreFixExpression:
-                match node.token.TokenType:  # type: ignore
+                match node.operator:  # type: ignore
                     case TokenTypes.BANG:
-                        self.compile(node.right)
+                        yield self.compile_node(node.right)
                         self.add_instruction(OpCode.BANG)
                     case TokenTypes.MINUS:
-                        self.compile(node.right)
+                        yield self.compile_node(node.right)
                         self.add_instruction(OpCode.MINUS)
             elif type(node) == IfExpression:
-                self.compile(node.condition)
+                yield self.compile_node(node.condition)
                 first_jump_loc = self.add_instruction(
                     OpCode.JUMP_IF_NOT_TRUE, 9999)
-                self.compile(node.true_branch)
+                yield self.compile_node(node.true_branch)
                 if self.last_instruction[0] == OpCode.POP.bytes[0]:
                     # move the last pop sentence
                     self.instructions.pop()
                     self.byteslen -= len(self.last_instruction)
 
                 second_jump_loc = self.add_instruction(OpCode.JUMP, 999)
-                self.instructions[first_jump_loc] = make(
-                    OpCode.JUMP_IF_NOT_TRUE, self.byteslen)
+                self.patch_jump(first_jump_loc)
                 if node.false_branch is None:
                     self.add_instruction(OpCode.NULL)
                 else:
-                    self.compile(node.false_branch)
+                    yield self.compile_node(node.false_branch)
                     if self.last_instruction[0] == OpCode.POP.bytes[0]:
                         # move the last pop sentence
                         self.instructions.pop()
                         self.byteslen -= len(self.last_instruction)
 
-                self.instructions[second_jump_loc] = make(
-                    OpCode.JUMP, self.byteslen)
+                self.patch_jump(second_jump_loc)
 
             elif type(node) == BlockStatement:
                 for statement in node.statements:
-                    self.compile(statement)
+                    yield self.compile_node(statement)
             elif type(node) == LetStatement:
-                self.compile(node.right_expression)
-                sym = self.symtable.add_symbol(
-                    node.identifier.value)
+                if type(node.right_expression) == FunctionLiteral and self.symtable.outer is None:
+                    # a global function can call itself: its name is known
+                    # while its body compiles
+                    sym = self.symtable.add_symbol(node.identifier.value)
+                    yield self.compile_node(node.right_expression)
+                else:
+                    yield self.compile_node(node.right_expression)
+                    sym = self.symtable.add_symbol(
+                        node.identifier.value)
                 assert isinstance(sym, ycSymbol)
                 if sym.scope == Scope.GLOBAL:
                     self.add_instruction(OpCode.SETGLOBAL, sym.index)
@@ -245,8 +347,8 @@ class Compiler:
                     raise CompilerException(
                         f"Unknown scope {sym.scope} for symbol {sym.name}")
             elif type(node) == IndexExpression:
-                self.compile(node.left)
-                self.compile(node.index)
+                yield self.compile_node(node.left)
+                yield self.compile_node(node.index)
                 self.add_instruction(OpCode.INDEX)
             elif type(node) == FunctionLiteral:
                 self.enter_scope()
@@ -254,7 +356,7 @@ class Compiler:
                 for arg in node.parameters if node.parameters is not None else []:
                     sym = self.symtable.add_symbol(arg.value)
                     assert isinstance(sym, ycSymbol)
-                self.compile(node.body)
+                yield self.compile_node(node.body)
 
                 # handle two special cases:
                 if self.instructions == []:
@@ -264,6 +366,7 @@ class Compiler:
                     self.instructions.pop()
                     self.byteslen -= len(self.last_instruction)
                     self.add_instruction(OpCode.RETURN)
+                self.mark_tail_calls()
 
                 ins, num_locals = self.leave_scope()
 
@@ -272,18 +375,18 @@ class Compiler:
                 self.add_instruction(OpCode.CONST, len(self.constants) - 1)
             elif type(node) == ReturnStatement:
                 if node.return_value is not None:
-                    self.compile(node.return_value)
+                    yield self.compile_node(node.return_value)
                 else:
                     pass
                 self.add_instruction(OpCode.RETURN)
             elif type(node) == CallExpression:
-                self.compile(node.function)
+                yield self.compile_node(node.function)
                 # todo: for arg in node.arguments:
                 if node.parameters is not None:
                     # push the parameters to the stack
                     assert node.function is not None
                     for arg in node.parameters:  # type: ignore
-                        self.compile(arg)
+                        yield self.compile_node(arg)
                     self.add_instruction(OpCode.CALL, len(node.parameters))
                 else:
                     self.add_instruction(OpCode.CALL, 0)
@@ -1,2 +1,7 @@
 class CompilerException(Exception):
     pass
+
+
+class StackOverflowException(Exception):
+    # raised by the vm when calls nest deeper than its max_frames
+    pass
@@ -1,9 +1,12 @@
 
-from compiler.compiler import Bytecode
+from typing import List
 
 
 class Frame:
-    def __init__(self, instructions: bytes, pc=0, bp=0):
+    __slots__ = ("instructions", "pc", "bp")
+
+    # instructions are the pre-decoded form produced by make.decode
+    def __init__(self, instructions: List[int], pc=0, bp=0):
         self.instructions = instructions
         self.pc = pc
         self.bp = bp
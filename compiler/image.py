@@ -0,0 +1,112 @@
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+from typing import Union
+
+from compiler.code import OPCODE_TABLE_HASH
+from compiler.compiler_exception import CompilerException
+from compiler.pipeline import Pipeline, Snapshot
+from eval.env import Environment
+from eval.eval import ycEval
+from eval.macro import expand_macro, handle_macro
+from eval.object import ObjectType
+from lexer.lexer import Lexer
+from parser.parser import ParseException, Parser
+
+# heap images: the state left by running a prelude, saved to disk so a new
+# process starts with it without running any monkey code, like a smalltalk
+# image. two kinds of state can be saved:
+#   a Snapshot of a vm Pipeline (compiler/pipeline.py): global symbols,
+#       constant pool and global values, compiled functions included
+#   an Environment of the evaluators: every binding, functions with their
+#       ast and the environments they close over
+#
+#   python -m compiler.image prelude.monkey prelude.img [--evaluator]
+#
+#   pipeline = load_image("prelude.img").clone()     # a Snapshot
+#   env = load_image("prelude.img")                  # an Environment
+#   ycEval(program, env)
+#
+# an image is a pickle, load only images you built. one built with another
+# opcode table is refused, its functions' instructions would mean something
+# else
+
+# bump when the pickled objects change shape
+IMAGE_MAGIC = b"ycimage1"
+
+State = Union[Snapshot, Environment]
+
+
+def save_image(path: str, state: State):
+    # written to a temporary file and renamed, a process starting meanwhile
+    # loads the old image or the new one. the temporary name is unique, two
+    # processes saving the same image don't write into one file
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                     prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump((IMAGE_MAGIC, OPCODE_TABLE_HASH, state), file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def load_image(path: str) -> State:
+    with open(path, "rb") as file:
+        try:
+            magic, table_hash, state = pickle.load(file)
+        except (EOFError, ValueError, TypeError, AttributeError, ImportError, IndexError,
+                pickle.UnpicklingError) as e:
+            raise CompilerException(f"{path} is not a heap image: {e}")
+    if magic != IMAGE_MAGIC:
+        raise CompilerException(f"{path} is not a heap image of this version")
+    if table_hash != OPCODE_TABLE_HASH:
+        raise CompilerException(f"{path} was built for another opcode table, build it again")
+    return state
+
+
+def build_vm_image(source: str) -> Snapshot:
+    pipeline = Pipeline()
+    parser = Parser(Lexer(source))
+    for _ in pipeline.run_all(parser.parse_statements()):
+        pass
+    if parser.errors:
+        raise parser.errors[0]
+    return pipeline.snapshot()
+
+
+def build_evaluator_image(source: str) -> Environment:
+    parser = Parser(Lexer(source))
+    program = parser.parse_program()
+    if parser.errors:
+        raise parser.errors[0]
+    env = Environment()
+    handle_macro(program, env)
+    result = ycEval(expand_macro(program, env), env)
+    if result is not None and result.type() == ObjectType.ERROR:
+        # the statements after the error never ran, the environment is
+        # not the prelude's
+        raise CompilerException(result.inspect())
+    return env
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="run a prelude and save the state it leaves")
+    arg_parser.add_argument("source")
+    arg_parser.add_argument("image")
+    arg_parser.add_argument("--evaluator", action="store_true",
+                            help="run it with ycEval and save its environment instead of a vm snapshot")
+    args = arg_parser.parse_args()
+    with open(args.source) as file:
+        source = file.read()
+    try:
+        state = build_evaluator_image(source) if args.evaluator else build_vm_image(source)
+    except (CompilerException, ParseException) as e:
+        print(f"{args.source}: {e}", file=sys.stderr)
+        sys.exit(1)
+    save_image(args.image, state)
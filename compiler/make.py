@@ -1,7 +1,7 @@
 
 from io import StringIO
 from typing import List, Tuple
-from compiler.code import OpCode, OpCodeInfo
+from compiler.code import JumpOperand, OpCode, OpCodeInfo
 
 
 def make(OpCode: OpCode, *args):
@@ -18,6 +18,22 @@ def make(OpCode: OpCode, *args):
     return final_bytes
 
 
+def make_wide(op_code: OpCode, *args):
+    # like make, but an argument too large for its width is split: the low
+    # bytes stay in the instruction, the high bits go to EXTENDED_ARG prefixes.
+    # only instructions with a single argument can be extended
+    info_obj = OpCodeInfo[op_code]
+    if len(info_obj["args_length"]) != 1 or len(args) != 1:
+        return make(op_code, *args)
+    bits = 8 * info_obj["args_length"][0]
+    high = args[0] >> bits
+    prefix = b''
+    while high:
+        prefix = make(OpCode.EXTENDED_ARG, high & 0xFFFF) + prefix
+        high >>= 16
+    return prefix + make(op_code, args[0] & ((1 << bits) - 1))
+
+
 def unmake(bytes: bytes) -> Tuple[List[int], int]:
     # try parse one byte op code with its arguments
     op_num = int.from_bytes(bytes[0:1], byteorder="big")
@@ -35,21 +51,119 @@ def unmake(bytes: bytes) -> Tuple[List[int], int]:
     return para_list, offset
 
 
+def unmake_wide(bytes: bytes, i: int = 0) -> Tuple[OpCode, List[int], int]:
+    # parse the instruction at bytes[i] with its EXTENDED_ARG prefixes folded
+    # into its argument, returns the op code, the arguments and the length
+    start = i
+    extended = 0
+    while bytes[i] == OpCode.EXTENDED_ARG.value:
+        extended = (extended << 16) | int.from_bytes(
+            bytes[i+1:i+3], byteorder="big")
+        i += 3
+    op_code = OpCode(bytes[i])
+    para_list, offset = unmake(bytes[i:i+1+sum(OpCodeInfo[op_code]["args_length"])])
+    if i != start:
+        para_list[0] |= extended << (8 * OpCodeInfo[op_code]["args_length"][0])
+    return op_code, para_list, i + offset - start
+
+
+def disassemble(bytes: bytes) -> List[List]:
+    # split raw instructions into [op_code, args] pairs so passes can rewrite
+    # them. EXTENDED_ARG prefixes are folded into the arguments, jump arguments
+    # are turned into the index of the target instruction, len(result) means
+    # "jump to the end".
+    instructions = []
+    index_of_offset = {}
+    i = 0
+    while i < len(bytes):
+        index_of_offset[i] = len(instructions)
+        op_code, para_list, offset = unmake_wide(bytes, i)
+        instructions.append([op_code, para_list])
+        i += offset
+    index_of_offset[len(bytes)] = len(instructions)
+    for op_code, args in instructions:
+        if op_code in JumpOperand:
+            args[JumpOperand[op_code]] = index_of_offset[args[JumpOperand[op_code]]]
+    return instructions
+
+
+def assemble_instructions(instructions: List[List]) -> List[bytes]:
+    # inverse of disassemble, one bytes per instruction: jump arguments are
+    # instruction indices again. a jump past 65535 needs an EXTENDED_ARG
+    # prefix, which moves every instruction after it, so offsets are
+    # recomputed until they settle
+    final_bytes = [make_wide(op_code, *args) if op_code not in JumpOperand else b''
+                   for op_code, args in instructions]
+    while True:
+        offsets = [0]
+        for i, (op_code, args) in enumerate(instructions):
+            size = len(final_bytes[i]) if final_bytes[i] else 1 + \
+                sum(OpCodeInfo[op_code]["args_length"])
+            offsets.append(offsets[-1] + size)
+        grown = False
+        for i, (op_code, args) in enumerate(instructions):
+            if op_code in JumpOperand:
+                args = args.copy()
+                args[JumpOperand[op_code]] = offsets[args[JumpOperand[op_code]]]
+                encoded = make_wide(op_code, *args)
+                grown = grown or len(encoded) != offsets[i+1] - offsets[i]
+                final_bytes[i] = encoded
+        if not grown:
+            return final_bytes
+
+
+def assemble(instructions: List[List]) -> bytes:
+    return b''.join(assemble_instructions(instructions))
+
+
 def print_bytecode(bytes: bytes):
+    # EXTENDED_ARG prefixes are printed, the instruction after them shows its
+    # full argument
     i = 0
+    extended = 0
     finalString = ""
     while True:
         try:
-            info = OpCodeInfo[OpCode(int.from_bytes(
-                bytes[i:i+1], byteorder="big"))]
+            op_code = OpCode(int.from_bytes(bytes[i:i+1], byteorder="big"))
+            info = OpCodeInfo[op_code]
             para_list, offset = unmake(bytes[i:])
         except Exception as e:
             print(f"Error: {e}")
             print(bytes[i:i+1])
             break
+        if extended and op_code != OpCode.EXTENDED_ARG:
+            para_list[0] |= extended << (8 * info["args_length"][0])
+            extended = 0
+        elif op_code == OpCode.EXTENDED_ARG:
+            extended = (extended << 16) | para_list[0]
 
         finalString += f"{i:04d} {info['name']} {para_list}\n"
         i += offset
         if i >= len(bytes):
             break
     return finalString[:-1]
+
+
+def decode(bytes: bytes) -> List[int]:
+    # pre-decode raw instructions into a flat list: each instruction becomes its
+    # op code value followed by its already decoded arguments, so the vm never
+    # slices bytes or looks up an OpCode while running.
+    # jump targets are rewritten from byte offsets to indices of the new list.
+    code: List[int] = []
+    index_of_offset = {}
+    jump_args = []
+    i = 0
+    while i < len(bytes):
+        # EXTENDED_ARG prefixes disappear, their bits are in the argument
+        index_of_offset[i] = len(code)
+        op_code, para_list, offset = unmake_wide(bytes, i)
+        if op_code in JumpOperand:
+            jump_args.append(len(code) + 1 + JumpOperand[op_code])
+        code.append(op_code.value)
+        code.extend(para_list)
+        i += offset
+    # a jump to the very end of the instructions is legal (if without else)
+    index_of_offset[len(bytes)] = len(code)
+    for loc in jump_args:
+        code[loc] = index_of_offset[code[loc]]
+    return code
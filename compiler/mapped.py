@@ -0,0 +1,93 @@
+import mmap
+from multiprocessing import shared_memory
+from typing import Optional
+
+from compiler import mbc
+from compiler.compiler import Bytecode
+from compiler.mbc import MbcLayout, decode_constant
+from eval.object import ycObject
+
+# run .mbc data in place: from an mmapped file or a shared memory segment,
+# so worker processes running the same program share one physical copy of
+# its instructions and constant pool instead of each compiling its own
+#
+#   bytecode = map_file("rules.mbc")       # in every worker
+#   vm = VM(bytecode)
+#
+#   segment = share(bytecode)              # once, in the parent
+#   bytecode = attach(segment.name)        # in the workers
+#
+# opening costs the same for any program size: the header is checked and
+# nothing else is read. a constant is decoded the first time the vm uses it
+# and a function's instructions stay a view of the shared data, the vm
+# decodes them (make.decode) on the function's first call. only what a
+# worker runs ends up in its private memory
+
+
+class LazyConstants(dict):
+    # index -> constant, decoded from the pool on first use. a dict and not
+    # a list so VM's self.const[index] stays a plain subscript: __missing__
+    # only runs the first time an index is asked for. len() and iteration
+    # read like the constants list of a Bytecode
+    def __init__(self, data, layout: MbcLayout):
+        super().__init__()
+        self.data = data
+        self.layout = layout
+
+    def __missing__(self, index: int) -> ycObject:
+        if not 0 <= index < self.layout.constant_count:
+            raise IndexError(f"constant {index} out of range")
+        const = decode_constant(self.data, self.layout.constant_offset(self.data, index), copy=False)
+        self[index] = const
+        return const
+
+    def __len__(self):
+        return self.layout.constant_count
+
+    def __iter__(self):
+        return (self[index] for index in range(self.layout.constant_count))
+
+
+class MappedBytecode(Bytecode):
+    # a Bytecode over .mbc data in a buffer it does not copy. owner is what
+    # the buffer belongs to (an mmap or a SharedMemory), closed by close()
+    def __init__(self, buffer, owner=None):
+        super().__init__()
+        self.owner = owner
+        self.data = memoryview(buffer)
+        layout = MbcLayout(self.data)
+        self.instructions = layout.instructions(self.data)
+        self.constants = LazyConstants(self.data, layout)
+        self.num_globals = layout.num_globals
+
+    def close(self):
+        # every vm and function using this bytecode must be gone, a view
+        # still held somewhere keeps the buffer from closing (BufferError)
+        self.constants.clear()
+        self.instructions.release()
+        self.data.release()
+        if self.owner is not None:
+            self.owner.close()
+
+
+def map_file(path: str) -> MappedBytecode:
+    with open(path, "rb") as file:
+        # the mapping stays valid after the file is closed
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return MappedBytecode(mapped, mapped)
+
+
+def share(bytecode: Bytecode, name: Optional[str] = None) -> shared_memory.SharedMemory:
+    # a new shared memory segment holding bytecode in .mbc form. the caller
+    # owns it: close() and unlink() it once the workers are done
+    data = mbc.dumps(bytecode)
+    segment = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+    segment.buf[:len(data)] = data
+    return segment
+
+
+def attach(name: str) -> MappedBytecode:
+    # the segment can be larger than the data (page rounding), MbcLayout
+    # only reads what the header describes
+    segment = shared_memory.SharedMemory(name=name)
+    return MappedBytecode(segment.buf, segment)
@@ -0,0 +1,241 @@
+import argparse
+import os
+import struct
+import sys
+import tempfile
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from compiler.cache import compile_source
+from compiler.code import OPCODE_TABLE_HASH
+from compiler.compiledfunction import CompiledFunction
+from compiler.compiler import Bytecode
+from compiler.compiler_exception import CompilerException, StackOverflowException
+from compiler.vm import VM
+from eval.object import Integer, String, make_integer, ycObject
+from parser.parser import ParseException
+
+# .mbc files: a compiled program saved to run without lexing, parsing or
+# compiling it again. every number is big endian, like the instructions
+#
+#   header      magic, format version, flags (0), sha256 of the opcode table,
+#               number of globals, instructions length, constant count,
+#               pool length, section count
+#   instructions
+#   offsets     one u32 per constant, where it starts in the pool
+#   pool        per constant a tag byte and its body
+#                 INT       u32 length, signed bytes
+#                 STRING    u32 length, utf-8
+#                 FUNCTION  u32 num_locals, u32 num_args, u32 length, instructions
+#   sections    u8 name length, name, u32 length, data. optional extras,
+#               e.g. "source" and "file" for debugging. readers skip the
+#               ones they don't know
+#
+# a file compiled with another opcode table is refused, its instructions
+# would mean something else
+#
+#   python -m compiler.mbc compile script.monkey      -> script.mbc
+#   python -m compiler.mbc run script.mbc
+
+MAGIC = b"\x7fMBC"
+FORMAT_VERSION = 2
+HEADER = struct.Struct(">4sHH32sIIIIH")
+U32 = struct.Struct(">I")
+FUNCTION_HEADER = struct.Struct(">III")
+
+TAG_INT = 1
+TAG_STRING = 2
+TAG_FUNCTION = 3
+
+
+def encode_constant(const: ycObject) -> bytes:
+    if type(const) == Integer:
+        value = const.value
+        body = value.to_bytes((value + (value < 0)).bit_length() // 8 + 1, "big", signed=True)
+        return bytes([TAG_INT]) + U32.pack(len(body)) + body
+    if type(const) == String:
+        body = const.value.encode()
+        return bytes([TAG_STRING]) + U32.pack(len(body)) + body
+    if type(const) == CompiledFunction:
+        return (bytes([TAG_FUNCTION])
+                + FUNCTION_HEADER.pack(const.num_locals, const.num_args, len(const.instructions))
+                + bytes(const.instructions))
+    raise CompilerException(f"can't save a {const.type()} constant")
+
+
+def unpack(layout: struct.Struct, data, offset: int) -> Tuple:
+    # struct.unpack_from, with the CompilerException of the other format
+    # checks when data ends too early
+    if offset + layout.size > len(data):
+        raise CompilerException("truncated .mbc data")
+    return layout.unpack_from(data, offset)
+
+
+def span(data, start: int, length: int):
+    # data[start:start+length], which must be all there
+    if start + length > len(data):
+        raise CompilerException("truncated .mbc data")
+    return data[start:start + length]
+
+
+def decode_constant(data, offset: int, copy: bool = True) -> ycObject:
+    # the constant at data[offset], data is bytes or a memoryview. without
+    # copy a function's instructions stay a slice of data
+    tag = span(data, offset, 1)[0]
+    if tag == TAG_FUNCTION:
+        num_locals, num_args, length = unpack(FUNCTION_HEADER, data, offset + 1)
+        instructions = span(data, offset + 1 + FUNCTION_HEADER.size, length)
+        return CompiledFunction(bytes(instructions) if copy else instructions, num_locals, num_args)
+    (length,) = unpack(U32, data, offset + 1)
+    body = span(data, offset + 1 + U32.size, length)
+    if tag == TAG_INT:
+        return make_integer(int.from_bytes(body, "big", signed=True))
+    if tag == TAG_STRING:
+        return String(bytes(body).decode())
+    raise CompilerException(f"unknown constant tag {tag} in .mbc data")
+
+
+def dumps(bytecode: Bytecode, sections: Optional[Dict[str, bytes]] = None) -> bytes:
+    sections = sections or {}
+    pool = []
+    offsets = []
+    pool_length = 0
+    for const in bytecode.constants:
+        encoded = encode_constant(const)
+        offsets.append(U32.pack(pool_length))
+        pool.append(encoded)
+        pool_length += len(encoded)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, bytes.fromhex(OPCODE_TABLE_HASH), bytecode.num_globals,
+                         len(bytecode.instructions), len(bytecode.constants), pool_length, len(sections))
+    parts = [header, bytes(bytecode.instructions)] + offsets + pool
+    for name, data in sections.items():
+        encoded_name = name.encode()
+        parts += [bytes([len(encoded_name)]), encoded_name, U32.pack(len(data)), data]
+    return b"".join(parts)
+
+
+class MbcLayout:
+    # where the parts of .mbc data are, after checking its header
+    def __init__(self, data):
+        if len(data) < HEADER.size:
+            raise CompilerException("not .mbc data: too short")
+        (magic, version, _, table_hash, self.num_globals, self.instructions_length,
+         self.constant_count, self.pool_length, self.section_count) = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise CompilerException("not .mbc data: bad magic number")
+        if version != FORMAT_VERSION:
+            raise CompilerException(f".mbc format version {version}, expected {FORMAT_VERSION}")
+        if table_hash != bytes.fromhex(OPCODE_TABLE_HASH):
+            raise CompilerException(".mbc data compiled for another opcode table, compile it again")
+        self.instructions_start = HEADER.size
+        self.offsets_start = self.instructions_start + self.instructions_length
+        self.pool_start = self.offsets_start + U32.size * self.constant_count
+        self.sections_start = self.pool_start + self.pool_length
+        if self.sections_start > len(data):
+            raise CompilerException("truncated .mbc data")
+
+    def instructions(self, data):
+        return data[self.instructions_start:self.offsets_start]
+
+    def constant_offset(self, data, index: int) -> int:
+        return self.pool_start + unpack(U32, data, self.offsets_start + U32.size * index)[0]
+
+    def sections(self, data) -> Dict[str, bytes]:
+        sections = {}
+        offset = self.sections_start
+        for _ in range(self.section_count):
+            name_length = span(data, offset, 1)[0]
+            name = bytes(span(data, offset + 1, name_length)).decode()
+            offset += 1 + name_length
+            (length,) = unpack(U32, data, offset)
+            offset += U32.size
+            sections[name] = bytes(span(data, offset, length))
+            offset += length
+        return sections
+
+
+def loads_with_sections(data) -> Tuple[Bytecode, Dict[str, bytes]]:
+    layout = MbcLayout(data)
+    constants: List[ycObject] = [decode_constant(data, layout.constant_offset(data, index))
+                                 for index in range(layout.constant_count)]
+    bytecode = Bytecode(constants=constants, instructions=[bytes(layout.instructions(data))],
+                        num_globals=layout.num_globals)
+    return bytecode, layout.sections(data)
+
+
+def loads(data) -> Bytecode:
+    return loads_with_sections(data)[0]
+
+
+def dump(bytecode: Bytecode, file: BinaryIO, sections: Optional[Dict[str, bytes]] = None):
+    file.write(dumps(bytecode, sections))
+
+
+def load(file: BinaryIO) -> Bytecode:
+    return loads(file.read())
+
+
+def compile_file(source_path: str, output_path: Optional[str] = None, debug: bool = True) -> str:
+    # compile a source file to .mbc next to it, returns the .mbc path
+    with open(source_path) as file:
+        source = file.read()
+    if output_path is None:
+        output_path = os.path.splitext(source_path)[0] + ".mbc"
+    sections = {"file": os.path.basename(source_path).encode(), "source": source.encode()} if debug else None
+    data = dumps(compile_source(source), sections)
+    # the same write then rename as the cache, a running reader never sees
+    # half a file and two compiles of one target don't share a temporary
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(output_path) or ".",
+                                     prefix=os.path.basename(output_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(temporary, output_path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return output_path
+
+
+def run_file(path: str) -> ycObject:
+    with open(path, "rb") as file:
+        vm = VM(load(file))
+    vm.run()
+    return vm.last_pop()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="compile programs to .mbc files and run them")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+    compile_command = commands.add_parser("compile", help="compile source files to .mbc")
+    compile_command.add_argument("sources", nargs="+")
+    compile_command.add_argument("-o", "--output", help="output path, only with a single source")
+    compile_command.add_argument("--strip", action="store_true",
+                                 help="leave out the source and file name sections")
+    run_command = commands.add_parser("run", help="run a .mbc file and print its result")
+    run_command.add_argument("path")
+    args = arg_parser.parse_args()
+    if args.command == "compile":
+        if args.output and len(args.sources) > 1:
+            arg_parser.error("-o needs a single source")
+        for source_path in args.sources:
+            try:
+                print(compile_file(source_path, args.output, debug=not args.strip))
+            except ParseException as e:
+                print(f"{source_path}: parser has errors", file=sys.stderr)
+                print(e, file=sys.stderr)
+                sys.exit(1)
+            except CompilerException as e:
+                print(f"{source_path}: {e}", file=sys.stderr)
+                sys.exit(1)
+    else:
+        try:
+            result = run_file(args.path)
+        except CompilerException as e:
+            print(f"{args.path}: {e}", file=sys.stderr)
+            sys.exit(1)
+        except StackOverflowException:
+            print(f"{args.path}: stack overflow", file=sys.stderr)
+            sys.exit(1)
+        if result is not None:
+            print(result)
@@ -0,0 +1,131 @@
+import argparse
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from compiler.code import OpCode, OpCodeInfo
+from compiler.compiledfunction import CompiledFunction
+from compiler.compiler import Bytecode, Compiler
+from compiler.frame import Frame
+from compiler.superinstruction import fuse_bytecode
+from compiler.vm import VM
+from lexer.lexer import Lexer
+from parser.parser import Parser
+
+
+def op_name(op: int) -> str:
+    return OpCodeInfo[OpCode(op)]["name"]
+
+
+class OpcodeProfile:
+    # counts executed op codes and the pairs and triples they form, run a
+    # program on a ProfilingVM to fill it. the counts are used to pick
+    # which sequences deserve a superinstruction.
+    def __init__(self):
+        self.singles: Counter = Counter()
+        self.pairs: Counter = Counter()
+        self.triples: Counter = Counter()
+        self.previous = None
+        self.before_previous = None
+
+    def record(self, op: int):
+        self.singles[op] += 1
+        if self.previous is not None:
+            self.pairs[(self.previous, op)] += 1
+            if self.before_previous is not None:
+                self.triples[(self.before_previous, self.previous, op)] += 1
+        self.before_previous = self.previous
+        self.previous = op
+
+    def most_common(self, counter: Counter, n: int = 10) -> List[Tuple[Tuple[str, ...], int]]:
+        return [(tuple(op_name(op) for op in ops), count)
+                for ops, count in counter.most_common(n)]
+
+    def most_common_pairs(self, n: int = 10):
+        return self.most_common(self.pairs, n)
+
+    def most_common_triples(self, n: int = 10):
+        return self.most_common(self.triples, n)
+
+    def report(self, n: int = 10) -> str:
+        total = sum(self.singles.values())
+        lines = [f"{total} instructions executed"]
+        for title, counter in (("pairs", self.pairs), ("triples", self.triples)):
+            lines.append(f"most common {title}:")
+            for names, count in self.most_common(counter, n):
+                lines.append(
+                    f"{count:>10} {count / total:6.1%}  {'; '.join(names)}")
+        return "\n".join(lines)
+
+
+class ProfiledInstructions(list):
+    # decoded instructions (make.decode) recording the op codes read from
+    # them. VM.run reads an instruction's op code once, at pc, and only its
+    # operands after that, so a read at an op code position is one executed
+    # instruction
+    def __init__(self, instructions: List[int], profile: OpcodeProfile):
+        super().__init__(instructions)
+        self.profile = profile
+        self.op_positions = set()
+        position = 0
+        while position < len(instructions):
+            self.op_positions.add(position)
+            position += 1 + len(OpCodeInfo[OpCode(instructions[position])]["args_length"])
+
+    def __getitem__(self, index):
+        value = list.__getitem__(self, index)
+        if index in self.op_positions:
+            self.profile.record(value)
+        return value
+
+
+class ProfilingVM(VM):
+    # a VM filling an OpcodeProfile. the dispatch loop is VM.run as it is,
+    # only the instructions it reads are instrumented, so the plain VM
+    # pays nothing for profiling
+    def __init__(self, bytecode: Bytecode, profile: Optional[OpcodeProfile] = None, **kwargs):
+        super().__init__(bytecode, **kwargs)
+        self.profile = profile if profile is not None else OpcodeProfile()
+        self.instrument(self.frame_stack[0])
+
+    def instrument(self, frame: Frame):
+        frame.instructions = ProfiledInstructions(frame.instructions, self.profile)
+
+    def load(self, bytecode: Bytecode):
+        super().load(bytecode)
+        self.instrument(self.frame_stack[0])
+
+    def run(self):
+        # the functions' decoded instructions are swapped for profiled ones
+        # while the program runs
+        functions = [const for const in self.const if isinstance(const, CompiledFunction)]
+        saved = [function._code for function in functions]
+        for function in functions:
+            function._code = ProfiledInstructions(function.code, self.profile)
+        try:
+            super().run()
+        finally:
+            for function, code in zip(functions, saved):
+                function._code = code
+
+
+def profile_source(code: str, superinstructions: bool = False) -> OpcodeProfile:
+    compiler = Compiler()
+    compiler.compile(Parser(Lexer(code)).parse_program())
+    bytecode = compiler.bytecodes()
+    if superinstructions:
+        bytecode = fuse_bytecode(bytecode)
+    vm = ProfilingVM(bytecode)
+    vm.run()
+    return vm.profile
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="report the most common op code pairs and triples of a program")
+    arg_parser.add_argument("file")
+    arg_parser.add_argument("-n", type=int, default=10)
+    arg_parser.add_argument("--superinstructions", action="store_true",
+                            help="profile the program after fusing superinstructions")
+    args = arg_parser.parse_args()
+    with open(args.file) as f:
+        print(profile_source(f.read(), args.superinstructions).report(args.n))
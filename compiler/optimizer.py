@@ -0,0 +1,234 @@
+from typing import Callable, List, Optional, Set, Tuple
+
+from compiler.code import JumpOperand, OpCode
+from compiler.compiledfunction import CompiledFunction
+from compiler.compiler import Bytecode, constant_key
+from compiler.make import assemble, disassemble
+from compiler.math_compute import compute
+from eval.object import Integer, String, make_integer, ycObject
+
+# peephole optimizer, it runs between Compiler.bytecodes() and the VM:
+# VM(optimize_bytecode(compiler.bytecodes()))
+
+ARITHMETIC = (OpCode.ADD, OpCode.SUB, OpCode.MUL, OpCode.DIV)
+COMPARISON = (OpCode.GT, OpCode.EQ, OpCode.NOTEQ)
+# instructions pushing a value without any side effect
+PURE_PUSH = (OpCode.CONST, OpCode.TRUE, OpCode.FALSE, OpCode.NULL)
+# nothing after these runs unless something jumps there
+TERMINATORS = (OpCode.RETURN, OpCode.RETURN_NULL, OpCode.JUMP)
+
+# a rule looks at the instruction at a position and returns how many
+# instructions it consumes and what to put in their place, or None
+Rule = Callable[[List[List], int, Set[int]], Optional[Tuple[int, List[List]]]]
+
+
+def jump_targets(instructions: List[List]) -> Set[int]:
+    return {args[JumpOperand[op_code]]
+            for op_code, args in instructions if op_code in JumpOperand}
+
+
+def rewrite(instructions: List[List], rule: Rule) -> Tuple[List[List], bool]:
+    # apply rule everywhere and fix the jumps of the result.
+    # a rule never sees a window with a jump target after its first instruction,
+    # jumps to a removed instruction land on whatever replaced it or follows it
+    targets = jump_targets(instructions)
+    result = []
+    new_index = {}
+    changed = False
+    i = 0
+    while i < len(instructions):
+        new_index[i] = len(result)
+        replaced = rule(instructions, i, targets)
+        if replaced is None:
+            result.append(instructions[i])
+            i += 1
+            continue
+        consumed, replacement = replaced
+        assert not any(i + k in targets for k in range(1, consumed))
+        for k in range(1, consumed):
+            new_index[i + k] = len(result)
+        result.extend(replacement)
+        i += consumed
+        changed = True
+    new_index[len(instructions)] = len(result)
+    for op_code, args in result:
+        if op_code in JumpOperand:
+            args[JumpOperand[op_code]] = new_index[args[JumpOperand[op_code]]]
+    return result, changed
+
+
+def window(instructions: List[List], i: int, size: int, targets: Set[int]):
+    # the op codes of instructions[i:i+size], None if a jump lands inside
+    if i + size > len(instructions):
+        return None
+    if any(i + k in targets for k in range(1, size)):
+        return None
+    return tuple(op_code for op_code, _ in instructions[i:i+size])
+
+
+def fold(left: ycObject, right: ycObject, op_code: OpCode) -> Optional[ycObject]:
+    # compute a binary op on two constants, None when it has to stay a runtime op
+    if type(left) != type(right) or not isinstance(left, (Integer, String)):
+        return None
+    if op_code in COMPARISON:
+        return compute(left.value, right.value, op_code)
+    if isinstance(left, String):
+        return String(left.value + right.value) if op_code == OpCode.ADD else None
+    if op_code == OpCode.DIV and right.value == 0:
+        return None
+    return make_integer(compute(left.value, right.value, op_code))
+
+
+class Optimizer:
+    def __init__(self, constants: List[ycObject]):
+        # folded values are appended to this list, unless an equal constant
+        # is already there
+        self.constants = constants
+        self.constant_index = {}
+        for index, obj in enumerate(constants):
+            key = constant_key(obj)
+            if key is not None:
+                self.constant_index.setdefault(key, index)
+        # the value popped by the last POP is the program's result
+        # (VM.last_pop), so the last push/POP pair must survive
+        self.keep_result = False
+
+    def const_instruction(self, obj) -> List:
+        if isinstance(obj, bool):
+            return [OpCode.TRUE if obj else OpCode.FALSE, []]
+        key = constant_key(obj)
+        if key not in self.constant_index:
+            self.constants.append(obj)
+            self.constant_index[key] = len(self.constants) - 1
+        return [OpCode.CONST, [self.constant_index[key]]]
+
+    def literal(self, instruction: List):
+        # the value a pure push instruction pushes
+        op_code, args = instruction
+        if op_code == OpCode.CONST:
+            return self.constants[args[0]]
+        return {OpCode.TRUE: True, OpCode.FALSE: False}.get(op_code)
+
+    def fold_constants(self, instructions: List[List], i: int, targets: Set[int]):
+        ops = window(instructions, i, 3, targets)
+        if ops is not None and ops[0] == ops[1] == OpCode.CONST and ops[2] in ARITHMETIC + COMPARISON:
+            result = fold(self.literal(instructions[i]),
+                          self.literal(instructions[i+1]), ops[2])
+            if result is not None:
+                return 3, [self.const_instruction(result)]
+        # true == false and friends
+        if ops is not None and ops[0] in (OpCode.TRUE, OpCode.FALSE) and ops[1] in (OpCode.TRUE, OpCode.FALSE) and ops[2] in (OpCode.EQ, OpCode.NOTEQ):
+            return 3, [self.const_instruction(compute(ops[0] == OpCode.TRUE, ops[1] == OpCode.TRUE, ops[2]))]
+        ops = window(instructions, i, 2, targets)
+        if ops == (OpCode.CONST, OpCode.MINUS):
+            value = self.literal(instructions[i])
+            if isinstance(value, Integer):
+                return 2, [self.const_instruction(make_integer(-value.value))]
+        if ops in ((OpCode.TRUE, OpCode.BANG), (OpCode.FALSE, OpCode.BANG)):
+            return 2, [self.const_instruction(ops[0] == OpCode.FALSE)]
+        return None
+
+    def fold_tail(self, result: List[List], targets: Set[int]) -> bool:
+        # fold the instructions ending result into one, if they make a
+        # foldable window
+        for size in (3, 2):
+            i = len(result) - size
+            if i < 0:
+                continue
+            replaced = self.fold_constants(result, i, targets)
+            if replaced is not None and replaced[0] == size:
+                result[i:] = replaced[1]
+                return True
+        return False
+
+    def fold_all(self, instructions: List[List]) -> Tuple[List[List], bool]:
+        # fold_constants everywhere, stack style: each instruction goes on
+        # the end of result, then the end is folded for as long as it can be.
+        # a folded value is checked again with what follows it, so a chain
+        # like 1 + 2 + ... + n folds in this one pass. rewrite() would fold
+        # only its first link per pass
+        targets = jump_targets(instructions)
+        result = []
+        result_targets = set()
+        new_index = {}
+        changed = False
+        for i, instruction in enumerate(instructions):
+            new_index[i] = len(result)
+            if i in targets:
+                result_targets.add(len(result))
+            result.append(instruction)
+            while self.fold_tail(result, result_targets):
+                changed = True
+        new_index[len(instructions)] = len(result)
+        # folds never remove a jump target, the targets keep their position
+        for op_code, args in result:
+            if op_code in JumpOperand:
+                args[JumpOperand[op_code]] = new_index[args[JumpOperand[op_code]]]
+        return result, changed
+
+    def drop_unused_push(self, instructions: List[List], i: int, targets: Set[int]):
+        if self.keep_result and i + 2 == len(instructions):
+            return None
+        ops = window(instructions, i, 2, targets)
+        if ops is not None and ops[0] in PURE_PUSH and ops[1] == OpCode.POP:
+            return 2, []
+        return None
+
+    def drop_dead_code(self, instructions: List[List], i: int, targets: Set[int]):
+        if instructions[i][0] not in TERMINATORS:
+            return None
+        end = i + 1
+        while end < len(instructions) and end not in targets:
+            end += 1
+        if end == i + 1:
+            return None
+        return end - i, [instructions[i]]
+
+    def drop_jump_to_next(self, instructions: List[List], i: int, targets: Set[int]):
+        if instructions[i][0] == OpCode.JUMP and instructions[i][1][0] == i + 1:
+            return 1, []
+        return None
+
+    def thread_jumps(self, instructions: List[List]) -> bool:
+        # a jump landing on a JUMP can go straight to the final target
+        changed = False
+        for op_code, args in instructions:
+            if op_code not in JumpOperand:
+                continue
+            target = args[JumpOperand[op_code]]
+            seen = set()
+            while target < len(instructions) and instructions[target][0] == OpCode.JUMP and target not in seen:
+                seen.add(target)
+                target = instructions[target][1][0]
+            if target != args[JumpOperand[op_code]]:
+                args[JumpOperand[op_code]] = target
+                changed = True
+        return changed
+
+    def optimize(self, bytes: bytes, keep_result: bool = False) -> bytes:
+        self.keep_result = keep_result
+        instructions = disassemble(bytes)
+        changed = True
+        while changed:
+            changed = self.thread_jumps(instructions)
+            instructions, folded = self.fold_all(instructions)
+            changed = changed or folded
+            for rule in (self.drop_unused_push, self.drop_dead_code, self.drop_jump_to_next):
+                instructions, rule_changed = rewrite(instructions, rule)
+                changed = changed or rule_changed
+        return assemble(instructions)
+
+
+def optimize_bytecode(bytecode: Bytecode, start: int = 0) -> Bytecode:
+    # bytecode.constants grows with the folded values, nested functions are
+    # replaced by optimized copies. the functions before start are optimized
+    # already (a pool shared by the inputs of the repl) and stay as they are
+    optimizer = Optimizer(bytecode.constants)
+    for index in range(start, len(bytecode.constants)):
+        const = bytecode.constants[index]
+        if isinstance(const, CompiledFunction):
+            bytecode.constants[index] = CompiledFunction(optimizer.optimize(
+                const.instructions), const.num_locals, const.num_args)
+    return Bytecode(constants=bytecode.constants,
+                    instructions=[optimizer.optimize(bytecode.instructions, keep_result=True)],
+                    num_globals=bytecode.num_globals)
@@ -0,0 +1,134 @@
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List
+
+from compiler.compiler import Bytecode, CompileScope, Compiler
+from compiler.symtable import SymTable
+from compiler.vm import VM
+from eval.object import NULL, ycObject
+from parser.node import ExpressionStatement, Statement
+
+# compile and run top level statements one at a time, as the parser yields
+# them (Parser.parse_statements): a statement runs before the next one is
+# parsed and its ast can go once it is compiled. the symbol table, the
+# constant pool and the globals of the vm carry over from one statement to
+# the next, as if they were one program
+#
+#   for value in Pipeline().run_all(Parser(Lexer(code)).parse_statements()):
+#       print(value.inspect())
+
+
+class Pipeline:
+    def __init__(self):
+        self.compiler = Compiler()
+        # the global table, kept here since a statement failing to compile
+        # can leave the compiler inside a function scope
+        self.symtable: SymTable = self.compiler.scopes[0].symtable
+        self.vm = None
+
+    def compile(self, statement: Statement) -> Bytecode:
+        # a fresh global scope on the same symbol table, so the bytecode
+        # holds this statement alone
+        compiler = self.compiler
+        compiler.scopes = [CompileScope(self.symtable)]
+        compiler.scope_index = 0
+        compiler.compile(statement)
+        bytecode = Bytecode(instructions=compiler.instructions,
+                            num_globals=len(self.symtable.symbols))
+        # the pool is shared with the vm, not copied for every statement
+        bytecode.constants = compiler.constants
+        return bytecode
+
+    def run(self, statement: Statement) -> ycObject:
+        # the value of an expression statement, NULL for the others
+        bytecode = self.compile(statement)
+        if self.vm is None:
+            self.vm = VM(bytecode)
+        else:
+            self.vm.load(bytecode)
+        self.vm.run()
+        if isinstance(statement, ExpressionStatement):
+            return self.vm.last_pop()
+        return NULL
+
+    def run_all(self, statements: Iterable[Statement]) -> Iterator[ycObject]:
+        for statement in statements:
+            yield self.run(statement)
+
+    def snapshot(self) -> "Snapshot":
+        return Snapshot(self)
+
+    def restore(self, snapshot: "Snapshot"):
+        # back to the state of the snapshot, keeping this pipeline's
+        # compiler and vm objects
+        compiler = self.compiler
+        self.symtable = snapshot.symtable.copy()
+        compiler.scopes = [CompileScope(self.symtable)]
+        compiler.scope_index = 0
+        compiler.constants = snapshot.constants.copy()
+        compiler.constant_index = snapshot.constant_index.copy()
+        if self.vm is None:
+            self.vm = VM(Bytecode())
+        self.vm.globals = snapshot.globals.copy()
+        self.vm.const = compiler.constants
+        # drop what the last program left on the stack, load() resets the rest
+        self.vm.stack = []
+        self.vm.sp = 0
+
+
+class Snapshot:
+    # the warmed state of a pipeline, taken after running a prelude: its
+    # global symbols, constant pool and global values. clones start from it
+    # without compiling or running the prelude again.
+    # a clone copies the slot lists and tables and shares every value with
+    # the snapshot: values are never changed in place (arrays are persistent
+    # vectors, no instruction writes into a hash), so a clone writing a
+    # global only replaces its own slot
+    #
+    #   prelude = Pipeline()
+    #   list(prelude.run_all(Parser(Lexer(PRELUDE)).parse_statements()))
+    #   snapshot = prelude.snapshot()
+    #   value = snapshot.clone().run_all(...)
+    def __init__(self, pipeline: Pipeline):
+        compiler = pipeline.compiler
+        self.symtable: SymTable = pipeline.symtable.copy()
+        self.constants: List[ycObject] = compiler.constants.copy()
+        self.constant_index = compiler.constant_index.copy()
+        self.globals: List = pipeline.vm.globals.copy() if pipeline.vm is not None else []
+
+    def clone(self) -> Pipeline:
+        pipeline = Pipeline()
+        pipeline.restore(self)
+        return pipeline
+
+
+class PipelinePool:
+    # pipelines restored to a snapshot between uses instead of being built
+    # for every request. idle ones are kept up to size
+    #
+    #   pool = PipelinePool(snapshot)
+    #   with pool.pipeline() as pipeline:
+    #       pipeline.run_all(...)
+    def __init__(self, snapshot: Snapshot, size: int = 8):
+        self.snapshot = snapshot
+        self.size = size
+        # list.pop and list.append are atomic, threads can share a pool
+        self.idle: List[Pipeline] = []
+
+    def acquire(self) -> Pipeline:
+        try:
+            return self.idle.pop()
+        except IndexError:
+            return self.snapshot.clone()
+
+    def release(self, pipeline: Pipeline):
+        pipeline.restore(self.snapshot)
+        if len(self.idle) < self.size:
+            self.idle.append(pipeline)
+
+    @contextmanager
+    def pipeline(self) -> Iterator[Pipeline]:
+        pipeline = self.acquire()
+        try:
+            yield pipeline
+        finally:
+            self.release(pipeline)
@@ -0,0 +1,72 @@
+from typing import List, Tuple
+
+from compiler.code import JumpOperand, OpCode
+from compiler.compiledfunction import CompiledFunction
+from compiler.compiler import Bytecode
+from compiler.make import assemble, disassemble
+
+# fixed op code sequences and the superinstruction replacing them.
+# picked from OpcodeProfile reports (python -m compiler.opcode_profile),
+# longer sequences come first so they win over their prefixes.
+SuperInstructions: List[Tuple[Tuple[OpCode, ...], OpCode]] = [
+    ((OpCode.GETLOCAL, OpCode.GETLOCAL, OpCode.GT, OpCode.JUMP_IF_NOT_TRUE),
+     OpCode.GETLOCAL_GETLOCAL_GT_JUMP_IF_NOT_TRUE),
+    # "n > 1"
+    ((OpCode.GETLOCAL, OpCode.CONST, OpCode.GT, OpCode.JUMP_IF_NOT_TRUE),
+     OpCode.GETLOCAL_CONST_GT_JUMP_IF_NOT_TRUE),
+    # "n < 1", the compiler swaps the operands of < and emits GT
+    ((OpCode.CONST, OpCode.GETLOCAL, OpCode.GT, OpCode.JUMP_IF_NOT_TRUE),
+     OpCode.CONST_GETLOCAL_GT_JUMP_IF_NOT_TRUE),
+    ((OpCode.GETLOCAL, OpCode.CONST, OpCode.ADD), OpCode.GETLOCAL_CONST_ADD),
+    ((OpCode.GETLOCAL, OpCode.CONST, OpCode.SUB), OpCode.GETLOCAL_CONST_SUB),
+    ((OpCode.GT, OpCode.JUMP_IF_NOT_TRUE), OpCode.GT_JUMP_IF_NOT_TRUE),
+    ((OpCode.EQ, OpCode.JUMP_IF_NOT_TRUE), OpCode.EQ_JUMP_IF_NOT_TRUE),
+    ((OpCode.GETLOCAL, OpCode.GETLOCAL), OpCode.GETLOCAL_GETLOCAL),
+]
+
+
+def fuse(bytes: bytes) -> bytes:
+    # replace every SuperInstructions sequence by its superinstruction.
+    # a sequence is only fused when nothing jumps into the middle of it.
+    instructions = disassemble(bytes)
+    jump_targets = {args[JumpOperand[op_code]]
+                    for op_code, args in instructions if op_code in JumpOperand}
+    fused = []
+    new_index = {}
+    i = 0
+    while i < len(instructions):
+        new_index[i] = len(fused)
+        for sequence, super_op in SuperInstructions:
+            window = instructions[i:i+len(sequence)]
+            if tuple(op_code for op_code, _ in window) != sequence:
+                continue
+            if any(i + k in jump_targets for k in range(1, len(sequence))):
+                continue
+            # superinstructions have 2 byte arguments and no EXTENDED_ARG form
+            if any(arg > 0xFFFF for _, args in window for arg in args):
+                continue
+            if super_op in JumpOperand and len(bytes) > 0xFFFF:
+                continue
+            fused.append([super_op, [arg for _, args in window for arg in args]])
+            i += len(sequence)
+            break
+        else:
+            fused.append(instructions[i])
+            i += 1
+    new_index[len(instructions)] = len(fused)
+    for op_code, args in fused:
+        if op_code in JumpOperand:
+            args[JumpOperand[op_code]] = new_index[args[JumpOperand[op_code]]]
+    return assemble(fused)
+
+
+def fuse_bytecode(bytecode: Bytecode, start: int = 0) -> Bytecode:
+    # post-pass over a compiled program, nested functions included. the
+    # functions before start are fused already and kept, with their decoded
+    # instructions
+    constants = bytecode.constants[:start] + [
+        CompiledFunction(fuse(const.instructions), const.num_locals, const.num_args)
+        if isinstance(const, CompiledFunction) else const
+        for const in bytecode.constants[start:]]
+    return Bytecode(constants=constants, instructions=[fuse(bytecode.instructions)],
+                    num_globals=bytecode.num_globals)
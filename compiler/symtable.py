@@ -24,13 +24,14 @@ class SymTable:
         self.builtin_symbols = {}
 
     def add_symbol(self, name):
-        try_resolve = self.resolve_symbol(name)
         if self.outer is None:
             self.symbols[name] = ycSymbol(
                 name, Scope.GLOBAL, len(self.symbols))
-        elif try_resolve is not None:
+        elif name in self.symbols:
+            # a local may shadow a global or builtin name, not another
+            # symbol of its own function
             raise Exception(
-                f"Symbol {name} already exists in the global scope")
+                f"Symbol {name} already exists in this scope")
         else:
             self.symbols[name] = ycSymbol(name, Scope.LOCAL, len(self.symbols))
 
@@ -60,6 +61,16 @@ class SymTable:
                 return self.add_free_symbol(name)
             return try_resolve
 
+    def copy(self):
+        # a table of the same symbols that can take new ones without
+        # changing this one. only for the global table, the symbols
+        # themselves are never changed and are shared
+        table = SymTable()
+        table.symbols = self.symbols.copy()
+        table.builtin_symbols = self.builtin_symbols.copy()
+        table.outer = self.outer
+        return table
+
     def generate_child(self):
         child = SymTable()
         child.outer = self
@@ -1,25 +1,91 @@
 
+import operator
+
 from compiler.builtin_funcs import BuiltinWrapper
 from compiler.code import OpCode
 from compiler.compiledfunction import CompiledFunction
 from compiler.compiler import Bytecode
-from compiler.math_compute import compute
-from eval.eval import FALSE, TRUE, handleBang, NULL
-from eval.object import Array, Hash, HashAble, HashKey, HashPair, Integer, String, ycObject, Boolean
+from compiler.compiler_exception import StackOverflowException
+from eval.eval import handleBang
+from eval.object import FALSE, NULL, TRUE, Array, Hash, HashAble, Integer, String, make_boolean, make_integer, ycObject
 from compiler.frame import Frame
+from compiler.make import decode
+
+# op code values for the dispatch loop, it compares plain ints instead of enums
+_CONST = OpCode.CONST.value
+_ADD = OpCode.ADD.value
+_POP = OpCode.POP.value
+_SUB = OpCode.SUB.value
+_MUL = OpCode.MUL.value
+_DIV = OpCode.DIV.value
+_TRUE = OpCode.TRUE.value
+_FALSE = OpCode.FALSE.value
+_GT = OpCode.GT.value
+_EQ = OpCode.EQ.value
+_NOTEQ = OpCode.NOTEQ.value
+_BANG = OpCode.BANG.value
+_MINUS = OpCode.MINUS.value
+_JUMP_IF_NOT_TRUE = OpCode.JUMP_IF_NOT_TRUE.value
+_JUMP = OpCode.JUMP.value
+_NULL = OpCode.NULL.value
+_SETGLOBAL = OpCode.SETGLOBAL.value
+_GETGLOBAL = OpCode.GETGLOBAL.value
+_ARRAY = OpCode.ARRAY.value
+_HASH = OpCode.HASH.value
+_INDEX = OpCode.INDEX.value
+_RETURN = OpCode.RETURN.value
+_RETURN_NULL = OpCode.RETURN_NULL.value
+_CALL = OpCode.CALL.value
+_SETLOCAL = OpCode.SETLOCAL.value
+_GETLOCAL = OpCode.GETLOCAL.value
+_LOAD_BUILTIN = OpCode.LOAD_BUILTIN.value
+_GETLOCAL_GETLOCAL = OpCode.GETLOCAL_GETLOCAL.value
+_GETLOCAL_CONST_ADD = OpCode.GETLOCAL_CONST_ADD.value
+_GETLOCAL_CONST_SUB = OpCode.GETLOCAL_CONST_SUB.value
+_GT_JUMP_IF_NOT_TRUE = OpCode.GT_JUMP_IF_NOT_TRUE.value
+_EQ_JUMP_IF_NOT_TRUE = OpCode.EQ_JUMP_IF_NOT_TRUE.value
+_GETLOCAL_GETLOCAL_GT_JUMP_IF_NOT_TRUE = OpCode.GETLOCAL_GETLOCAL_GT_JUMP_IF_NOT_TRUE.value
+_GETLOCAL_CONST_GT_JUMP_IF_NOT_TRUE = OpCode.GETLOCAL_CONST_GT_JUMP_IF_NOT_TRUE.value
+_CONST_GETLOCAL_GT_JUMP_IF_NOT_TRUE = OpCode.CONST_GETLOCAL_GT_JUMP_IF_NOT_TRUE.value
+_TAIL_CALL = OpCode.TAIL_CALL.value
+
+# the python operator for each arithmetic and comparison op code, the same
+# operations as math_compute.compute without matching on an OpCode per call
+_BINARY_OPS = {
+    _ADD: operator.add,
+    _SUB: operator.sub,
+    _MUL: operator.mul,
+    _DIV: operator.floordiv,
+    _GT: operator.gt,
+    _EQ: operator.eq,
+    _NOTEQ: operator.ne,
+}
+
+# how deep calls may nest before the vm gives up with a StackOverflowException
+MAX_FRAMES = 65535
 
 
 class VM:
-    def __init__(self, bytecode: Bytecode = None):
+    def __init__(self, bytecode: Bytecode = None, max_frames: int = MAX_FRAMES):
         # machine stack
         self.stack = []
         # note : sp points the len(stack) + 1 loc
         self.sp = 0
-        # storeglobal varaiables
-        self.globals = [0 for i in range(65535)]
-        self.frame_stack = [0 for i in range(65535)]
-        self.frame_stack[0] = Frame(bytecode.instructions)
+        # storeglobal varaiables, one slot per global symbol of the program.
+        # SETGLOBAL grows it for globals added later (compiler/pipeline.py)
+        self.globals = [0] * bytecode.num_globals
+        # grows with the call depth, up to max_frames
+        self.frame_stack = [Frame(decode(bytecode.instructions))]
+        self.max_frames = max_frames
+        self.frame_index = 0
+        self.const = bytecode.constants
+
+    def load(self, bytecode: Bytecode):
+        # make bytecode the program to run next, the globals stay: it may
+        # use the ones set by what ran before (see compiler/pipeline.py)
+        self.frame_stack[0] = Frame(decode(bytecode.instructions))
         self.frame_index = 0
+        self.sp = 0
         self.const = bytecode.constants
 
     @property
@@ -58,194 +124,256 @@ class VM:
 
 
     def run(self):
+        # instructions are pre-decoded (see make.decode): op code values
+        # followed by their arguments, jump targets are list indices
         instructions = self.instructions
         pc = self.pc
-        while True:
-            if pc >= len(instructions):
-                break
-            op_code = int.from_bytes(instructions[pc:pc+1], byteorder='big')
-            op = OpCode(op_code)
-            match op:
-                case OpCode.POP:
-                    self.pop()
-                    pc += 1
-                case OpCode.CONST:
-                    # two bytes long
-                    index = int.from_bytes(
-                        instructions[pc+1:pc+3], byteorder='big')
-                    self.push(self.const[index])
-                    pc += 3
-                case OpCode.ADD | OpCode.SUB | OpCode.MUL | OpCode.DIV:
-                    # two bytes long
-                    right = self.pop()
-                    left = self.pop()
-                    assert isinstance(
-                        left, Integer) or isinstance(left, String)
-                    assert isinstance(
-                        right, Integer) or isinstance(right, String)
-                    assert type(left) == type(right)
-                    result = compute(left.value, right.value, op)
-                    self.push(Integer(result))
-
-                    pc += 1
-                case OpCode.TRUE | OpCode.FALSE:
-                    self.push(TRUE if op == OpCode.TRUE else FALSE)
-                    pc += 1
-                case OpCode.GT | OpCode.EQ | OpCode.NOTEQ:
-                    right = self.pop()
-                    left = self.pop()
-                    assert isinstance(left, ycObject)
-                    assert isinstance(right, ycObject)
-                    result = compute(left.value, right.value, op)
-                    self.push(Boolean(result))
-                    pc += 1
-                case OpCode.BANG | OpCode.MINUS:
-                    right = self.pop()
-                    assert isinstance(right, ycObject)
-                    match op:
-                        case OpCode.BANG:
-                            result = handleBang(right)
-                            self.push(result)
-                        case OpCode.MINUS:
-                            result = -right.value
-                            self.push(Integer(result))
-                    pc += 1
-                case OpCode.JUMP:
-                    target_loc = int.from_bytes(
-                        instructions[pc+1:pc+3], byteorder='big')
-                    pc = target_loc
-                case OpCode.JUMP_IF_NOT_TRUE:
-                    previous_result = self.pop()
-
-                    if not previous_result.value:
-                        target_loc = int.from_bytes(
-                            instructions[pc+1:pc+3], byteorder='big')
-                        pc = target_loc
-                    else:
-                        pc += 3
-                case OpCode.NULL:
-                    self.push(NULL)
-                    pc += 1
-                case OpCode.SETGLOBAL:
-                    self.globals[int.from_bytes(
-                        instructions[pc+1:pc+3], byteorder='big')] = self.pop()
-                    pc += 3
-                case OpCode.GETGLOBAL:
-                    index = int.from_bytes(
-                        instructions[pc+1:pc+3], byteorder='big')
-                    self.push(self.globals[index])
-                    pc += 3
-                case OpCode.LOAD_BUILTIN:
-
-                    
-                    index = int.from_bytes(
-                        instructions[pc+1:pc+2], byteorder='big')
-                    self.push(BuiltinWrapper.generate_from_index(index))
+        end = len(instructions)
+        while pc < end:
+            op = instructions[pc]
+            if op == _GETLOCAL:
+                self.push(self.stack[self.current_frame.bp+instructions[pc+1]])
+                pc += 2
+            elif op == _CONST:
+                self.push(self.const[instructions[pc+1]])
+                pc += 2
+            elif op == _GETLOCAL_GETLOCAL:
+                bp = self.current_frame.bp
+                self.push(self.stack[bp+instructions[pc+1]])
+                self.push(self.stack[bp+instructions[pc+2]])
+                pc += 3
+            elif op == _GETLOCAL_CONST_ADD or op == _GETLOCAL_CONST_SUB:
+                left = self.stack[self.current_frame.bp+instructions[pc+1]]
+                right = self.const[instructions[pc+2]]
+                assert isinstance(
+                    left, Integer) or isinstance(left, String)
+                assert type(left) == type(right)
+                if op == _GETLOCAL_CONST_ADD:
+                    result = left.value + right.value
+                    self.push(make_integer(result) if type(
+                        left) == Integer else String(result))
+                else:
+                    self.push(make_integer(left.value - right.value))
+                pc += 3
+            elif op == _GETLOCAL_CONST_GT_JUMP_IF_NOT_TRUE:
+                left = self.stack[self.current_frame.bp+instructions[pc+1]]
+                right = self.const[instructions[pc+2]]
+                if not left.value > right.value:
+                    pc = instructions[pc+3]
+                else:
+                    pc += 4
+            elif op == _CONST_GETLOCAL_GT_JUMP_IF_NOT_TRUE:
+                left = self.const[instructions[pc+1]]
+                right = self.stack[self.current_frame.bp+instructions[pc+2]]
+                if not left.value > right.value:
+                    pc = instructions[pc+3]
+                else:
+                    pc += 4
+            elif op == _GETLOCAL_GETLOCAL_GT_JUMP_IF_NOT_TRUE:
+                bp = self.current_frame.bp
+                left = self.stack[bp+instructions[pc+1]]
+                right = self.stack[bp+instructions[pc+2]]
+                if not left.value > right.value:
+                    pc = instructions[pc+3]
+                else:
+                    pc += 4
+            elif op == _GT_JUMP_IF_NOT_TRUE or op == _EQ_JUMP_IF_NOT_TRUE:
+                right = self.pop()
+                left = self.pop()
+                if op == _GT_JUMP_IF_NOT_TRUE:
+                    result = left.value > right.value
+                else:
+                    result = left.value == right.value
+                if not result:
+                    pc = instructions[pc+1]
+                else:
+                    pc += 2
+            elif op == _GETGLOBAL:
+                self.push(self.globals[instructions[pc+1]])
+                pc += 2
+            elif op == _ADD or op == _SUB or op == _MUL or op == _DIV:
+                right = self.pop()
+                left = self.pop()
+                assert isinstance(
+                    left, Integer) or isinstance(left, String)
+                assert isinstance(
+                    right, Integer) or isinstance(right, String)
+                assert type(left) == type(right)
+                result = _BINARY_OPS[op](left.value, right.value)
+                self.push(make_integer(result) if type(
+                    left) == Integer else String(result))
+                pc += 1
+            elif op == _GT or op == _EQ or op == _NOTEQ:
+                right = self.pop()
+                left = self.pop()
+                assert isinstance(left, ycObject)
+                assert isinstance(right, ycObject)
+                if left is right and op != _GT:
+                    # equal constants are one interned object
+                    result = op == _EQ
+                else:
+                    result = _BINARY_OPS[op](left.value, right.value)
+                self.push(make_boolean(result))
+                pc += 1
+            elif op == _JUMP_IF_NOT_TRUE:
+                previous_result = self.pop()
+                if previous_result is FALSE or previous_result is NULL:
+                    pc = instructions[pc+1]
+                else:
                     pc += 2
-                case OpCode.ARRAY:
-                    array = []
-                    for i in range(int.from_bytes(instructions[pc+1:pc+3], byteorder='big')):
-                        array.insert(0, self.pop())
-                    self.push(Array(array))
-                    pc += 3
-                case OpCode.HASH:
-                    dic = {}
-                    for i in range(int.from_bytes(instructions[pc+1:pc+3], byteorder='big')):
-                        value = self.pop()
-                        key = self.pop()
-                        dic[HashKey(key.type(), key.value)
-                            ] = HashPair(key, value)
-                    self.push(Hash(dic))
-                    pc += 3
-                case OpCode.INDEX:
-                    index = self.pop()
-                    indexable = self.pop()
+            elif op == _JUMP:
+                pc = instructions[pc+1]
+            elif op == _POP:
+                self.pop()
+                pc += 1
+            elif op == _CALL:
+                num_args = instructions[pc+1]
+                compiled_function = self.stack[self.sp-num_args-1]
 
-                    assert isinstance(indexable, Array) or isinstance(
-                        indexable, Hash)
-                    assert isinstance(index, HashAble)
-                    try:
-                        if isinstance(indexable, Array):
-                            self.push(indexable[index])
-                        else:
-                            self.push(indexable[index.hash_key()])
-                    except:
-                        self.push(NULL)
-                    pc += 1
-                case OpCode.CALL:
+                if isinstance(compiled_function, BuiltinWrapper):
+                    self.builtin_call(compiled_function, num_args)
+                    pc += 2
+                else:
                     # save the current frame
-                    num_args = int.from_bytes(
-                        instructions[pc+1:pc+2], byteorder='big')
-                    compiled_function = self.stack[self.sp-num_args-1]
-                    
-                    if isinstance(compiled_function, BuiltinWrapper):
-                        self.builtin_call(compiled_function, num_args)
-                        pc += 2
+                    self.current_frame.pc = pc + 2
+                    assert isinstance(compiled_function, CompiledFunction)
+                    if num_args != compiled_function.num_args:
+                        raise Exception("num_args not match")
+                    self.frame_index += 1
+                    frame = Frame(compiled_function.code, pc=0, bp=self.sp-num_args)
+                    if self.frame_index < len(self.frame_stack):
+                        self.frame_stack[self.frame_index] = frame
+                    elif self.frame_index < self.max_frames:
+                        self.frame_stack.append(frame)
                     else:
-                        self.current_frame.pc = pc + 2
-                        assert isinstance(compiled_function, CompiledFunction)
-                        if num_args != compiled_function.num_args:
-                            raise Exception("num_args not match")
-                        self.frame_index += 1
-
-                        self.current_frame = Frame(
-                            compiled_function.instructions, pc=0, bp=self.sp-num_args)
-                        # allocate space for local variables
-                        for i in range(compiled_function.num_locals):
-                            self.push(NULL)
-
-                        pc = self.current_frame.pc
-                        instructions = self.current_frame.instructions
+                        self.frame_index -= 1
+                        raise StackOverflowException(
+                            f"stack overflow: calls nested deeper than {self.max_frames} frames")
+                    # allocate space for local variables
+                    for i in range(compiled_function.num_locals):
+                        self.push(NULL)
 
-                case OpCode.RETURN:
+                    pc = 0
+                    instructions = self.current_frame.instructions
+                    end = len(instructions)
+            elif op == _TAIL_CALL:
+                num_args = instructions[pc+1]
+                compiled_function = self.stack[self.sp-num_args-1]
 
-                    rt = self.pop()
-                    # print("return value:", rt)
-                    # print("now stack", [str(i) for i in self.stack[:10]])
-                    # print("now sp", self.sp)
+                if isinstance(compiled_function, BuiltinWrapper):
+                    # nothing to reuse, the RETURN after it returns the result
+                    self.builtin_call(compiled_function, num_args)
+                    pc += 2
+                else:
+                    assert isinstance(compiled_function, CompiledFunction)
+                    if num_args != compiled_function.num_args:
+                        raise Exception("num_args not match")
+                    # the callee and its arguments replace the current
+                    # function, its arguments and locals, the frame is reused
+                    frame = self.current_frame
+                    stack = self.stack
+                    start = self.sp - num_args - 1
+                    for i in range(num_args + 1):
+                        stack[frame.bp - 1 + i] = stack[start + i]
+                    self.sp = frame.bp + num_args
+                    for i in range(compiled_function.num_locals):
+                        self.push(NULL)
+                    frame.instructions = compiled_function.code
+                    pc = 0
+                    instructions = frame.instructions
+                    end = len(instructions)
+            elif op == _RETURN:
+                rt = self.pop()
+                old_frame = self.current_frame
 
-                    pc += 1
-                    self.current_frame.pc = pc
-                    old_frame = self.current_frame
+                self.frame_index -= 1
+                pc = self.current_frame.pc
+                instructions = self.current_frame.instructions
+                end = len(instructions)
+                self.sp = old_frame.bp - 1
 
-                    self.frame_index -= 1
-                    pc = self.current_frame.pc
-                    instructions = self.current_frame.instructions
-                    self.sp = old_frame.bp - 1
+                assert isinstance(self.stack[self.sp], CompiledFunction)
+                # -1 means popping the compiled function
+                self.push(rt)
+            elif op == _RETURN_NULL:
+                old_frame = self.current_frame
 
-                    # print("old fram bp", old_frame.bp)
-                    # print("fram stack", self.frame_stack[:10])
-                    assert isinstance(self.stack[self.sp], CompiledFunction)
-                    # -1 means popping the compiled function
-                    self.push(rt)
-                case OpCode.RETURN_NULL:
-                    pc += 1
-                    self.current_frame.pc = pc
+                self.frame_index -= 1
+                pc = self.current_frame.pc
+                instructions = self.current_frame.instructions
+                end = len(instructions)
+                self.sp = old_frame.bp - 1
+                assert isinstance(self.stack[self.sp], CompiledFunction)
+                self.push(NULL)
+            elif op == _SETLOCAL:
+                self.stack[self.current_frame.bp +
+                           instructions[pc+1]] = self.pop()
+                pc += 2
+            elif op == _SETGLOBAL:
+                index = instructions[pc+1]
+                if index >= len(self.globals):
+                    # more globals than the preallocated slots, see EXTENDED_ARG
+                    self.globals.extend(0 for i in range(index + 1 - len(self.globals)))
+                self.globals[index] = self.pop()
+                pc += 2
+            elif op == _TRUE:
+                self.push(TRUE)
+                pc += 1
+            elif op == _FALSE:
+                self.push(FALSE)
+                pc += 1
+            elif op == _NULL:
+                self.push(NULL)
+                pc += 1
+            elif op == _BANG:
+                right = self.pop()
+                assert isinstance(right, ycObject)
+                self.push(handleBang(right))
+                pc += 1
+            elif op == _MINUS:
+                right = self.pop()
+                assert isinstance(right, ycObject)
+                self.push(make_integer(-right.value))
+                pc += 1
+            elif op == _LOAD_BUILTIN:
+                self.push(BuiltinWrapper.generate_from_index(
+                    instructions[pc+1]))
+                pc += 2
+            elif op == _ARRAY:
+                start = self.sp - instructions[pc+1]
+                array = self.stack[start:self.sp]
+                self.sp = start
+                self.push(Array(array))
+                pc += 2
+            elif op == _HASH:
+                # the operand counts keys and values, the pairs are read in
+                # source order so inspect() keeps it
+                stack = self.stack
+                start = self.sp - instructions[pc+1]
+                dic = {}
+                for i in range(start, self.sp, 2):
+                    key = stack[i]
+                    dic[key.hash_key()] = (key, stack[i+1])
+                self.sp = start
+                self.push(Hash(dic))
+                pc += 2
+            elif op == _INDEX:
+                index = self.pop()
+                indexable = self.pop()
 
-                    self.frame_index -= 1
-                    pc = self.current_frame.pc
-                    instructions = self.current_frame.instructions
-                    self.sp = self.current_frame.bp - 1
-                    # print(self.stack[self.sp])
-                    assert isinstance(self.stack[self.sp], CompiledFunction)
+                assert isinstance(indexable, Array) or isinstance(
+                    indexable, Hash)
+                assert isinstance(index, HashAble)
+                try:
+                    if isinstance(indexable, Array):
+                        self.push(indexable[index])
+                    else:
+                        self.push(indexable.get(index, NULL))
+                except:
                     self.push(NULL)
-                case OpCode.SETLOCAL:
-                    index = int.from_bytes(
-                        instructions[pc+1:pc+3], byteorder='big')
-                    # print(self.stack[:10])
-                    # print(self.current_frame.bp, index)
-                    self.stack[self.current_frame.bp+index] = self.pop()
-                    pc += 3
-                case OpCode.GETLOCAL:
-                    index = int.from_bytes(
-                        instructions[pc+1:pc+3], byteorder='big')
-                    self.push(self.stack[self.current_frame.bp+index])
-                    pc += 3
-
-                case _:
-                    pass
-
-        pass
+                pc += 1
+            else:
+                raise Exception(f"unsupported op code: {OpCode(op)}")
 
     def push(self, value: ycObject):
         if self.sp >= len(self.stack):
@@ -1,7 +1,7 @@
 from functools import reduce
 import pytest
 from compiler.code import OpCode
-from compiler.make import make, print_bytecode, unmake
+from compiler.make import decode, make, make_wide, print_bytecode, unmake, unmake_wide
 
 
 def test_make_code():
@@ -52,3 +52,45 @@ def test_decode_bytecode():
     decode_result = [unmake(bytecode[i])
                      for i in range(len(bytecode))]
     assert expected_result == decode_result
+
+
+def test_decode_instructions():
+    bytecode = b''.join([
+        make(OpCode.TRUE),  # 0000
+        make(OpCode.JUMP_IF_NOT_TRUE, 10),  # 0001
+        make(OpCode.CONST, 0),  # 0004
+        make(OpCode.JUMP, 11),  # 0007
+        make(OpCode.NULL),  # 0010
+        make(OpCode.POP),  # 0011
+    ])
+    # jump targets now point at list indices instead of byte offsets
+    assert decode(bytecode) == [
+        OpCode.TRUE.value,
+        OpCode.JUMP_IF_NOT_TRUE.value, 7,
+        OpCode.CONST.value, 0,
+        OpCode.JUMP.value, 8,
+        OpCode.NULL.value,
+        OpCode.POP.value,
+    ]
+    # jumping to the end of the instructions is allowed
+    assert decode(make(OpCode.JUMP, 3)) == [OpCode.JUMP.value, 2]
+
+
+def test_make_wide():
+    # small arguments keep the compact encoding
+    assert make_wide(OpCode.CONST, 65535) == make(OpCode.CONST, 65535)
+    assert make_wide(OpCode.CONST, 65536) == make(
+        OpCode.EXTENDED_ARG, 1) + make(OpCode.CONST, 0)
+    assert make_wide(OpCode.CALL, 258) == make(
+        OpCode.EXTENDED_ARG, 1) + make(OpCode.CALL, 2)
+    wide = make_wide(OpCode.JUMP, (1 << 32) + 5)
+    assert wide == make(OpCode.EXTENDED_ARG, 1) + make(OpCode.EXTENDED_ARG, 0) + \
+        make(OpCode.JUMP, 5)
+    assert unmake_wide(wide) == (OpCode.JUMP, [(1 << 32) + 5], 9)
+    assert print_bytecode(make_wide(OpCode.GETGLOBAL, 70000)) == \
+        "0000 EXTENDED_ARG [1]\n0003 GETGLOBAL [70000]"
+    # the prefix disappears from the decoded instructions
+    assert decode(make_wide(OpCode.CONST, 70000) + make(OpCode.JUMP, 0)) == [
+        OpCode.CONST.value, 70000,
+        OpCode.JUMP.value, 0,
+    ]
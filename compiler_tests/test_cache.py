@@ -0,0 +1,109 @@
+import os
+
+import pytest
+from compiler import cache
+from compiler.cache import cached, cached_bytecode, cached_program, compile_source, source_key
+from compiler.compiledfunction import CompiledFunction
+from compiler.vm import VM
+from eval.closure_eval import closureEval
+from eval.env import Environment
+from eval.object import make_integer
+from parser.parser import ParseException
+
+CODE = "let f = function(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }; f(10) + 300"
+
+
+def counting(build):
+    calls = []
+
+    def counted(source):
+        calls.append(source)
+        return build(source)
+    return counted, calls
+
+
+def run(bytecode):
+    vm = VM(bytecode)
+    vm.run()
+    return vm.last_pop().inspect()
+
+
+def test_cache_hit(tmp_path):
+    build, calls = counting(compile_source)
+    first = cached(CODE, "bytecode", build, str(tmp_path))
+    second = cached(CODE, "bytecode", build, str(tmp_path))
+    assert len(calls) == 1
+    assert second.instructions == first.instructions
+    assert second.constants == first.constants
+    assert any(isinstance(const, CompiledFunction) for const in second.constants)
+    assert run(second) == 355
+    # small integers come back as the cached objects
+    assert make_integer(30) is cached_bytecode("30", str(tmp_path)).constants[0]
+    assert make_integer(30) is cached_bytecode("30", str(tmp_path)).constants[0]
+
+
+def test_cache_invalidation(tmp_path, monkeypatch):
+    build, calls = counting(compile_source)
+    cached(CODE, "bytecode", build, str(tmp_path))
+    # another opcode table
+    monkeypatch.setattr(cache, "OPCODE_TABLE_HASH", "0" * 64)
+    assert run(cached(CODE, "bytecode", build, str(tmp_path))) == 355
+    assert len(calls) == 2
+    cached(CODE, "bytecode", build, str(tmp_path))
+    assert len(calls) == 2
+    # an edited compiler or optimizer with the same opcode table
+    monkeypatch.setattr(cache, "FRONT_END_HASH", "1" * 64)
+    assert run(cached(CODE, "bytecode", build, str(tmp_path))) == 355
+    assert len(calls) == 3
+    cached(CODE, "bytecode", build, str(tmp_path))
+    assert len(calls) == 3
+    # a broken entry
+    with open(os.path.join(tmp_path, source_key(CODE, "bytecode")), "wb") as file:
+        file.write(b"\x80\x05broken")
+    assert run(cached(CODE, "bytecode", build, str(tmp_path))) == 355
+    assert len(calls) == 4
+    # a different source is a different entry
+    cached(CODE + ";", "bytecode", build, str(tmp_path))
+    assert len(calls) == 5
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_cache_corrupt_entries(tmp_path):
+    cached_bytecode(CODE, str(tmp_path))
+    path = os.path.join(tmp_path, source_key(CODE, "bytecode"))
+    with open(path, "rb") as file:
+        entry = file.read()
+    # any damaged byte is a miss or some payload, never an exception
+    for index in range(len(entry)):
+        for value in (0, 0xff):
+            with open(path, "wb") as file:
+                file.write(entry[:index] + bytes([value]) + entry[index + 1:])
+            cache.load(str(tmp_path), source_key(CODE, "bytecode"))
+    with open(path, "wb") as file:
+        file.write(entry[:len(entry) // 2])
+    assert run(cached_bytecode(CODE, str(tmp_path))) == 355
+
+
+def test_cache_skips_errors(tmp_path):
+    with pytest.raises(ParseException):
+        cached_bytecode("let = 1", str(tmp_path))
+    assert os.listdir(tmp_path) == []
+    # the exception reports every error, one per line
+    with pytest.raises(ParseException) as error:
+        cached_bytecode("let = 1; let b 2;", str(tmp_path))
+    assert str(error.value).splitlines() == [
+        "Expected token type TokenTypes.IDENT, but got TokenTypes.ASSIGN",
+        "no prefix parse function,prefix token is TokenTypes.ASSIGN",
+        "Expected token type TokenTypes.ASSIGN, but got TokenTypes.INT",
+    ]
+
+
+def test_cached_program(tmp_path):
+    code = """
+    let unless = macro(cond, cons, alt) { quote(if (!(unquote(cond))) { unquote(cons) } else { unquote(alt) }) };
+    unless(10 > 5, 1, 2)
+    """
+    for _ in range(2):
+        program = cached_program(code, str(tmp_path))
+        assert closureEval(program, Environment()).inspect() == 2
+    assert len(os.listdir(tmp_path)) == 1
@@ -209,13 +209,14 @@ code = [{
     # index example
     {
         "input": "[0,1,2][0]",
-        "expected_constants": [Integer(0), Integer(1), Integer(2), Integer(0)],
+        # equal literals share one constant
+        "expected_constants": [Integer(0), Integer(1), Integer(2)],
         "expected_instructions": [
             make(OpCode.CONST, 0),
             make(OpCode.CONST, 1),
             make(OpCode.CONST, 2),
             make(OpCode.ARRAY, 3),
-            make(OpCode.CONST, 3),
+            make(OpCode.CONST, 0),
             make(OpCode.INDEX),
             make(OpCode.POP),
         ]
@@ -227,7 +228,6 @@ code = [{
             Integer(1), Integer(2),
             Integer(3), Integer(4),
             Integer(5), Integer(6),
-            Integer(1)
         ],
         "expected_instructions": [
             make(OpCode.CONST, 0),
@@ -237,7 +237,7 @@ code = [{
             make(OpCode.CONST, 4),
             make(OpCode.CONST, 5),
             make(OpCode.HASH, 6),
-            make(OpCode.CONST, 6),
+            make(OpCode.CONST, 0),
             make(OpCode.INDEX),
             make(OpCode.POP),
         ]
@@ -246,7 +246,7 @@ code = [{
     # index var
     {
         "input": "let arr = [0,1,2]; arr[0]",
-        "expected_constants": [Integer(0), Integer(1), Integer(2), Integer(0)],
+        "expected_constants": [Integer(0), Integer(1), Integer(2)],
         "expected_instructions": [
             # 0000
             make(OpCode.CONST, 0),
@@ -255,7 +255,7 @@ code = [{
             make(OpCode.ARRAY, 3),
             make(OpCode.SETGLOBAL, 0),
             make(OpCode.GETGLOBAL, 0),
-            make(OpCode.CONST, 3),
+            make(OpCode.CONST, 0),
             make(OpCode.INDEX),
             make(OpCode.POP)
         ]
@@ -492,7 +492,7 @@ code = [{
             CompiledFunction(b''.join([
                 make(OpCode.LOAD_BUILTIN, ret_index_builtin_func("len")),
                 make(OpCode.ARRAY, 0),
-                make(OpCode.CALL, 1),
+                make(OpCode.TAIL_CALL, 1),
                 make(OpCode.RETURN),
             ])),
         ],
@@ -548,3 +548,24 @@ def test_compiler_error():
         compiler = Compiler()
         with pytest.raises(Exception):
             compiler.compile(program)
+
+
+def test_compiler_shared_constants():
+    compiler = Compiler()
+    compiler.compile(Parser(Lexer('1 + 1; "1"; 1 * 1')).parse_program())
+    assert compiler.constants == [Integer(1), String("1")]
+    # a second input of the repl reuses the pool of the first one
+    constants = compiler.constants
+    compiler = Compiler()
+    compiler.constants = constants
+    compiler.index_constants()
+    compiler.compile(Parser(Lexer('"1"; 2; 1')).parse_program())
+    assert compiler.constants == [Integer(1), String("1"), Integer(2)]
+    assert compiler.bytecodes().instructions == b''.join([
+        make(OpCode.CONST, 1),
+        make(OpCode.POP),
+        make(OpCode.CONST, 2),
+        make(OpCode.POP),
+        make(OpCode.CONST, 0),
+        make(OpCode.POP),
+    ])
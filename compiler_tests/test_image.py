@@ -0,0 +1,65 @@
+import os
+
+import pytest
+from compiler import image
+from compiler.compiler_exception import CompilerException
+from compiler.image import build_evaluator_image, build_vm_image, load_image, save_image
+from eval.closure_eval import closureEval
+from eval.eval import ycEval
+from lexer.lexer import Lexer
+from parser.parser import Parser
+
+PRELUDE = """
+let flag = false;
+let table = {"one": 1, true: [1, 2, 3], 5: "five"};
+let numbers = push([1, 2], 3);
+let size = len;
+let pick = function(x) { if (flag) { 0 } else { table["one"] + x } };
+"""
+
+
+def parse(code):
+    return Parser(Lexer(code)).parse_program()
+
+
+def test_vm_image(tmp_path):
+    path = str(tmp_path / "prelude.img")
+    save_image(path, build_vm_image(PRELUDE))
+    pipeline = load_image(path).clone()
+    # false is still the FALSE singleton the vm tests by identity
+    code = 'pick(10) + size(numbers) + len(table[true]) + size(table[5])'
+    values = [value.inspect() for value in pipeline.run_all(Parser(Lexer(code)).parse_statements())]
+    assert values == [21]
+
+
+def test_evaluator_image(tmp_path):
+    path = str(tmp_path / "prelude.img")
+    prelude = PRELUDE + """
+let adder = function(a) { function(b) { a + b } };
+let add2 = adder(2);
+"""
+    env = build_evaluator_image(prelude)
+    closureEval(parse("let add3 = adder(3);"), env)
+    save_image(path, env)
+    code = 'pick(10) + add2(1) + add3(1) + size(numbers)'
+    assert ycEval(parse(code), load_image(path)).inspect() == 21
+    assert closureEval(parse(code), load_image(path)).inspect() == 21
+
+
+def test_evaluator_image_error():
+    with pytest.raises(CompilerException, match="type mismatch"):
+        build_evaluator_image("let a = 1; let b = nope + 1; let c = 3;")
+
+
+def test_image_refused(tmp_path, monkeypatch):
+    path = str(tmp_path / "prelude.img")
+    save_image(path, build_vm_image(PRELUDE))
+    monkeypatch.setattr(image, "OPCODE_TABLE_HASH", "0" * 64)
+    with pytest.raises(CompilerException, match="opcode table"):
+        load_image(path)
+    # pickles naming a missing module or class, the image of another build
+    for broken in [b"not an image", b"cno_such_module\nthing\n.", b"cbuiltins\nno_such_name\n."]:
+        (tmp_path / "broken.img").write_bytes(broken)
+        with pytest.raises(CompilerException):
+            load_image(str(tmp_path / "broken.img"))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
@@ -0,0 +1,53 @@
+import gc
+
+from compiler import mbc
+from compiler.cache import compile_source
+from compiler.compiledfunction import CompiledFunction
+from compiler.mapped import attach, map_file, share
+from compiler.vm import VM
+
+CODE = """
+let unused = function(x) { x * 1000 };
+let fib = function(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };
+[fib(12), "done", 100000]
+"""
+
+
+def run(bytecode):
+    vm = VM(bytecode)
+    vm.run()
+    return vm.last_pop().inspect()
+
+
+def test_map_file(tmp_path):
+    path = tmp_path / "prog.mbc"
+    bytecode = compile_source(CODE)
+    path.write_bytes(mbc.dumps(bytecode))
+    mapped = map_file(str(path))
+    # nothing decoded before the vm runs
+    assert dict.__len__(mapped.constants) == 0
+    assert len(mapped.constants) == len(bytecode.constants)
+    assert run(mapped) == [144, "done", 100000]
+    used = dict(mapped.constants)
+    # the function never called is never decoded
+    assert len(used) < len(bytecode.constants)
+    assert all(isinstance(const, CompiledFunction) or const in bytecode.constants for const in used.values())
+    functions = [const for const in used.values() if isinstance(const, CompiledFunction)]
+    assert functions and all(isinstance(f.instructions, memoryview) for f in functions)
+    assert list(mapped.constants) == bytecode.constants
+    del functions, used
+    gc.collect()
+    mapped.close()
+
+
+def test_shared_memory():
+    bytecode = compile_source(CODE)
+    segment = share(bytecode)
+    try:
+        attached = attach(segment.name)
+        assert run(attached) == [144, "done", 100000]
+        gc.collect()
+        attached.close()
+    finally:
+        segment.close()
+        segment.unlink()
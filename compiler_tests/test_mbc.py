@@ -0,0 +1,82 @@
+import io
+import os
+
+import pytest
+from compiler import mbc
+from compiler.cache import compile_source
+from compiler.compiledfunction import CompiledFunction
+from compiler.compiler import Bytecode
+from compiler.compiler_exception import CompilerException
+from compiler.vm import VM
+from eval.object import TRUE, make_integer
+
+CODE = """
+let add = function(x, y) { let z = x + y; z };
+let twice = function(f, x) { f(x, x) };
+let big = 123456789012345678901234567890;
+[twice(add, 2), -big, big * 2 - 1, "héllo 😀", {"k": -1}["k"], 0 - 128, 127 + 129]
+"""
+
+
+def run(bytecode):
+    vm = VM(bytecode)
+    vm.run()
+    return vm.last_pop().inspect()
+
+
+def test_mbc_round_trip():
+    bytecode = compile_source(CODE)
+    data = mbc.dumps(bytecode, {"source": CODE.encode()})
+    loaded, sections = mbc.loads_with_sections(data)
+    assert loaded.instructions == bytecode.instructions
+    assert loaded.constants == bytecode.constants
+    functions = [const for const in loaded.constants if isinstance(const, CompiledFunction)]
+    assert [(f.num_locals, f.num_args) for f in functions] == \
+        [(f.num_locals, f.num_args) for f in bytecode.constants if isinstance(f, CompiledFunction)]
+    assert sections == {"source": CODE.encode()}
+    assert run(loaded) == run(compile_source(CODE))
+    # memoryviews and files read the same
+    assert mbc.loads(memoryview(data)).constants == bytecode.constants
+    file = io.BytesIO()
+    mbc.dump(bytecode, file)
+    file.seek(0)
+    assert mbc.load(file).instructions == bytecode.instructions
+    # small integers come back as the cached objects
+    assert mbc.loads(mbc.dumps(Bytecode(constants=[make_integer(7)]))).constants[0] is make_integer(7)
+
+
+def test_mbc_refused(monkeypatch):
+    data = mbc.dumps(compile_source(CODE))
+    with pytest.raises(CompilerException, match="magic"):
+        mbc.loads(b"\x00" + data[1:])
+    with pytest.raises(CompilerException, match="truncated"):
+        mbc.loads(data[:mbc.HEADER.size + 4])
+    # a pool cut short, with a header saying so: the last constant runs
+    # past the end of the data
+    fields = list(mbc.HEADER.unpack_from(data))
+    fields[-2] -= 3
+    fields[-1] = 0
+    cut = mbc.HEADER.pack(*fields) + data[mbc.HEADER.size:mbc.HEADER.size + fields[5] + 4 * fields[6] + fields[7]]
+    with pytest.raises(CompilerException, match="truncated"):
+        mbc.loads(cut)
+    with pytest.raises(CompilerException, match="truncated"):
+        mbc.loads_with_sections(mbc.dumps(compile_source(CODE), {"source": b"let a = 1;"})[:-1])
+    with pytest.raises(CompilerException):
+        mbc.dumps(Bytecode(constants=[TRUE]))
+    monkeypatch.setattr(mbc, "OPCODE_TABLE_HASH", "0" * 64)
+    with pytest.raises(CompilerException, match="opcode table"):
+        mbc.loads(data)
+
+
+def test_mbc_compile_file(tmp_path):
+    source = tmp_path / "prog.monkey"
+    source.write_text(CODE)
+    path = mbc.compile_file(str(source))
+    assert path == str(tmp_path / "prog.mbc")
+    assert mbc.run_file(path).inspect() == run(compile_source(CODE))
+    with open(path, "rb") as file:
+        assert mbc.loads_with_sections(file.read())[1]["file"] == b"prog.monkey"
+    stripped = mbc.compile_file(str(source), str(tmp_path / "stripped.mbc"), debug=False)
+    with open(stripped, "rb") as file:
+        assert mbc.loads_with_sections(file.read())[1] == {}
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
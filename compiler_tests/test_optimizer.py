@@ -0,0 +1,157 @@
+import time
+
+from compiler.code import OpCode
+from compiler.compiledfunction import CompiledFunction
+from compiler.compiler import CompileScope, Compiler
+from compiler.make import make
+from compiler.optimizer import optimize_bytecode
+from compiler.superinstruction import fuse_bytecode
+from compiler.symtable import SymTable
+from compiler.vm import VM
+from compiler_tests.utils import parse
+from eval.object import Integer, String
+
+
+def optimized(code: str):
+    compiler = Compiler()
+    compiler.compile(parse(code))
+    return optimize_bytecode(compiler.bytecodes())
+
+
+def test_optimizer():
+    tests = [
+        {
+            "input": "1 + 2 * 3",
+            "expected_instructions": [
+                make(OpCode.CONST, 4),
+                make(OpCode.POP),
+            ],
+            "folded": Integer(7),
+        },
+        {
+            "input": '"a" + "b"',
+            "expected_instructions": [
+                make(OpCode.CONST, 2),
+                make(OpCode.POP),
+            ],
+            "folded": String("ab"),
+        },
+        {
+            # the condition folds to true, the result of the program is kept
+            "input": "1 < 2; 3",
+            "expected_instructions": [
+                make(OpCode.CONST, 2),
+                make(OpCode.POP),
+            ],
+        },
+        {
+            "input": "!true == false; -5",
+            "expected_instructions": [
+                make(OpCode.CONST, 1),
+                make(OpCode.POP),
+            ],
+            "folded": Integer(-5),
+        },
+        {
+            # division by zero is left for the vm to fail on
+            "input": "1 / 0",
+            "expected_instructions": [
+                make(OpCode.CONST, 0),
+                make(OpCode.CONST, 1),
+                make(OpCode.DIV),
+                make(OpCode.POP),
+            ],
+        },
+    ]
+    for test in tests:
+        bytecode = optimized(test["input"])
+        assert bytecode.instructions == b''.join(
+            test["expected_instructions"]), test["input"]
+        if "folded" in test:
+            assert bytecode.constants[-1] == test["folded"]
+
+
+def test_optimizer_jumps():
+    # the else branch target and the end of the if are rewritten
+    bytecode = optimized("if (true) { 10 } else { 20 }; 3333;")
+    assert bytecode.instructions == b''.join([
+        make(OpCode.TRUE),  # 0000
+        make(OpCode.JUMP_IF_NOT_TRUE, 10),  # 0001
+        make(OpCode.CONST, 0),  # 0004
+        make(OpCode.JUMP, 13),  # 0007
+        make(OpCode.CONST, 1),  # 0010
+        make(OpCode.POP),  # 0013
+        make(OpCode.CONST, 2),  # 0014
+        make(OpCode.POP),  # 0017
+    ])
+
+
+def test_optimizer_dead_code():
+    bytecode = optimized("function() { return 1; 2; 3 }")
+    function = bytecode.constants[3]
+    assert function.instructions == b''.join([
+        make(OpCode.CONST, 0),
+        make(OpCode.RETURN),
+    ])
+
+
+def test_optimizer_long_chains():
+    # a chain of constants folds in one pass, not one pass per term
+    terms = 5000
+    started = time.perf_counter()
+    bytecode = optimized("let f = function() { " + " - ".join(["2"] * terms) + " }; f() + " + " + ".join(["1"] * terms))
+    assert time.perf_counter() - started < 2
+    function = [const for const in bytecode.constants if isinstance(const, CompiledFunction)][0]
+    assert len(function.instructions) == len(make(OpCode.CONST, 0) + make(OpCode.RETURN))
+    vm = VM(bytecode)
+    vm.run()
+    assert vm.last_pop().value == 2 - 2 * (terms - 1) + terms
+
+
+def test_optimizer_shared_pool():
+    # inputs of the repl (main_2.py) share one constant pool, the functions
+    # of earlier inputs are not optimized and fused again
+    constants = []
+    symtable = SymTable()
+    globals = []
+
+    def run(code):
+        compiler = Compiler()
+        compiler.scopes = [CompileScope(symtable)]
+        compiler.constants = constants
+        compiler.index_constants()
+        start = len(constants)
+        compiler.compile(parse(code))
+        bytecode = fuse_bytecode(optimize_bytecode(compiler.bytecodes(), start), start)
+        constants[:] = bytecode.constants
+        vm = VM(bytecode)
+        vm.globals = globals
+        vm.run()
+        return vm.last_pop().value
+
+    assert run("let f = function(x) { x + 1 + 2 }; f(1)") == 4
+    function = [const for const in constants if isinstance(const, CompiledFunction)][0]
+    assert run("f(2) + 2 * 3") == 11
+    functions = [const for const in constants if isinstance(const, CompiledFunction)]
+    assert len(functions) == 1 and functions[0] is function
+    # still decoded from its first call
+    assert function._code is not None
+
+
+def test_vm_optimized():
+    codes = [
+        ["50 / 2 * 2 + 10 - 5", 55],
+        ["(5 + 10 * 2 + 15 / 3) * 2 + -10", 50],
+        ["if (1 > 2) { 10 } else { 20 }", 20],
+        ["if ((1 < 2) == true) { 10 }", 10],
+        ["if (false) { 10 }", "Null"],
+        ["let earlyExit = function() { return 99; 100; };earlyExit();", 99],
+        ["let f = function(a) { if (a > 1) { 1; 2; a } else { 3; a } }; f(5) + f(0)", 5],
+        ['"Hello, " + "World!"', "Hello, World!"],
+        ["let f = function(g, n) { if (n < 2) { return n; }; g(g, n - 1) + g(g, n - 2) }; f(f, 10)", 55],
+    ]
+    for code, expect in codes:
+        for bytecode in (optimized(code), fuse_bytecode(optimized(code))):
+            vm = VM(bytecode)
+            vm.run()
+            assert vm.last_pop().value == expect, code
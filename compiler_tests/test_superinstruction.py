@@ -0,0 +1,80 @@
+from compiler.code import OpCode
+from compiler.compiledfunction import CompiledFunction
+from compiler.compiler import Compiler
+from compiler.make import make
+from compiler.opcode_profile import OpcodeProfile, ProfilingVM, profile_source
+from compiler.superinstruction import fuse, fuse_bytecode
+from compiler.vm import VM
+from compiler_tests.utils import parse
+
+
+def test_fuse():
+    bytecode = b''.join([
+        make(OpCode.GETLOCAL, 0),  # 0000
+        make(OpCode.CONST, 1),  # 0003
+        make(OpCode.GT),  # 0006
+        make(OpCode.JUMP_IF_NOT_TRUE, 17),  # 0007
+        make(OpCode.GETLOCAL, 0),  # 0010
+        make(OpCode.CONST, 2),  # 0013
+        make(OpCode.SUB),  # 0016
+        make(OpCode.RETURN),  # 0017
+    ])
+    assert fuse(bytecode) == b''.join([
+        make(OpCode.GETLOCAL_CONST_GT_JUMP_IF_NOT_TRUE, 0, 1, 12),  # 0000
+        make(OpCode.GETLOCAL_CONST_SUB, 0, 2),  # 0007
+        make(OpCode.RETURN),  # 0012
+    ])
+
+
+def test_fuse_keeps_jump_targets():
+    # the second GETLOCAL is a jump target, fusing it away would break the jump
+    bytecode = b''.join([
+        make(OpCode.JUMP, 6),  # 0000
+        make(OpCode.GETLOCAL, 0),  # 0003
+        make(OpCode.GETLOCAL, 1),  # 0006
+    ])
+    assert fuse(bytecode) == bytecode
+
+
+def test_vm_superinstructions():
+    codes = [
+        ["let f = function(a, b) { if (a > b) { a } else { b } }; f(1, 2)", 2],
+        ["let f = function(a) { if (a > 1) { a + 1 } else { a - 1 } }; f(5)", 6],
+        ["let f = function(a) { if (a < 1) { a + 1 } else { a - 1 } }; f(5)", 4],
+        ["let f = function(a, b) { if (a == b) { 1 } else { 0 } }; f(3, 3)", 1],
+        ["let f = function(g, n) { if (n < 2) { return n; }; g(g, n - 1) + g(g, n - 2) }; f(f, 10)", 55],
+    ]
+    for code, expect in codes:
+        compiler = Compiler()
+        compiler.compile(parse(code))
+        vm = VM(fuse_bytecode(compiler.bytecodes()))
+        vm.run()
+        assert vm.last_pop().value == expect, code
+
+
+def test_opcode_profile():
+    profile = OpcodeProfile()
+    for op in [OpCode.GETLOCAL, OpCode.GETLOCAL, OpCode.GETLOCAL, OpCode.ADD]:
+        profile.record(op.value)
+    assert profile.most_common_pairs(1) == [(("GETLOCAL", "GETLOCAL"), 2)]
+    assert profile.most_common_triples(2) == [
+        (("GETLOCAL", "GETLOCAL", "GETLOCAL"), 1),
+        (("GETLOCAL", "GETLOCAL", "ADD"), 1),
+    ]
+    profile = profile_source(
+        "let f = function(a) { a + 1 }; f(1); f(2);", superinstructions=True)
+    assert profile.singles[OpCode.GETLOCAL_CONST_ADD.value] == 2
+    # every executed instruction is counted once, jumps and calls included
+    compiler = Compiler()
+    compiler.compile(parse("let f = function(n) { if (n == 0) { 0 } else { f(n - 1) } }; f(3)"))
+    bytecode = compiler.bytecodes()
+    vm = ProfilingVM(bytecode)
+    vm.run()
+    assert vm.last_pop().value == 0
+    assert vm.profile.singles[OpCode.EQ.value] == 4
+    assert vm.profile.singles[OpCode.TAIL_CALL.value] == 3
+    assert vm.profile.singles[OpCode.JUMP_IF_NOT_TRUE.value] == 4
+    assert vm.profile.singles[OpCode.RETURN.value] == 1
+    # the functions run unprofiled again afterwards
+    function = [const for const in bytecode.constants if isinstance(const, CompiledFunction)][0]
+    assert type(function.code) is list
@@ -2,9 +2,19 @@
 import pytest
 from compiler.vm import VM
 from compiler_tests.utils import parse
+from compiler.code import OpCode
+from compiler.make import disassemble
 from compiler.compiler import Compiler
+from compiler.compiler_exception import StackOverflowException
+from compiler.pipeline import Pipeline, PipelinePool
+from compiler.builtin_funcs import BuiltinWrapper
+from compiler.closure import Closure
+from compiler.compiledfunction import CompiledFunction
+from compiler.frame import Frame
 from eval.eval import NULL
-from eval.object import Array, Hash, Integer, Boolean
+from lexer.lexer import Lexer
+from parser.parser import Parser
+from eval.object import FALSE, TRUE, Array, Hash, Integer, Boolean, String, make_integer
 
 
 def test_vm_top():
@@ -94,6 +104,10 @@ def test_vm_top():
         ["{1: 1, 2: 2}[1]", 1],
         ["{1: 1, 2: 2}[2]", 2],
         ["{1: 1}[0]", "Null"],
+        ["{1: 1, true: 2}[true]", 2],
+        ["{1: 1, true: 2}[1]", 1],
+        ['{"1": 1}[1]', "Null"],
+        ['let h = {"a": {"b": [1, {"c": 7}]}}; h["a"]["b"][1]["c"]', 7],
         ["{}[0]", "Null"],
         # function call test
         ["let identity = function() {5 }; identity()", 5],
@@ -172,8 +186,7 @@ def test_vm_top():
                 hash_obj = vm.last_pop()
                 assert isinstance(hash_obj, Hash)
                 hash_obj = hash_obj.pairs
-                hash_obj = {v.key.value: v.value.value for k,
-                            v in hash_obj.items()}
+                hash_obj = {k.value: v.value for k, v in hash_obj.values()}
                 assert hash_obj == expect
             else:
                 assert hasattr(vm.last_pop(), "value")
@@ -184,3 +197,179 @@ def test_vm_top():
             print(compiler.bytecodes().to_string())
 
             raise e
+
+
+def test_vm_wide_operands():
+    # more than 65535 constants and globals
+    code = "".join(f"let x{i} = {i};" for i in range(70000)) + "x69999"
+    compiler = Compiler()
+    compiler.compile(parse(code))
+    assert len(compiler.constants) == 70000
+    vm = VM(compiler.bytecodes())
+    vm.run()
+    assert vm.last_pop().value == 69999
+    # jumps past 64KB of bytecode in one function
+    body = "1; " * 20000
+    code = f"let f = function(x) {{ if (x) {{ {body} 2 }} else {{ {body} 3 }} }}; f(true) + f(false)"
+    compiler = Compiler()
+    compiler.compile(parse(code))
+    assert len(compiler.constants[-1].instructions) > 0xFFFF * 2
+    vm = VM(compiler.bytecodes())
+    vm.run()
+    assert vm.last_pop().value == 5
+
+
+def test_vm_canonical_values():
+    codes = [
+        ["1 + 1", make_integer(2)],
+        ["let f = function(a) { a - 1 }; f(3)", make_integer(2)],
+        ["1 < 2", TRUE],
+        ["1 == 2", FALSE],
+        ["if (false) { 1 }", NULL],
+        ["first([])", NULL],
+    ]
+    for code, expect in codes:
+        compiler = Compiler()
+        compiler.compile(parse(code))
+        vm = VM(compiler.bytecodes())
+        vm.run()
+        assert vm.last_pop() is expect, code
+    compiler = Compiler()
+    compiler.compile(parse('"a" + "b"'))
+    vm = VM(compiler.bytecodes())
+    vm.run()
+    assert vm.last_pop() == String("ab")
+
+
+def test_vm_objects_have_no_dict():
+    function = CompiledFunction(b'')
+    for obj in [function, Closure(function, []), Frame([]), BuiltinWrapper.generate_from_index(0)]:
+        assert not hasattr(obj, "__dict__"), type(obj).__name__
+
+
+def test_vm_hash_order():
+    compiler = Compiler()
+    compiler.compile(parse('{"b": 1, "a": 2, 3: 3, false: 4}'))
+    vm = VM(compiler.bytecodes())
+    vm.run()
+    assert list(vm.last_pop().inspect()) == ["b", "a", 3, False]
+
+
+def test_vm_scoping():
+    codes = [
+        ["let fact = function(n) { if (n == 0) { 1 } else { n * fact(n - 1) } }; fact(5)", 120],
+        ["let x = 1; let f = function(x) { x * 2 }; f(5)", 10],
+        ["let f = function(len) { len + 1 }; f(1)", 2],
+    ]
+    for code, expect in codes:
+        compiler = Compiler()
+        compiler.compile(parse(code))
+        vm = VM(compiler.bytecodes())
+        vm.run()
+        assert vm.last_pop().value == expect, code
+    with pytest.raises(Exception, match="already exists in this scope"):
+        Compiler().compile(parse("let f = function(a) { let a = 1; a }"))
+
+
+def test_vm_tail_calls():
+    codes = [
+        ["let count = function(n) { if (n == 0) { return 0; }; count(n - 1) }; count(100000)", 0],
+        ["let sum = function(n, acc) { if (n == 0) { acc } else { sum(n - 1, acc + n) } }; sum(100000, 0)", 5000050000],
+        ["let sum = function(n, acc) { if (n == 0) { return acc; }; return sum(n - 1, acc + n); }; sum(100000, 0)", 5000050000],
+        ["let f = function(a) { len(a) }; f([1, 2, 3])", 3],
+        ["let g = function(a, b) { a - b }; let f = function(a) { let b = 1; g(a, b) }; f(5)", 4],
+    ]
+    for code, expect in codes:
+        compiler = Compiler()
+        compiler.compile(parse(code))
+        assert any(op_code == OpCode.TAIL_CALL for const in compiler.constants
+                   if isinstance(const, CompiledFunction)
+                   for op_code, _ in disassemble(const.instructions)), code
+        vm = VM(compiler.bytecodes())
+        vm.run()
+        assert vm.last_pop().value == expect, code
+        # the frames were reused, the stack never grew with the recursion
+        assert len(vm.stack) < 100, code
+
+
+def test_vm_deep_nesting():
+    # trees deeper than the python recursion limit compile
+    depth = 5000
+    codes = [
+        [" + ".join(["1"] * depth), depth],
+        ["[" * depth + "1" + "]" * depth + "[0]" * depth, 1],
+        ["{1: " * depth + "2" + "}" * depth + "[1]" * depth, 2],
+    ]
+    for code, expect in codes:
+        compiler = Compiler()
+        compiler.compile(parse(code))
+        vm = VM(compiler.bytecodes())
+        vm.run()
+        assert vm.last_pop().value == expect, code[:40]
+
+
+def test_vm_pipeline():
+    code = 'let a = 2; let f = function(x) { x * a }; f(3); let b = [f(1), "s"]; b; len(b) + a'
+    lexer = Lexer(code)
+    results = Pipeline().run_all(Parser(lexer).parse_statements())
+    assert next(results) is NULL
+    assert next(results) is NULL
+    assert next(results).value == 6
+    # the rest of the source is not lexed yet
+    assert lexer.position < len(code) - 10
+    assert [result.inspect() for result in results] == ["Null", [2, "s"], 4]
+    # a statement failing inside a function body leaves the next ones at
+    # the global scope
+    pipeline = Pipeline()
+    pipeline.run(parse("let a = 5;").statements[0])
+    with pytest.raises(Exception):
+        pipeline.run(parse("let f = function() { nope };").statements[0])
+    results = pipeline.run_all(parse("let c = 1; let g = function() { c + a }; g()").statements)
+    assert [result.inspect() for result in results] == ["Null", "Null", 6]
+
+
+def test_vm_lazy_frames_and_globals():
+    compiler = Compiler()
+    compiler.compile(parse("let a = 1; let down = function(n) { if (n == 0) { a } else { a + down(n - 1) } }; down(500)"))
+    vm = VM(compiler.bytecodes())
+    assert len(vm.globals) == 2
+    assert len(vm.frame_stack) == 1
+    vm.run()
+    assert vm.last_pop().value == 501
+    assert len(vm.frame_stack) == 502
+    # no tail call, every call needs a frame
+    compiler = Compiler()
+    compiler.compile(parse("let f = function(n) { 1 + f(n + 1) }; f(0)"))
+    vm = VM(compiler.bytecodes(), max_frames=100)
+    with pytest.raises(StackOverflowException):
+        vm.run()
+    assert len(vm.frame_stack) == 100
+
+
+def test_vm_snapshot_and_pool():
+    def run(pipeline, code):
+        return [value.inspect() for value in pipeline.run_all(Parser(Lexer(code)).parse_statements())][-1]
+
+    prelude = Pipeline()
+    run(prelude, 'let scale = 10; let f = function(x) { x * scale }; let names = ["a", "b"];')
+    snapshot = prelude.snapshot()
+    first = snapshot.clone()
+    assert run(first, "let scale = 2; let g = function(x) { f(x) + 1 }; g(3)") == 31
+    assert run(first, 'push(names, "c")') == ["a", "b", "c"]
+    # nothing the first clone did shows up in the next one or the prelude
+    second = snapshot.clone()
+    assert run(second, "f(3) + scale") == 40
+    assert run(second, "len(names)") == 2
+    assert run(prelude, "scale") == 10
+    assert len(second.compiler.constants) == len(snapshot.constants) + 1
+
+    pool = PipelinePool(snapshot, size=1)
+    with pool.pipeline() as pipeline:
+        assert run(pipeline, "let scale = 3; f(1)") == 10
+    with pytest.raises(Exception):
+        with pool.pipeline() as again:
+            assert again is pipeline
+            run(again, "let scale = 5; f(1, 2)")
+    with pool.pipeline() as again:
+        assert again is pipeline
+        assert run(again, "scale") == 10
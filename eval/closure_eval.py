@@ -0,0 +1,469 @@
+import operator
+import weakref
+from types import NoneType
+from typing import Callable, Dict, List, Optional, Tuple
+
+from eval.builtin_func import BuiltinFunction
+from eval.env import MISSING, Environment
+from eval.eval import TailCall, default_env, handleBang, handleInfix, indexValue, quote, ycEval
+from eval.object import *
+from eval.resolver import Scope
+from parser.node import *
+
+# closure compilation mode, a drop-in for ycEval:
+#   closureEval(program, env)
+# the AST is walked once by compileNode, every node becomes a python closure
+# taking the environment, with its children compiled, names and operators
+# looked up ahead of time. names bound in functions are read from array
+# backed frames by their (depth, slot) coordinate, see eval/resolver.py.
+# running a program is calling the root closure.
+# values, Environment and Function objects are the ones ycEval uses, so the
+# two modes and the macro expansion (which runs on ycEval) can be mixed.
+
+Code = Callable[[Environment], ycObject]
+
+
+class ReturnSignal(Exception):
+    # a return statement which is not the last thing its function runs,
+    # caught where the function call or the program ends
+    def __init__(self, value: ycObject):
+        self.value = value
+
+
+class ClosureFunction(Function):
+    __slots__ = ("scope", "code")
+
+    # a Function carrying its compiled body, ycEval can still apply it.
+    # scope lays out the frame the body runs in
+    def __init__(self, params: List[Identifier], body: BlockStatement, env: Environment, scope: Scope, code: Code):
+        super().__init__(params, body, env)
+        self.scope = scope
+        self.code = code
+
+    def __reduce__(self):
+        # the compiled body is python closures, it is pickled as the plain
+        # Function and compiled again on its first call
+        return (Function, (self.params, self.body, self.env))
+
+
+# integer fast paths of handleInfix, by token type
+IntegerArithmetic: Dict[TokenTypes, Callable] = {
+    TokenTypes.PLUS: operator.add,
+    TokenTypes.MINUS: operator.sub,
+    TokenTypes.ASTERISK: operator.mul,
+}
+IntegerComparison: Dict[TokenTypes, Callable] = {
+    TokenTypes.EQ: operator.eq,
+    TokenTypes.NOT_EQ: operator.ne,
+    TokenTypes.GT: operator.gt,
+    TokenTypes.LT: operator.lt,
+    TokenTypes.GTE: operator.ge,
+    TokenTypes.LTE: operator.le,
+}
+
+# bodies of Function objects created by ycEval, compiled on their first call
+# through closureEval. block statements compare by value and can't be dict
+# keys, the entry is keyed by id and dropped when its body is collected
+_body_codes: Dict[int, Tuple[weakref.ref, Scope, Code]] = {}
+
+
+def compileBody(body: BlockStatement, params: List[Identifier]) -> Tuple[Scope, Code]:
+    key = id(body)
+    entry = _body_codes.get(key)
+    if entry is None or entry[0]() is not body:
+        def drop(ref: weakref.ref):
+            # the id may be taken by a newer body by now
+            if key in _body_codes and _body_codes[key][0] is ref:
+                del _body_codes[key]
+        function_scope = Scope.of_function(params, body, None)
+        entry = (weakref.ref(body, drop), function_scope,
+                 compileStatements(body.statements, function_scope, tail=True))
+        _body_codes[key] = entry
+    return entry[1], entry[2]
+
+
+def constant(value: ycObject) -> Code:
+    return lambda env: value
+
+
+def compileStatements(statements: List[Statement], scope: Optional[Scope], tail: bool) -> Code:
+    # tail: the value of the block is the value of its function, a return
+    # as its last statement can simply produce the value
+    codes = [compileNode(stmt, scope) for stmt in statements[:-1]]
+    if statements:
+        codes.append(compileTail(statements[-1], scope) if tail else compileNode(statements[-1], scope))
+    if not codes:
+        return constant(NULL)
+    if len(codes) == 1:
+        return codes[0]
+
+    def block(env: Environment):
+        result = NULL
+        for code in codes:
+            result = code(env)
+            if type(result) is Error:
+                return result
+        return result
+    return block
+
+
+def compileTail(stmt: Statement, scope: Optional[Scope]) -> Code:
+    expression = stmt.expression if isinstance(stmt, ExpressionStatement) else None
+    if isinstance(stmt, ReturnStatement) and stmt.return_value is not None:
+        expression = stmt.return_value
+    if isinstance(expression, IfExpression):
+        return compileIfExpression(expression, scope, tail=True)
+    # calls are only left to callFunction inside functions, the top level
+    # of a program has nobody to run them
+    if isinstance(expression, CallExpression) and scope is not None:
+        return compileCallExpression(expression, scope, tail=True)
+    if expression is not None:
+        return compileNode(expression, scope)
+    return compileNode(stmt, scope)
+
+
+def compileProgram(program: Program, scope: Optional[Scope]) -> Code:
+    return compileStatements(program.statements, scope, tail=True)
+
+
+def compileBlockStatement(block: BlockStatement, scope: Optional[Scope]) -> Code:
+    return compileStatements(block.statements, scope, tail=False)
+
+
+def compileExpressionStatement(stmt: ExpressionStatement, scope: Optional[Scope]) -> Code:
+    return compileNode(stmt.expression, scope)
+
+
+def compileBoolean(bool_node: BooleanLiteral, scope: Optional[Scope]) -> Code:
+    return constant(TRUE if bool_node.value else FALSE)
+
+
+def compileInteger(int_node: IntegerLiteral, scope: Optional[Scope]) -> Code:
+    return constant(make_integer(int_node.value))
+
+
+def compileString(string_node: StringLiteral, scope: Optional[Scope]) -> Code:
+    return constant(String(string_node.value))
+
+
+def compilePrefixExpression(prefix_exp: PreFixExpression, scope: Optional[Scope]) -> Code:
+    if prefix_exp.right is None or prefix_exp.token is None:
+        return constant(NULL)
+    right = compileNode(prefix_exp.right, scope)
+    literal = prefix_exp.token.Literal
+    match prefix_exp.token.TokenType:
+        case TokenTypes.MINUS:
+            def minus(env: Environment):
+                right_val = right(env)
+                if isinstance(right_val, Integer):
+                    return make_integer(-right_val.value)
+                return Error(f"unknown operator: {literal}{right_val.type()}")
+            return minus
+        case TokenTypes.BANG:
+            return lambda env: handleBang(right(env))
+        case _:
+            return lambda env: Error(f"unknown operator: {literal}{right(env).type()}")
+
+
+def compileInfixExpression(infix_exp: InfixExpression, scope: Optional[Scope]) -> Code:
+    if infix_exp.left is None or infix_exp.right is None:
+        return constant(NULL)
+    left = compileNode(infix_exp.left, scope)
+    right = compileNode(infix_exp.right, scope)
+    token = infix_exp.token
+    # like evalInfixExpression the right operand runs first
+    if token.TokenType in IntegerArithmetic:
+        arithmetic = IntegerArithmetic[token.TokenType]
+
+        def infix(env: Environment):
+            right_val = right(env)
+            left_val = left(env)
+            if type(left_val) is Integer and type(right_val) is Integer:
+                return make_integer(arithmetic(left_val.value, right_val.value))
+            return handleInfix(token, left_val, right_val)
+        return infix
+    if token.TokenType in IntegerComparison:
+        comparison = IntegerComparison[token.TokenType]
+
+        def infix(env: Environment):
+            right_val = right(env)
+            left_val = left(env)
+            if type(left_val) is Integer and type(right_val) is Integer:
+                return TRUE if comparison(left_val.value, right_val.value) else FALSE
+            return handleInfix(token, left_val, right_val)
+        return infix
+
+    def infix(env: Environment):
+        right_val = right(env)
+        return handleInfix(token, left(env), right_val)
+    return infix
+
+
+def compileIfExpression(if_exp: IfExpression, scope: Optional[Scope], tail: bool = False) -> Code:
+    if not if_exp.condition:
+        return constant(NULL)
+    condition = compileNode(if_exp.condition, scope)
+    true_branch = compileStatements(if_exp.true_branch.statements, scope, tail) if if_exp.true_branch else constant(NULL)
+    false_branch = compileStatements(if_exp.false_branch.statements, scope, tail) if if_exp.false_branch else constant(NULL)
+
+    def if_expression(env: Environment):
+        # isTrue, inlined
+        value = condition(env)
+        if value is FALSE or value is NULL:
+            return false_branch(env)
+        return true_branch(env)
+    return if_expression
+
+
+def compileReturnStatement(ret_stmt: ReturnStatement, scope: Optional[Scope]) -> Code:
+    if isinstance(ret_stmt.return_value, CallExpression) and scope is not None:
+        # "return f(x)" is a tail call wherever it is
+        value = compileCallExpression(ret_stmt.return_value, scope, tail=True)
+    else:
+        value = compileNode(ret_stmt.return_value, scope) if ret_stmt.return_value else constant(NULL)
+
+    def return_statement(env: Environment):
+        raise ReturnSignal(value(env))
+    return return_statement
+
+
+def compileLetStatement(let_stmt: LetStatement, scope: Optional[Scope]) -> Code:
+    name = let_stmt.identifier.value
+    right = compileNode(let_stmt.right_expression, scope)
+    if scope is None:
+        def let_statement(env: Environment):
+            right_obj = right(env)
+            if type(right_obj) is Error:
+                return right_obj
+            if env.has_key(name):
+                return Error(f"identifier {name} already declared in this scope")
+            env.set_var(name, right_obj)
+            return NULL
+        return let_statement
+    slot = scope.index[name]
+
+    def let_slot(env: Environment):
+        right_obj = right(env)
+        if type(right_obj) is Error:
+            return right_obj
+        if env.slots[slot] is not None:
+            return Error(f"identifier {name} already declared in this scope")
+        env.slots[slot] = right_obj
+        return NULL
+    return let_slot
+
+
+def compileIdentifier(identifier: Identifier, scope: Optional[Scope]) -> Code:
+    name = identifier.value
+    builtin = BuiltinFunction.get(name)
+
+    def by_name(env: Environment):
+        value = env.find(name) if env is not None else MISSING
+        if value is not MISSING:
+            return value
+        if builtin is not None:
+            return builtin
+        return Error(f"identifier not found:{name}")
+
+    coordinate = scope.resolve(name) if scope is not None else None
+    if coordinate is None:
+        # not bound by any enclosing function, start by name from the
+        # environment the outermost function was created in
+        depth = scope.depth() if scope is not None else 0
+        if depth == 0:
+            return by_name
+        if depth == 1:
+            return lambda env: by_name(env.outer_env)
+
+        def free(env: Environment):
+            for _ in range(depth):
+                env = env.outer_env
+            return by_name(env)
+        return free
+    depth, slot = coordinate
+    if depth == 0:
+        def local(env: Environment):
+            value = env.slots[slot]
+            if value is None:
+                return by_name(env.outer_env)
+            return value
+        return local
+    if depth == 1:
+        def enclosing(env: Environment):
+            env = env.outer_env
+            value = env.slots[slot]
+            if value is None:
+                return by_name(env.outer_env)
+            return value
+        return enclosing
+
+    def outer(env: Environment):
+        for _ in range(depth):
+            env = env.outer_env
+        value = env.slots[slot]
+        if value is None:
+            return by_name(env.outer_env)
+        return value
+    return outer
+
+
+def compileFunctionLiteral(func_lit: FunctionLiteral, scope: Optional[Scope]) -> Code:
+    params = [param for param in func_lit.parameters]
+    body = func_lit.body
+    function_scope = Scope.of_function(params, body, scope)
+    code = compileStatements(body.statements, function_scope, tail=True)
+    return lambda env: ClosureFunction(params, body, env, function_scope, code)
+
+
+def callFunction(function: Function | Builtin, args: List[ycObject]) -> ycObject:
+    # a body ending in a call returns it as a TailCall, the loop runs it
+    # here instead of nesting python calls
+    while True:
+        if type(function) is ClosureFunction:
+            function_scope = function.scope
+            code = function.code
+        elif isinstance(function, Function):
+            function_scope, code = compileBody(function.body, function.params)
+        else:
+            return function.fn(*args)
+        if len(args) != function_scope.num_params:
+            return Error("wrong number of arguments: expected " + str(function_scope.num_params) + ", got " + str(len(args)))
+        if not function_scope.unique_params:
+            slots = [None] * function_scope.frame_size
+            for param, arg in zip(function.params, args):
+                slots[function_scope.index[param.value]] = arg
+        elif function_scope.frame_size > len(args):
+            slots = args + [None] * (function_scope.frame_size - len(args))
+        else:
+            # args is a new list made by the call, it becomes the frame
+            slots = args
+        try:
+            result = code(function.env.extended_with_slots(function_scope.index, slots))
+        except ReturnSignal as signal:
+            result = signal.value
+        if type(result) is not TailCall:
+            return result
+        function, args = result.function, result.args
+
+
+def compileCallExpression(call: CallExpression, scope: Optional[Scope], tail: bool = False) -> Code:
+    # tail: the call ends a function body, it evaluates to a TailCall for
+    # callFunction to run
+    if call.function is None:
+        return constant(Error("function not found"))
+    if isinstance(call.function, Identifier) and call.function.value == "quote":
+        node = call.parameters[0]
+        return lambda env: quote(node, env)
+    function_code = compileNode(call.function, scope)
+    if call.parameters is None:
+        return lambda env: Error("paralist is None!,function is:" + str(function_code(env)))
+    arg_codes = [compileNode(para, scope) for para in call.parameters]
+
+    def call_expression(env: Environment):
+        function = function_code(env)
+        if not isinstance(function, (Function, Builtin)):
+            if isinstance(function, Error):
+                return function
+            return Error(str(function) + "not a function")
+        return callFunction(function, [arg(env) for arg in arg_codes])
+
+    def tail_call(env: Environment):
+        function = function_code(env)
+        if not isinstance(function, (Function, Builtin)):
+            if isinstance(function, Error):
+                return function
+            return Error(str(function) + "not a function")
+        return TailCall(function, [arg(env) for arg in arg_codes])
+    return tail_call if tail else call_expression
+
+
+def compileArray(array_exp: ArrayExpression, scope: Optional[Scope]) -> Code:
+    if array_exp.elements is None:
+        return constant(NULL)
+    codes = [compileNode(element, scope) for element in array_exp.elements]
+    return lambda env: Array([code(env) for code in codes])
+
+
+def compileIndexExpression(index_exp: IndexExpression, scope: Optional[Scope]) -> Code:
+    if index_exp.left is None or index_exp.index is None:
+        return constant(NULL)
+    left = compileNode(index_exp.left, scope)
+    index = compileNode(index_exp.index, scope)
+    return lambda env: indexValue(left(env), index(env))
+
+
+def compileHashLiteral(hash_exp: HashLiteral, scope: Optional[Scope]) -> Code:
+    if hash_exp.raw_keys is None or hash_exp.raw_values is None:
+        return lambda env: Hash({})
+    codes = [(compileNode(k, scope), compileNode(v, scope))
+             for k, v in zip(hash_exp.raw_keys, hash_exp.raw_values)]
+
+    def hash_literal(env: Environment):
+        pairs = {}
+        for key_code, value_code in codes:
+            hashable = key_code(env)
+            if not isinstance(hashable, HashAble):
+                return Error(f"key is not a valid type: {hashable.type()}")
+            hashkey = hashable.hash_key()
+            if hashkey in pairs:
+                return Error(f"duplicate key: {hashable}")
+            pairs[hashkey] = (hashable, value_code(env))
+        return Hash(pairs)
+    return hash_literal
+
+
+def compileError(error: Error, scope: Optional[Scope]) -> Code:
+    return constant(error)
+
+
+def compileNone(obj: None, scope: Optional[Scope]) -> Code:
+    return constant(NULL)
+
+
+NodeToCompile: Dict[type, Callable[..., Code]] = {
+    BooleanLiteral: compileBoolean,
+    IntegerLiteral: compileInteger,
+    Program: compileProgram,
+    ExpressionStatement: compileExpressionStatement,
+    InfixExpression: compileInfixExpression,
+    PreFixExpression: compilePrefixExpression,
+    IfExpression: compileIfExpression,
+    BlockStatement: compileBlockStatement,
+    ReturnStatement: compileReturnStatement,
+    Error: compileError,
+    LetStatement: compileLetStatement,
+    Identifier: compileIdentifier,
+    FunctionLiteral: compileFunctionLiteral,
+    CallExpression: compileCallExpression,
+    StringLiteral: compileString,
+    ArrayExpression: compileArray,
+    IndexExpression: compileIndexExpression,
+    HashLiteral: compileHashLiteral,
+    NoneType: compileNone,
+}
+
+
+def compileNode(node: Node, scope: Optional[Scope] = None) -> Code:
+    compile_func: Optional[Callable[..., Code]] = NodeToCompile.get(type(node))
+    if compile_func is None:
+        return constant(Error("unknown node type: " + str(type(node))))
+    return compile_func(node, scope)
+
+
+def closureEval(node: Node, env: Environment = default_env) -> ycObject:
+    # ycEval turns any python exception into an Error, closures don't catch
+    # anything on their own, so it is done once here
+    try:
+        code = compileNode(node)
+    except RecursionError:
+        # compileNode recurses once per AST level. a tree too deep for it
+        # runs on ycEval, which keeps its own stack. nothing ran yet
+        return ycEval(node, env)
+    try:
+        return code(env)
+    except ReturnSignal as signal:
+        return signal.value
+    except RecursionError:
+        return Error("stack overflow")
+    except Exception as e:
+        return Error("runtime error: " + str(e))
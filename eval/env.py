@@ -2,41 +2,65 @@ from typing import Any, Dict, List, Optional
 
 from parser.node import Identifier
 
+# returned by Environment.find for a name bound nowhere in the chain
+MISSING = object()
+
 
 class Environment:
-    def __init__(self) -> None:
+    __slots__ = ("variables", "outer_env", "index", "slots")
+
+    # bindings live in variables, by name, or in slots: a function frame of
+    # the closure evaluator holds the bindings the resolver (eval/resolver.py)
+    # found for the function in a list, index maps their names to positions.
+    # a slot is None until its binding is set
+    def __init__(self, index: Optional[Dict[str, int]] = None, slots: Optional[List] = None) -> None:
         self.variables: Dict[Identifier, Any] = {}
         self.outer_env: Optional[Environment] = None
+        self.index: Dict[str, int] = {} if index is None else index
+        self.slots: List = [] if slots is None else slots
 
     def has_key(self, key):
-        return key in self.variables.keys()
+        if key in self.index:
+            return self.slots[self.index[key]] is not None
+        return key in self.variables
 
     def has_key_recursive(self, key):
+        return self.find(key) is not MISSING
+
+    def find(self, key):
+        # the value bound to key in this environment or an outer one,
+        # walking the chain only once
         cur_env = self
         while cur_env is not None:
-            if key in cur_env.variables.keys():
-                return True
-            else:
-                cur_env = cur_env.outer_env
+            if key in cur_env.variables:
+                return cur_env.variables[key]
+            if key in cur_env.index:
+                value = cur_env.slots[cur_env.index[key]]
+                if value is not None:
+                    return value
+            cur_env = cur_env.outer_env
+        return MISSING
 
     def set_var(self, key, value):
-        self.variables[key] = value
+        if key in self.index:
+            self.slots[self.index[key]] = value
+        else:
+            self.variables[key] = value
 
     def set_var_recursive(self, key, value):
-        if key in self.variables.keys():
-            self.variables[key] = value
+        if self.has_key(key):
+            self.set_var(key, value)
         else:
             if self.outer_env is not None:
                 self.outer_env.set_var_recursive(key, value)
 
     def get_var_recursive(self, key):
-        if key in self.variables.keys():
-            return self.variables[key]
-        else:
-            if self.outer_env is not None:
-                return self.outer_env.get_var(key)
+        value = self.find(key)
+        return None if value is MISSING else value
 
     def get_var(self, key):
+        if key in self.index and self.slots[self.index[key]] is not None:
+            return self.slots[self.index[key]]
         return self.variables[key]
 
     def extended_with(self, paras: Dict[Identifier, Any]):
@@ -44,3 +68,8 @@ class Environment:
         new_env.variables = paras
         new_env.outer_env = self
         return new_env
+
+    def extended_with_slots(self, index: Dict[str, int], slots: List):
+        new_env = Environment(index, slots)
+        new_env.outer_env = self
+        return new_env
@@ -1,18 +1,22 @@
 
 
-from types import NoneType
-from typing import Callable, Dict, Hashable
+from types import GeneratorType, NoneType
+from typing import Callable, Dict, Hashable, Iterable, Iterator
 from eval.builtin_func import BuiltinFunction
-from eval.env import Environment
+from eval.env import MISSING, Environment
 from parser.node import Node
 from eval.object import *
 from parser.node import *
 from eval.modify import modify
-NULL = Null()
-TRUE = Boolean(True)
-FALSE = Boolean(False)
 default_env = Environment()
 
+# the eval function of a node with children is a generator: it yields
+# (child, env) for each value it needs and gets the value back, or yields
+# the generator of a helper (a call, a function body) to have it run the same
+# way. ycEval keeps the suspended evaluations on a stack of its own, so deep
+# trees and deep recursion of programs are bounded by memory, not by the
+# python recursion limit
+
 # quote
 def evalUnquote(node: Expression, env: Environment):
     if isinstance(node, CallExpression) and isinstance(node.function, Identifier) and node.function.value == "unquote":
@@ -34,7 +38,7 @@ def evalBoolean(bool_node: BooleanLiteral, env: Environment):
 
 
 def evalInteger(int_node: IntegerLiteral, env: Environment):
-    return Integer(int_node.value)
+    return make_integer(int_node.value)
 
 
 def evalString(string_node: StringLiteral, env: Environment):
@@ -45,14 +49,24 @@ def evalProgram(p_node: Program, env: Environment):
     result: ycObject = NULL
     for stmt in p_node.statements:
 
-        result = ycEval(stmt, env)
+        result = yield stmt, env
         if result.type() == ObjectType.RETURN or result.type() == ObjectType.ERROR:
             return result
     return result
 
 
+def evalStatements(statements: Iterable[Statement], env: Environment) -> Iterator[ycObject]:
+    # evalProgram for statements still being parsed (Parser.parse_statements):
+    # the value of each one as soon as it ran, nothing after a return or an error
+    for stmt in statements:
+        result = ycEval(stmt, env)
+        yield result
+        if result.type() == ObjectType.RETURN or result.type() == ObjectType.ERROR:
+            return
+
+
 def evalExpressionStatement(stmt: ExpressionStatement, env: Environment):
-    return ycEval(stmt.expression, env)
+    return (yield stmt.expression, env)
 
 
 def handleBang(right_val: ycObject):
@@ -93,13 +107,13 @@ def handleInfix(op_token: Token, left_val: ycObject, right_val: ycObject):
         return Error(f"unknown operator: {left_val.type()} {op_token.Literal} {right_val.type()}")
     match op_token.TokenType:
         case TokenTypes.MINUS:
-            return Integer(left_val.value - right_val.value)
+            return make_integer(left_val.value - right_val.value)
         case TokenTypes.PLUS:
-            return Integer(left_val.value + right_val.value)
+            return make_integer(left_val.value + right_val.value)
         case TokenTypes.SLASH:
-            return Integer(left_val.value / right_val.value)
+            return make_integer(left_val.value // right_val.value)
         case TokenTypes.ASTERISK:
-            return Integer(left_val.value * right_val.value)
+            return make_integer(left_val.value * right_val.value)
         case _:
             return Error(f"unknown operator: {left_val.inspect()} {op_token.Literal} {right_val.inspect()}")
 
@@ -107,11 +121,11 @@ def handleInfix(op_token: Token, left_val: ycObject, right_val: ycObject):
 def evalPrefixExpression(prefix_exp: PreFixExpression, env: Environment):
     if prefix_exp.right is None or prefix_exp.token is None:
         return NULL
-    right_val = ycEval(prefix_exp.right, env)
+    right_val = yield prefix_exp.right, env
     match prefix_exp.token.TokenType if prefix_exp.token is not None else None:
         case TokenTypes.MINUS:
             if isinstance(right_val, Integer):
-                return Integer(-right_val.inspect())
+                return make_integer(-right_val.inspect())
             return Error(f"unknown operator: {prefix_exp.token.Literal}{right_val.type()}")
         case TokenTypes.BANG:
             return handleBang(right_val)
@@ -122,8 +136,8 @@ def evalPrefixExpression(prefix_exp: PreFixExpression, env: Environment):
 def evalInfixExpression(infix_exp: InfixExpression, env: Environment):
     if infix_exp.left is None or infix_exp.right is None:
         return NULL
-    right_val = ycEval(infix_exp.right, env)
-    left_val = ycEval(infix_exp.left, env)
+    right_val = yield infix_exp.right, env
+    left_val = yield infix_exp.left, env
 
     return handleInfix(infix_exp.token, left_val, right_val)
 
@@ -142,19 +156,19 @@ def isTrue(r: ycObject):
 def evalIfExpression(if_exp: IfExpression, env: Environment):
     if not if_exp.condition:
         return NULL
-    if isTrue(ycEval(if_exp.condition, env)):
+    if isTrue((yield if_exp.condition, env)):
         if if_exp.true_branch:
-            return ycEval(if_exp.true_branch, env)
+            return (yield if_exp.true_branch, env)
     else:
         if if_exp.false_branch:
-            return ycEval(if_exp.false_branch, env)
+            return (yield if_exp.false_branch, env)
     return NULL
 
 
 def evalReturnStatement(ret_stmt: ReturnStatement, env: Environment):
     if not ret_stmt.return_value:
         return None
-    return ReturnObject(ycEval(ret_stmt.return_value, env))
+    return ReturnObject((yield ret_stmt.return_value, env))
 
 
 def evalError(error: Error):
@@ -162,7 +176,7 @@ def evalError(error: Error):
 
 
 def evalLetStatement(let_stmt: LetStatement, env: Environment):
-    right_obj = ycEval(let_stmt.right_expression, env)
+    right_obj = yield let_stmt.right_expression, env
     if right_obj.type() == ObjectType.ERROR:
         return right_obj
     if env.has_key(let_stmt.identifier.value):
@@ -172,8 +186,9 @@ def evalLetStatement(let_stmt: LetStatement, env: Environment):
 
 
 def evalIdentifier(identifier: Identifier, env: Environment):
-    if env.has_key_recursive(identifier.value):
-        return env.get_var_recursive(identifier.value)
+    value = env.find(identifier.value)
+    if value is not MISSING:
+        return value
     elif identifier.value in BuiltinFunction:
         return BuiltinFunction[identifier.value]
     else:
@@ -193,27 +208,69 @@ def unwrapReturn(obj: ycObject):
         return obj
 
 
-def applyFunction(function: Function | Builtin, evaled_para):
+class TailCall:
+    # a call in tail position of a function body, evaluated but not applied
+    # yet: applyFunction runs it in its own loop instead of nesting a call
+    __slots__ = ("function", "args")
+
+    def __init__(self, function: Function | Builtin, args: List[ycObject]):
+        self.function = function
+        self.args = args
 
-    if isinstance(function, Function):
+
+def applyFunction(function: Function | Builtin, evaled_para):
+    while isinstance(function, Function):
         if len(evaled_para) != len(function.params):
             return Error("wrong number of arguments: expected " + str(len(function.params)) + ", got " + str(len(evaled_para)))
         param_names = [param.value for param in function.params]
         new_env = function.env.extended_with(
             dict(zip(param_names, evaled_para)))
-        return unwrapReturn(ycEval(function.body, new_env))
-    else:
+        result = yield evalTailBlock(function.body, new_env, True)
+        if not isinstance(result, TailCall):
+            return unwrapReturn(result)
+        function, evaled_para = result.function, result.args
+    return function.fn(*evaled_para)
 
-        return function.fn(*evaled_para)
 
+def evalTailBlock(block: BlockStatement, env: Environment, is_tail: bool):
+    # evalProgram for function bodies, returns a TailCall for a "return f(x)"
+    # and, if is_tail, for a call ending the block
+    result: ycObject = NULL
+    for index, stmt in enumerate(block.statements):
+        last = is_tail and index == len(block.statements) - 1
+        result = yield evalTailStatement(stmt, env, last)
+        if isinstance(result, TailCall):
+            return result
+        if result.type() == ObjectType.RETURN or result.type() == ObjectType.ERROR:
+            return result
+    return result
 
-def evalCallExpression(calledFunction: CallExpression, env: Environment):
+
+def evalTailStatement(stmt: Statement, env: Environment, is_tail: bool):
+    if isinstance(stmt, ReturnStatement) and isinstance(stmt.return_value, CallExpression):
+        return (yield prepareCall(stmt.return_value, env))
+    expression = stmt.expression if isinstance(stmt, ExpressionStatement) else None
+    if isinstance(expression, IfExpression) and expression.condition:
+        # evalIfExpression, with the branches in tail position too
+        if isTrue((yield expression.condition, env)):
+            branch = expression.true_branch
+        else:
+            branch = expression.false_branch
+        return (yield evalTailBlock(branch, env, is_tail)) if branch else NULL
+    if is_tail and isinstance(expression, CallExpression):
+        return (yield prepareCall(expression, env))
+    return (yield stmt, env)
+
+
+def prepareCall(calledFunction: CallExpression, env: Environment):
+    # the TailCall of a call expression, or the value it evaluates to
+    # without a function to apply (an error, a quote)
     if calledFunction.function is None:
         return Error("function not found")
     # quote handle：
     if isinstance(calledFunction.function, Identifier) and calledFunction.function.value == "quote":
         return quote(calledFunction.parameters[0], env)
-    function = ycEval(calledFunction.function, env)
+    function = yield calledFunction.function, env
     if isinstance(function, Error):
         return function
     if not isinstance(function, Function) and not isinstance(function, Builtin):
@@ -224,43 +281,55 @@ def evalCallExpression(calledFunction: CallExpression, env: Environment):
                      + str(function))
     evaled_para: List[ycObject] = []
     for para in para_list:
-        evaled_p = ycEval(para, env)
+        evaled_p = yield para, env
         if isinstance(evaled_para, Error):
             return evaled_p
         evaled_para.append(evaled_p)
-    return applyFunction(function, evaled_para)
+    return TailCall(function, evaled_para)
+
+
+def evalCallExpression(calledFunction: CallExpression, env: Environment):
+    call = yield prepareCall(calledFunction, env)
+    if isinstance(call, TailCall):
+        return (yield applyFunction(call.function, call.args))
+    return call
 
 
 def evalArray(array_exp: ArrayExpression, env: Environment):
     if array_exp.elements is None:
         return NULL
-    Array_obj = Array([])
+    elements = []
     for element in array_exp.elements:
-        Array_obj.elements.append(ycEval(element, env))
-    return Array_obj
+        elements.append((yield element, env))
+    return Array(elements)
 
 
 def evalIndexExpression(index_exp: IndexExpression, env: Environment):
     if index_exp.left is None or index_exp.index is None:
         return NULL
-    left_val = ycEval(index_exp.left, env)
-    index_val = ycEval(index_exp.index, env)
+    left_val = yield index_exp.left, env
+    index_val = yield index_exp.index, env
+    return indexValue(left_val, index_val)
+
+
+def indexValue(left_val: ycObject, index_val: ycObject):
     if not isinstance(left_val, Array) and not isinstance(left_val, Hash):
         return Error(f"index operator not supported for {left_val.type()}")
     if isinstance(left_val, Array):
         if not isinstance(index_val, Integer):
             return Error(f"index operator not supported for {index_val.type()}")
         if index_val.value < 0:
-            index_val = Integer(len(left_val.elements) + index_val.value)
+            index_val = make_integer(len(left_val.elements) + index_val.value)
         if index_val.value < 0 or index_val.value >= len(left_val.elements):
             return Error(f"index out of range: {index_val.value}")
         return left_val.elements[index_val.value]
     elif isinstance(left_val, Hash):
         if not isinstance(index_val, HashAble):
             return Error(f"index operator not hashbale for {index_val.type()}")
-        if index_val.hash_key() not in left_val.pairs.keys():
+        value = left_val.get(index_val)
+        if value is None:
             return Error(f"key not found: {index_val}")
-        return left_val.pairs[index_val.hash_key()].value
+        return value
     else:
         return Error(f"index operator not supported for {left_val.type()}")
 
@@ -270,14 +339,14 @@ def evalHashLiteral(hash_exp: HashLiteral, env: Environment):
     if hash_exp.raw_keys is None or hash_exp.raw_values is None:
         return Hash({})
     for k, v in zip(hash_exp.raw_keys, hash_exp.raw_values):
-        hashable = ycEval(k, env)
+        hashable = yield k, env
         if not isinstance(hashable, HashAble):
             return Error(f"key is not a valid type: {hashable.type()}")
         hashkey = hashable.hash_key()
         if hashkey in hash_obj.pairs:
-            return Error(f"duplicate key: {hashkey.value}")
-        value = ycEval(v, env)
-        hash_obj.pairs[hashkey] = HashPair(hashable, value)
+            return Error(f"duplicate key: {hashable}")
+        value = yield v, env
+        hash_obj.pairs[hashkey] = (hashable, value)
     return hash_obj
 
 
@@ -309,10 +378,39 @@ NodeToEval: Dict[type, Callable] = {
 }
 
 
-def ycEval(node: Node, env: Environment = default_env) -> ycObject:
+def startEval(node: Node, env: Environment, stack: List):
+    # the value of a node without children, the others go on the stack
+    # and their value comes later. None means the latter
     try:
         evalFunc = NodeToEval[type(node)]
-        return evalFunc(node, env)
+        result = evalFunc(node, env)
     except:
 
         return Error("unknown node type: " + str(type(node)))
+    if type(result) is GeneratorType:
+        stack.append((result, node))
+        return None
+    return result
+
+
+def ycEval(node: Node, env: Environment = default_env) -> ycObject:
+    stack = []
+    value = startEval(node, env, stack)
+    while stack:
+        evaluation, evaluated = stack[-1]
+        try:
+            request = evaluation.send(value)
+        except StopIteration as stop:
+            stack.pop()
+            value = stop.value
+            continue
+        except:
+            stack.pop()
+            value = Error("unknown node type: " + str(type(evaluated)))
+            continue
+        if type(request) is GeneratorType:
+            stack.append((request, evaluated))
+            value = None
+        else:
+            value = startEval(request[0], request[1], stack)
+    return value
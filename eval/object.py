@@ -1,8 +1,9 @@
 from abc import abstractmethod, ABC
 from enum import Enum
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 from eval.env import Environment
+from eval.pvector import PVector
 from lexer.token import Token, TokenTypes
 from parser.node import BlockStatement, BooleanLiteral, Identifier, IntegerLiteral, Node, StringLiteral
 
@@ -25,8 +26,10 @@ class ObjectType(Enum):
 
 
 class ycObject(ABC):
-    def __init__(self):
-        self.value: Any = None
+    # every value class lists its fields in __slots__, values carry no
+    # per-instance __dict__. subclasses must keep doing so
+    __slots__ = ()
+    value: Any
 
     @abstractmethod
     def type(self) -> ObjectType:
@@ -40,55 +43,53 @@ class ycObject(ABC):
         return self.inspect() == other.inspect()
 
 
-class HashKey:
-    def __init__(self, type_: ObjectType, value: str | int | bool):
-        self.type = type_
-        self.value = hash(value)
-
-    def __eq__(self, other):
-        return self.type == other.type and self.value == other.value
-
-    def __hash__(self):
-        return self.value
+# the dict key of a hashable value: the python int or str itself, booleans
+# are tagged so true and 1 stay different keys
+HashKey = int | str | Tuple[ObjectType, bool]
 
 
 class HashAble(ABC):
-    def hash_key(self) -> HashKey:
-        return HashKey(self.type(), self.value)
+    __slots__ = ()
 
-
-class HashPair:
-    def __init__(self, key: ycObject, value: ycObject):
-        self.key = key
-        self.value = value
-
-    def __eq__(self, other):
-        return self.key == other.key and self.value == other.value
+    def hash_key(self) -> HashKey:
+        return self.value
 
 
 class Hash(ycObject):
-    def __init__(self, pairs: Dict[HashKey, HashPair]):
+    __slots__ = ("pairs",)
+
+    # pairs maps the hash key of every key to the (key, value) objects,
+    # in insertion order
+    def __init__(self, pairs: Dict[HashKey, Tuple[ycObject, ycObject]]):
         self.pairs = pairs
 
     def type(self):
         return ObjectType.HASH
 
     def inspect(self):
-        return {v.key.inspect(): v.value.inspect() for k, v in self.pairs.items()}
+        return {k.inspect(): v.inspect() for k, v in self.pairs.values()}
 
     def __str__(self):
         return str(self.inspect())
 
-    def __getitem__(self, item):
-        if isinstance(item, HashKey):
-            return self.pairs[item].value
-        return self.pairs[item.hash_key()].value
+    def __getitem__(self, item: HashAble):
+        return self.pairs[item.hash_key()][1]
+
+    def get(self, item: HashAble, default=None):
+        pair = self.pairs.get(item.hash_key())
+        return default if pair is None else pair[1]
 
 
 class Integer(ycObject, HashAble):
+    __slots__ = ("value",)
+
     def __init__(self, value: int):
         self.value = value
 
+    def __reduce__(self):
+        # unpickled small integers are the cached ones again
+        return (make_integer, (self.value,))
+
     def type(self):
         return ObjectType.INTEGER
 
@@ -100,6 +101,8 @@ class Integer(ycObject, HashAble):
 
 
 class String(ycObject, HashAble):
+    __slots__ = ("value",)
+
     def __init__(self, value: str):
         self.value = value
 
@@ -114,9 +117,18 @@ class String(ycObject, HashAble):
 
 
 class Boolean(ycObject, HashAble):
+    __slots__ = ("value",)
+
     def __init__(self, value: bool):
         self.value = value
 
+    def hash_key(self) -> HashKey:
+        return _TRUE_KEY if self.value else _FALSE_KEY
+
+    def __reduce__(self):
+        # unpickled as the TRUE and FALSE singletons
+        return (make_boolean, (self.value,))
+
     def type(self):
         return ObjectType.BOOLEAN
 
@@ -127,10 +139,19 @@ class Boolean(ycObject, HashAble):
         return str(self.value)
 
 
+_TRUE_KEY = (ObjectType.BOOLEAN, True)
+_FALSE_KEY = (ObjectType.BOOLEAN, False)
+
+
 class Null(ycObject):
+    __slots__ = ("value",)
+
     def __init__(self):
         self.value = "Null"
-        pass
+
+    def __reduce__(self):
+        # unpickled as the NULL singleton
+        return "NULL"
 
     def type(self):
         return ObjectType.NULL
@@ -143,6 +164,8 @@ class Null(ycObject):
 
 
 class ReturnObject(ycObject):
+    __slots__ = ("value",)
+
     def __init__(self, value: ycObject):
         self.value = value
 
@@ -157,6 +180,8 @@ class ReturnObject(ycObject):
 
 
 class Error(ycObject):
+    __slots__ = ("error_mssage",)
+
     def __init__(self, msg: str):
         self.error_mssage = msg
 
@@ -171,6 +196,8 @@ class Error(ycObject):
 
 
 class Function(ycObject):
+    __slots__ = ("params", "body", "env")
+
     def __init__(self, params: List[Identifier], body: BlockStatement, env: Environment):
         self.params = params
         self.body = body
@@ -187,6 +214,8 @@ class Function(ycObject):
 
 
 class Builtin(ycObject):
+    __slots__ = ("fn",)
+
     def __init__(self, fn):
         self.fn = fn
 
@@ -201,8 +230,13 @@ class Builtin(ycObject):
 
 
 class Array(ycObject):
+    __slots__ = ("elements",)
 
-    def __init__(self, elements: List[ycObject]):
+    # elements is a persistent vector, arrays are values: push and rest
+    # build new arrays sharing structure with the old one
+    def __init__(self, elements: List[ycObject] | PVector):
+        if not isinstance(elements, PVector):
+            elements = PVector.from_iterable(elements)
         self.elements = elements
 
     def type(self):
@@ -221,6 +255,8 @@ class Array(ycObject):
 
 
 class Quote(ycObject):
+    __slots__ = ("node",)
+
     def __init__(self, node: Node):
         self.node = node
 
@@ -235,6 +271,8 @@ class Quote(ycObject):
 
 
 class MacroObject(ycObject):
+    __slots__ = ("params", "body", "env")
+
     def __init__(self, params: List[Identifier], body: BlockStatement, env: Environment):
         self.params = params
         self.body = body
@@ -250,6 +288,39 @@ class MacroObject(ycObject):
         return self.inspect()
 
 
+# canonical values shared by the evaluator and the vm. booleans and null
+# only exist as these singletons and small integers are cached, so checking
+# them by identity is safe everywhere
+NULL = Null()
+TRUE = Boolean(True)
+FALSE = Boolean(False)
+
+SMALL_INT_MIN = -5
+SMALL_INT_MAX = 256
+_small_ints: List[Integer] = []
+
+
+def configure_small_ints(minimum: int, maximum: int):
+    # cache Integer objects for minimum..maximum (inclusive)
+    global SMALL_INT_MIN, SMALL_INT_MAX, _small_ints
+    SMALL_INT_MIN = minimum
+    SMALL_INT_MAX = maximum
+    _small_ints = [Integer(value) for value in range(minimum, maximum + 1)]
+
+
+configure_small_ints(SMALL_INT_MIN, SMALL_INT_MAX)
+
+
+def make_integer(value: int) -> Integer:
+    if SMALL_INT_MIN <= value <= SMALL_INT_MAX:
+        return _small_ints[value - SMALL_INT_MIN]
+    return Integer(value)
+
+
+def make_boolean(value: bool) -> Boolean:
+    return TRUE if value else FALSE
+
+
 def turnObjectToNode(obj: ycObject):
     if obj.type() == ObjectType.INTEGER:
         return IntegerLiteral(Token(TokenTypes.INT, str(obj.inspect())))
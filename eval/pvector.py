@@ -0,0 +1,125 @@
+from typing import Iterable, Iterator, List
+
+# persistent vector backing Array: a 32-way trie of leaves plus a tail leaf,
+# as in clojure. a PVector is never changed after it is built, append and
+# rest return new vectors sharing everything but the changed path with the
+# old one, so Array values can be passed around without copying.
+
+BITS = 5
+WIDTH = 1 << BITS
+MASK = WIDTH - 1
+
+
+def new_path(level: int, node: List) -> List:
+    # a chain of single child nodes from the given level down to node
+    while level > 0:
+        node = [node]
+        level -= BITS
+    return node
+
+
+class PVector:
+    __slots__ = ("count", "shift", "root", "tail", "offset")
+
+    # count is the number of stored elements, the first offset of them are
+    # hidden: rest() only moves offset, the skipped prefix stays shared
+    def __init__(self, count: int = 0, shift: int = BITS, root: List = None, tail: List = None, offset: int = 0):
+        self.count = count
+        self.shift = shift
+        self.root = [] if root is None else root
+        self.tail = [] if tail is None else tail
+        self.offset = offset
+
+    @staticmethod
+    def from_iterable(values: Iterable) -> "PVector":
+        # build the trie bottom up instead of appending one value at a time
+        values = list(values)
+        count = len(values)
+        tail_offset = ((count - 1) >> BITS) << BITS if count else 0
+        nodes = [values[i:i+WIDTH] for i in range(0, tail_offset, WIDTH)]
+        shift = BITS
+        while len(nodes) > WIDTH:
+            nodes = [nodes[i:i+WIDTH] for i in range(0, len(nodes), WIDTH)]
+            shift += BITS
+        return PVector(count, shift, nodes, values[tail_offset:])
+
+    def tail_offset(self) -> int:
+        return self.count - len(self.tail)
+
+    def __len__(self):
+        return self.count - self.offset
+
+    def __getitem__(self, index: int):
+        # python semantics for negative indexes, IndexError when out of range
+        length = self.count - self.offset
+        if index < 0:
+            index += length
+        if index < 0 or index >= length:
+            raise IndexError("PVector index out of range")
+        index += self.offset
+        tail_offset = self.count - len(self.tail)
+        if index >= tail_offset:
+            return self.tail[index - tail_offset]
+        node = self.root
+        for level in range(self.shift, 0, -BITS):
+            node = node[(index >> level) & MASK]
+        return node[index & MASK]
+
+    def __iter__(self) -> Iterator:
+        skip = self.offset
+        for leaf in self.leaves(self.root, self.shift):
+            if skip >= len(leaf):
+                skip -= len(leaf)
+                continue
+            yield from leaf[skip:] if skip else leaf
+            skip = 0
+        yield from self.tail[skip:] if skip else self.tail
+
+    def leaves(self, node: List, level: int) -> Iterator[List]:
+        if level == 0:
+            yield node
+            return
+        for child in node:
+            yield from self.leaves(child, level - BITS)
+
+    def append(self, value) -> "PVector":
+        if len(self.tail) < WIDTH:
+            return PVector(self.count + 1, self.shift, self.root, self.tail + [value], self.offset)
+        # the tail is full, it moves into the trie
+        if (self.count >> BITS) > (1 << self.shift):
+            root = [self.root, new_path(self.shift, self.tail)]
+            shift = self.shift + BITS
+        else:
+            root = self.push_tail(self.shift, self.root, self.tail)
+            shift = self.shift
+        return PVector(self.count + 1, shift, root, [value], self.offset)
+
+    def push_tail(self, level: int, parent: List, tail: List) -> List:
+        # copy of the path to the position of the tail leaf, with the leaf added
+        sub_index = ((self.count - 1) >> level) & MASK
+        node = parent[:]
+        if level == BITS:
+            child = tail
+        elif sub_index < len(parent):
+            child = self.push_tail(level - BITS, parent[sub_index], tail)
+        else:
+            child = new_path(level - BITS, tail)
+        if sub_index < len(node):
+            node[sub_index] = child
+        else:
+            node.append(child)
+        return node
+
+    def rest(self) -> "PVector":
+        # everything but the first element, O(1)
+        return PVector(self.count, self.shift, self.root, self.tail, self.offset + 1)
+
+    def __eq__(self, other):
+        if isinstance(other, PVector):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"PVector({list(self)})"
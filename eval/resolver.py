@@ -0,0 +1,96 @@
+from typing import Dict, List, Optional, Tuple
+
+from parser.node import *
+
+# lexical addressing for the closure evaluator. every function gets a Scope
+# listing its bindings: the parameters, then each name it lets, wherever the
+# let sits in the body (blocks don't open environments). a name used inside
+# a function resolves to a (depth, slot) coordinate: depth is the number of
+# function frames to go out, slot the position in that frame. names bound by
+# no enclosing function (globals, builtins) stay resolved by name.
+#
+# a let only binds its slot once it has run, until then the slot is None and
+# the read goes on by name from the next outer environment, like before.
+
+Coordinate = Tuple[int, int]
+
+
+class Scope:
+    def __init__(self, names: List[str], outer: Optional["Scope"] = None, num_params: int = 0):
+        self.index: Dict[str, int] = {}
+        for name in names:
+            self.index.setdefault(name, len(self.index))
+        self.outer = outer
+        self.num_params = num_params
+        self.frame_size = len(self.index)
+        # parameters come first, when no two share a name the arguments
+        # of a call are the start of its frame as they are
+        self.unique_params = len(set(names[:num_params])) == num_params
+
+    @staticmethod
+    def of_function(params: List[Identifier], body: Optional[BlockStatement], outer: Optional["Scope"]) -> "Scope":
+        names = [param.value for param in params]
+        if body is not None:
+            names.extend(declared_names(body))
+        return Scope(names, outer, len(params))
+
+    def resolve(self, name: str) -> Optional[Coordinate]:
+        depth = 0
+        scope = self
+        while scope is not None:
+            if name in scope.index:
+                return depth, scope.index[name]
+            scope = scope.outer
+            depth += 1
+        return None
+
+    def depth(self) -> int:
+        # the number of function frames between this scope and the globals
+        depth = 0
+        scope = self
+        while scope is not None:
+            scope = scope.outer
+            depth += 1
+        return depth
+
+
+def declared_names(node: Node) -> List[str]:
+    # names let in node, nested functions excluded, in source order
+    names = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, LetStatement):
+            names.append(node.identifier.value)
+        if isinstance(node, (FunctionLiteral, Macro)) or node is None:
+            continue
+        stack.extend(reversed(children(node)))
+    return names
+
+
+def children(node: Node) -> List[Node]:
+    match node:
+        case Program() | BlockStatement():
+            return node.statements
+        case ExpressionStatement():
+            return [node.expression]
+        case LetStatement():
+            return [node.right_expression]
+        case ReturnStatement():
+            return [node.return_value]
+        case PreFixExpression():
+            return [node.right]
+        case InfixExpression():
+            return [node.left, node.right]
+        case IfExpression():
+            return [node.condition, node.true_branch, node.false_branch]
+        case CallExpression():
+            return [node.function] + (node.parameters or [])
+        case ArrayExpression():
+            return node.elements or []
+        case IndexExpression():
+            return [node.left, node.index]
+        case HashLiteral():
+            return (node.raw_keys or []) + (node.raw_values or [])
+        case _:
+            return []
@@ -1,84 +1,66 @@
-from .token import IsDigit, LiteralToTokenMap, IsLetter, Token, TokenTypes, lookup_ident, whitespaces, special_chars
+import re
 
+from .token import LiteralToTokenMap, Token, TokenTypes
 
-class Lexer(object):
-    def __init__(self, text):
-        self.text = text
-        self.position = -1
-        self.read_position = 0
-        self.character = None
-        self.read_char()
-
-    def skip_whitespace(self):
-
-        while self.character in whitespaces:
-            self.read_char()
-
-    def read_char(self):
-        if self.read_position >= len(self.text):
-            self.character = None
-            return
-        ch = self.text[self.read_position]
-        self.position = self.read_position
-        self.read_position += 1
-        self.character = ch
+# one alternation matching a whole token, leading whitespace included. the
+# order of the alternatives matters: two char operators before their one
+# char prefixes. a string without its closing quote runs to the end of the
+# text. the alternation is optional so that trailing whitespace matches
+# with no group at all, that is EOF. the groups are numbered as below
+TOKEN_PATTERN = re.compile(r"""
+    [ \t\n\r]*
+    (?:
+        (?P<IDENT>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<INT>[0-9]+)
+      | "(?P<STRING>[^"]*)"?
+      | (?P<OPERATOR>==|!=|>=|<=|[-+=,;(){}!/*<>\[\]:])
+      | (?P<ILLEGAL>.)
+    )?
+""", re.VERBOSE | re.DOTALL)
 
-    def read_identifier(self):
-        token_literal = ""
-        while self.character is not None and IsLetter(self.character):
-            token_literal += self.character
-            self.read_char()
-        return token_literal
+EOF_TOKEN = LiteralToTokenMap[None]
+# the shared token of each keyword, looked up once per identifier
+KEYWORDS = {literal: token for literal, token in LiteralToTokenMap.items()
+            if literal is not None and literal.isalpha()}
+IDENT, INT, STRING, OPERATOR, ILLEGAL = 1, 2, 3, 4, 5
 
-    def read_number(self):
-        token_literal = ""
-        while self.character is not None and IsDigit(self.character):
-            token_literal += self.character
-            self.read_char()
-        return token_literal
 
-    def read_string(self):
-        token_literal = ""
-        # read_first_quote "
-        self.read_char()
-        while self.character is not None and self.character != '"':
-            token_literal += self.character
-            self.read_char()
-        if self.character == '"':
-            self.read_char()  # read last "
-        return token_literal
-
-    def peek_char(self):
-        if self.read_position >= len(self.text):
-            return None
-        return self.text[self.read_position]
+class Lexer(object):
+    def __init__(self, text):
+        # like before any sequence of characters will do, the regex needs a str
+        self.text = text if isinstance(text, str) else "".join(text)
+        # offset of the first character not lexed yet
+        self.position = 0
+        # span of the literal of the token returned last (for a string the
+        # part between the quotes), the parser gives it to the nodes
+        self.token_start = 0
+        self.token_end = 0
+        self.tokens = self.scan()
 
     def next_token(self):
-        # we use map to replace switch statement
-        self.skip_whitespace()
-        try:
-            # handle special cases tokens structed by two char like "!="
-            if self.character in special_chars:
-                next_char = self.peek_char()
-                if lookup_ident(self.character+next_char) != TokenTypes.IDENT:
-                    token_ret = LiteralToTokenMap[self.character+next_char]
-                    self.read_char()
-                    self.read_char()
-                    return token_ret
-            token_ret = LiteralToTokenMap[self.character]
-        except Exception:
-            # check if it is a letter
-            # caution! the order matters! especailly the first two stmt
-            if IsDigit(self.character):
-                token_ret = Token(TokenTypes.INT, self.read_number())
-            elif IsLetter(self.character):
-                may_be_ident = self.read_identifier()
-                token_ret = Token(lookup_ident(may_be_ident), may_be_ident)
-            elif self.character == '"':
-                token_ret = Token(TokenTypes.STRING, self.read_string())
+        return next(self.tokens)
+
+    def scan(self):
+        # one match per token, the number of the group that matched tells
+        # its kind. EOF forever once the text is done
+        text = self.text
+        match_at = TOKEN_PATTERN.match
+        keyword = KEYWORDS.get
+        while True:
+            match = match_at(text, self.position)
+            self.position = match.end()
+            group = match.lastindex
+            self.token_start, self.token_end = match.span(group) if group else (self.position, self.position)
+            if group == IDENT:
+                literal = match[IDENT]
+                yield keyword(literal) or Token(TokenTypes.IDENT, literal)
+            elif group == OPERATOR:
+                yield LiteralToTokenMap[match[OPERATOR]]
+            elif group == INT:
+                yield Token(TokenTypes.INT, match[INT])
+            elif group == STRING:
+                yield Token(TokenTypes.STRING, match[STRING])
+            elif group == ILLEGAL:
+                yield Token(TokenTypes.ILLEGAL, match[ILLEGAL])
             else:
-                token_ret = Token(TokenTypes.ILLEGAL, self.character)
-                self.read_char()
-            return token_ret
-        self.read_char()
-        return token_ret
+                yield EOF_TOKEN
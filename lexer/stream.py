@@ -0,0 +1,111 @@
+import os
+import re
+from typing import BinaryIO, Callable
+
+from .lexer import EOF_TOKEN, IDENT, ILLEGAL, INT, KEYWORDS, OPERATOR, STRING
+from .token import LiteralToTokenMap, Token, TokenTypes
+
+# TOKEN_PATTERN for utf-8 bytes. an illegal character is one whole utf-8
+# sequence, not one byte, so the tokens are the ones Lexer gives for the
+# decoded text
+BYTES_TOKEN_PATTERN = re.compile(rb"""
+    [ \t\n\r]*
+    (?:
+        (?P<IDENT>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<INT>[0-9]+)
+      | "(?P<STRING>[^"]*)"?
+      | (?P<OPERATOR>==|!=|>=|<=|[-+=,;(){}!/*<>\[\]:])
+      | (?P<ILLEGAL>[\xc0-\xdf][\x80-\xbf]|[\xe0-\xef][\x80-\xbf]{2}|[\xf0-\xf7][\x80-\xbf]{3}|.)
+    )?
+""", re.VERBOSE | re.DOTALL)
+
+OPERATOR_TOKENS = {literal.encode(): token for literal, token in LiteralToTokenMap.items()
+                   if literal is not None}
+KEYWORD_TOKENS = {literal.encode(): token for literal, token in KEYWORDS.items()}
+
+CHUNK_SIZE = 1 << 16
+# bytes that must follow a match for it to be a whole token: one decides
+# where an identifier, a number or an operator ends, the lead byte of a
+# cut utf-8 sequence is followed by up to three
+LOOKAHEAD = 3
+
+
+def chunk_reader(source) -> Callable[[int], bytes]:
+    # read(size) over a binary file or anything with the buffer protocol
+    # (bytes, memoryview, mmap), b'' at the end
+    if hasattr(source, "read"):
+        return source.read
+    view = memoryview(source).cast("B")
+    position = 0
+
+    def read(size: int) -> bytes:
+        nonlocal position
+        chunk = bytes(view[position:position + size])
+        position += len(chunk)
+        return chunk
+    return read
+
+
+class StreamLexer(object):
+    # Lexer over utf-8 source that is never all in memory at once: a file
+    # path, an open binary file, or a bytes-like object such as an mmap.
+    # the source is read chunk_size bytes at a time, only literals are
+    # decoded. a token that may go on in the next chunk (it ends less than
+    # LOOKAHEAD bytes before the end of what was read) is matched again
+    # once more is read
+    def __init__(self, source: str | os.PathLike | BinaryIO | memoryview, chunk_size: int = CHUNK_SIZE):
+        self.file = None
+        if isinstance(source, (str, os.PathLike)):
+            self.file = source = open(source, "rb")
+        self.read = chunk_reader(source)
+        self.chunk_size = chunk_size
+        self.buffer = b''
+        # offset of the first byte not lexed yet in buffer
+        self.position = 0
+        # offset of buffer in the source
+        self.offset = 0
+        # span of the token returned last, as in Lexer but in bytes
+        self.token_start = 0
+        self.token_end = 0
+        self.at_end = False
+
+    def fill(self):
+        # drop what was lexed, append at least a chunk. a token longer than
+        # what is kept reads as much again, so long tokens are read in linear time
+        kept = self.buffer[self.position:]
+        more = self.read(max(self.chunk_size, len(kept)))
+        if not more:
+            self.at_end = True
+            self.close()
+        self.offset += self.position
+        self.buffer = kept + more
+        self.position = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def next_token(self) -> Token:
+        match = BYTES_TOKEN_PATTERN.match(self.buffer, self.position)
+        while len(self.buffer) - match.end() < LOOKAHEAD and not self.at_end:
+            self.fill()
+            match = BYTES_TOKEN_PATTERN.match(self.buffer, self.position)
+        self.position = match.end()
+        group = match.lastindex
+        start, end = match.span(group) if group else (self.position, self.position)
+        self.token_start = self.offset + start
+        self.token_end = self.offset + end
+        if group == IDENT:
+            literal = match[IDENT]
+            token = KEYWORD_TOKENS.get(literal)
+            return token if token is not None else Token(TokenTypes.IDENT, literal.decode())
+        if group == OPERATOR:
+            return OPERATOR_TOKENS[match[OPERATOR]]
+        if group == INT:
+            return Token(TokenTypes.INT, match[INT].decode())
+        if group == STRING:
+            return Token(TokenTypes.STRING, match[STRING].decode())
+        if group == ILLEGAL:
+            return Token(TokenTypes.ILLEGAL, match[ILLEGAL].decode(errors="replace"))
+        return EOF_TOKEN
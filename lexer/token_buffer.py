@@ -0,0 +1,98 @@
+from array import array
+from bisect import bisect_right
+from typing import Tuple
+
+from .lexer import EOF_TOKEN, IDENT, ILLEGAL, INT, KEYWORDS, OPERATOR, STRING, TOKEN_PATTERN
+from .token import LiteralToTokenMap, Token, TokenTypes
+
+# the kind column holds the position of a token's type in TokenTypes
+KINDS = list(TokenTypes)
+KIND_CODE = {token_type: code for code, token_type in enumerate(KINDS)}
+
+
+class TokenBuffer(object):
+    # all the tokens of a text in three parallel int columns: kind, start and
+    # end offset of the literal in the text (for a string the part between
+    # the quotes). a literal is sliced out of the text only when asked for.
+    # like Lexer it has next_token(), so a Parser reads it directly
+    def __init__(self, text):
+        self.text = text if isinstance(text, str) else "".join(text)
+        self.kinds = array('i')
+        self.starts = array('i')
+        self.ends = array('i')
+        # offset of the first character of each line
+        self.line_starts = array('i', [0])
+        # the index of the token next_token() returns next
+        self.index = 0
+        # span of the token next_token() returned last, as in Lexer
+        self.token_start = 0
+        self.token_end = 0
+        self.scan()
+
+    def scan(self):
+        kinds, starts, ends = self.kinds, self.starts, self.ends
+        ident, keyword = KIND_CODE[TokenTypes.IDENT], KEYWORDS.get
+        kind_of_group = {INT: KIND_CODE[TokenTypes.INT],
+                         STRING: KIND_CODE[TokenTypes.STRING],
+                         ILLEGAL: KIND_CODE[TokenTypes.ILLEGAL]}
+        for match in TOKEN_PATTERN.finditer(self.text):
+            group = match.lastindex
+            if group is None:
+                # the whitespace after the last token
+                continue
+            if group == IDENT:
+                token = keyword(match[IDENT])
+                kinds.append(ident if token is None else KIND_CODE[token.TokenType])
+            elif group == OPERATOR:
+                kinds.append(KIND_CODE[LiteralToTokenMap[match[OPERATOR]].TokenType])
+            else:
+                kinds.append(kind_of_group[group])
+            start, end = match.span(group)
+            starts.append(start)
+            ends.append(end)
+        text = self.text
+        line_start = text.find("\n") + 1
+        while line_start:
+            self.line_starts.append(line_start)
+            line_start = text.find("\n", line_start) + 1
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def kind(self, index: int) -> TokenTypes:
+        return KINDS[self.kinds[index]]
+
+    def span(self, index: int) -> Tuple[int, int]:
+        return self.starts[index], self.ends[index]
+
+    def literal(self, index: int) -> str:
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def token(self, index: int) -> Token:
+        # keywords and operators are the shared tokens of LiteralToTokenMap,
+        # like the ones Lexer returns
+        if index >= len(self.kinds):
+            return EOF_TOKEN
+        literal = self.text[self.starts[index]:self.ends[index]]
+        token_type = KINDS[self.kinds[index]]
+        if token_type in (TokenTypes.IDENT, TokenTypes.INT, TokenTypes.STRING, TokenTypes.ILLEGAL):
+            return Token(token_type, literal)
+        return LiteralToTokenMap[literal]
+
+    def line_column(self, offset: int) -> Tuple[int, int]:
+        # 1 based line and column of an offset in the text
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def location(self, index: int) -> Tuple[int, int]:
+        return self.line_column(self.starts[index])
+
+    def next_token(self) -> Token:
+        token = self.token(self.index)
+        if self.index < len(self.kinds):
+            self.token_start = self.starts[self.index]
+            self.token_end = self.ends[self.index]
+            self.index += 1
+        else:
+            self.token_start = self.token_end = len(self.text)
+        return token
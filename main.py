@@ -1,19 +1,21 @@
+from compiler.cache import cache_directory, cached_program
+from eval.closure_eval import closureEval
 from eval.env import Environment
-from eval.eval import NULL, ycEval
+from eval.eval import NULL
 from eval.macro import expand_macro, handle_macro
 from eval.object import Null
 from lexer.lexer import Lexer
 from lexer.token import TokenTypes
 # this is for the move function. when you input in the repl.
 import readline
+import sys
 
-from parser.parser import Parser
+from parser.parser import ParseException, Parser
 from tests.testUtills import print_if_error
 
 welcome_message = "Welcome to Cong's Interpreter!"
 prompt = ">>>"
 env = Environment()
-print(welcome_message)
 
 
 def eval(code):
@@ -23,12 +25,28 @@ def eval(code):
     program = parser.parse_program()
     handle_macro(program, env)
     program = expand_macro(program, env)
-    result = ycEval(program, env)
+    result = closureEval(program, env)
     if not isinstance(result, Null):
         print(result)
     print_if_error(None, parser)
 
 
+def run_file(path):
+    # the macro expanded ast of the script comes from __yccache__ when the
+    # script did not change since the last run
+    with open(path) as file:
+        source = file.read()
+    try:
+        program = cached_program(source, cache_directory(path))
+    except ParseException as e:
+        print("parser has errors")
+        print(e)
+        sys.exit(1)
+    result = closureEval(program, env)
+    if not isinstance(result, Null):
+        print(result)
+
+
 def repl():
     import code
     import sys
@@ -61,4 +79,8 @@ def repl():
             buffer.append(line)
             prompt = "... "
 
-repl()
+if len(sys.argv) > 1:
+    run_file(sys.argv[1])
+else:
+    print(welcome_message)
+    repl()
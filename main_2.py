@@ -1,5 +1,10 @@
+from compiler import mbc
+from compiler.cache import cache_directory, cached_bytecode
 from compiler.code import OpCode
 from compiler.compiler import CompileScope, Compiler
+from compiler.compiler_exception import StackOverflowException
+from compiler.optimizer import optimize_bytecode
+from compiler.superinstruction import fuse_bytecode
 from compiler.symtable import SymTable
 from compiler.vm import VM
 from eval.env import Environment
@@ -10,14 +15,14 @@ from lexer.lexer import Lexer
 from lexer.token import TokenTypes
 # this is for the move function. when you input in the repl.
 import readline
+import sys
 
-from parser.parser import Parser
+from parser.parser import ParseException, Parser
 from tests.testUtills import print_if_error
 
 welcome_message = "Welcome to Cong's Interpreter!"
 prompt = ">>>"
 env = Environment()
-print(welcome_message)
 
 first_call = True
 
@@ -31,15 +36,22 @@ def eval(code, constants, scopes, globals):
     compiler = Compiler()
     compiler.scopes = scopes
     compiler.constants = constants
+    compiler.index_constants()
     if first_call:
         compiler.init_builtins()
         first_call = False
 
+    # the constants of earlier inputs are optimized and fused already
+    start = len(constants)
     compiler.compile(parser.parse_program())
     if compiler.instructions != [] and compiler.instructions[-1][0:1] == OpCode.POP.bytes:
         compiler.instructions.pop()
 
-    vm = VM(compiler.bytecodes())
+    bytecode = fuse_bytecode(optimize_bytecode(compiler.bytecodes(), start), start)
+    # keep folded constants and the finished functions in the shared pool,
+    # functions from earlier inputs refer to them by index
+    constants[:] = bytecode.constants
+    vm = VM(bytecode)
 
     vm.globals = globals
     # print(vm.globals[:10])
@@ -52,11 +64,38 @@ def eval(code, constants, scopes, globals):
     return result
 
 
+def run_file(path):
+    # a .mbc file is run as it is (python -m compiler.mbc compile), a
+    # script's compiled form comes from __yccache__ when it did not change
+    # since the last run
+    if path.endswith(".mbc"):
+        with open(path, "rb") as file:
+            bytecode = mbc.load(file)
+    else:
+        with open(path) as file:
+            source = file.read()
+        try:
+            bytecode = cached_bytecode(source, cache_directory(path))
+        except ParseException as e:
+            print("parser has errors")
+            print(e)
+            sys.exit(1)
+    vm = VM(bytecode)
+    try:
+        vm.run()
+    except StackOverflowException:
+        print("stack overflow")
+        sys.exit(1)
+    result = vm.last_pop()
+    if result is not None and result is not NULL:
+        print(result)
+
+
 def repl():
     import code
     import sys
     global_sym = SymTable()
-    globals = [0 for i in range(65535)]
+    globals = []
     global_constants = []
     prompt = ">>> "
     buffer = []
@@ -89,4 +128,8 @@ def repl():
             prompt = "... "
 
 
-repl()
+if len(sys.argv) > 1:
+    run_file(sys.argv[1])
+else:
+    print(welcome_message)
+    repl()
@@ -1,12 +1,28 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import List, Optional
 
-from lexer.token import Token, TokenTypes
+from lexer.token import LiteralToTokenMap, Token, TokenTypes
+
+# nodes keep no tokens, only what the later stages use: the value of a
+# literal, the type of an operator, and the span of the node in the source,
+# start and end offsets from the first to the last literal of the node (set
+# by the parser, NO_SPAN on nodes built elsewhere). every class has
+# __slots__, a program keeps many nodes alive for macros and the closure
+# evaluator
+
+NO_SPAN = -1
+
+# the parser puts this one list in every empty parameter, argument, element
+# or key list instead of a new one each time, it is never changed
+EMPTY_LIST: List = []
 
 
 class Node(ABC):
+    __slots__ = ("start", "end")
+
     def __init__(self):
-        pass
+        self.start = NO_SPAN
+        self.end = NO_SPAN
 
     @abstractmethod
     def token_literal(self):
@@ -17,21 +33,17 @@ class Node(ABC):
 
 
 class Statement(Node):
-    def __init__(self):
-        pass
+    __slots__ = ()
 
 #  infact this should be a abstarct c
 
 
 class Expression(Node):
-    def __init__(self, value):
-        self.value = value
-        pass
+    __slots__ = ()
 
 
 class EmptyExpression(Expression):
-    def __init__(self):
-        pass
+    __slots__ = ()
 
     def token_literal(self):
         return ""
@@ -41,13 +53,14 @@ class EmptyExpression(Expression):
 
 
 class IntegerLiteral(Expression):
+    __slots__ = ("value",)
+
     def __init__(self, token: Token):
-        self.token = token
+        super().__init__()
         self.value = int(token.Literal)
-        self.Literal = token.Literal
 
     def token_literal(self):
-        return self.token.Literal
+        return str(self.value)
 
     def __str__(self):
         return str(self.value)
@@ -57,12 +70,14 @@ class IntegerLiteral(Expression):
 
 
 class StringLiteral(Expression):
+    __slots__ = ("value",)
+
     def __init__(self, token: Token):
-        self.token = token
+        super().__init__()
         self.value = str(token.Literal)
 
     def token_literal(self):
-        return self.token.Literal
+        return self.value
 
     def __str__(self):
         return '"'+str(self.value)+'"'
@@ -72,15 +87,17 @@ class StringLiteral(Expression):
 
 
 class BooleanLiteral(Expression):
+    __slots__ = ("value",)
+
     def __init__(self, token: Token):
-        self.token = token
+        super().__init__()
         if token.TokenType == TokenTypes.TRUE:
             self.value = True
         else:
             self.value = False
 
     def token_literal(self):
-        return self.token.Literal
+        return "true" if self.value else "false"
 
     def __str__(self):
         return str(self.value)
@@ -90,12 +107,14 @@ class BooleanLiteral(Expression):
 
 
 class Identifier(Expression):
+    __slots__ = ("value",)
+
     def __init__(self, token: Token):
-        self.token = token
+        super().__init__()
         self.value = token.Literal
 
     def token_literal(self):
-        return self.token.Literal
+        return self.value
 
     def __str__(self):
         return self.value
@@ -105,10 +124,19 @@ class Identifier(Expression):
 
 
 class PreFixExpression(Expression):
+    __slots__ = ("operator", "right")
+
     def __init__(self, *, operator: Optional[Token] = None, right: Optional[Expression] = None):
-        self.token = operator  # operator token
+        super().__init__()
+        # the type of the operator token
+        self.operator = operator.TokenType if operator is not None else None
         self.right = right
 
+    @property
+    def token(self) -> Optional[Token]:
+        # the operator token, the shared one of the lexer
+        return LiteralToTokenMap[self.operator.value] if self.operator is not None else None
+
     def token_literal(self):
         return self.token.Literal
 
@@ -116,15 +144,22 @@ class PreFixExpression(Expression):
         return f"({self.token.Literal}{self.right})"
 
     def __eq__(self, other):
-        return self.token.Literal == other.token.Literal and self.right == other.right
+        return self.operator == other.operator and self.right == other.right
 
 
 class InfixExpression(Expression):
+    __slots__ = ("operator", "left", "right")
+
     def __init__(self, *, left: Optional[Expression] = None, operator: Optional[Token] = None, right: Optional[Expression] = None):
-        self.token = operator
+        super().__init__()
+        self.operator = operator.TokenType if operator is not None else None
         self.left = left
         self.right = right
 
+    @property
+    def token(self) -> Optional[Token]:
+        return LiteralToTokenMap[self.operator.value] if self.operator is not None else None
+
     def token_literal(self):
         return self.token.Literal
 
@@ -132,11 +167,14 @@ class InfixExpression(Expression):
         return f"({self.left} {self.token.Literal} {self.right})"
 
     def __eq__(self, other):
-        return self.token.Literal == other.token.Literal and self.left == other.left and self.right == other.right
+        return self.operator == other.operator and self.left == other.left and self.right == other.right
 
 
 class Program(Node):
+    __slots__ = ("statements",)
+
     def __init__(self) -> None:
+        super().__init__()
         self.statements: List[Statement] = []
 
     def token_literal(self) -> str:
@@ -155,39 +193,45 @@ class Program(Node):
 
 
 class LetStatement(Statement):
+    __slots__ = ("identifier", "right_expression")
+
     def __init__(self, token: Token, identifier: Identifier, right_expression: Expression):
-        self.token = token
+        super().__init__()
         self.identifier = identifier
         self.right_expression = right_expression
 
     def token_literal(self):
-        return self.token.Literal
+        return "let"
 
     def __str__(self):
         return "let " + str(self.identifier) + " = " + str(self.right_expression)
 
     def __eq__(self, other):
-        return self.token.Literal == other.token.Literal and self.identifier == other.identifier and self.right_expression == other.right_expression
+        return isinstance(other, LetStatement) and self.identifier == other.identifier and self.right_expression == other.right_expression
 
 
 class ReturnStatement(Statement):
+    __slots__ = ("return_value",)
+
     def __init__(self, token: Token, return_value: Optional[Expression]):
-        self.token = token
+        super().__init__()
         self.return_value = return_value
 
     def token_literal(self):
-        return self.token.Literal
+        return "return"
 
     def __str__(self):
         return "return " + str(self.return_value)
 
     def __eq__(self, other):
-        return self.token.Literal == other.token.Literal and self.return_value == other.return_value
+        return isinstance(other, ReturnStatement) and self.return_value == other.return_value
 
 
 class ExpressionStatement(Statement):
+    __slots__ = ("expression",)
+
     def __init__(self, token: Token, expression: Expression):
-        self.token = token
+        super().__init__()
         self.expression = expression
 
     def token_literal(self):
@@ -201,12 +245,15 @@ class ExpressionStatement(Statement):
 
 
 class BlockStatement(Statement):
+    # weakly referenced by the closure evaluator's cache of compiled bodies
+    __slots__ = ("statements", "__weakref__")
+
     def __init__(self, token: Token) -> None:
-        self.token = token
+        super().__init__()
         self.statements: List[Statement] = []
 
     def token_literal(self) -> str:
-        return self.token.Literal
+        return "{"
 
     def __str__(self) -> str:
         statement_strs = [str(statement) for statement in self.statements]
@@ -215,35 +262,38 @@ class BlockStatement(Statement):
         return "{ " + ";\n".join(statement_strs) + "}"
 
     def __eq__(self, other):
-        return self.token.Literal == other.token.Literal and self.statements == other.statements
+        return isinstance(other, BlockStatement) and self.statements == other.statements
 
 
 class IfExpression(Expression):
+    __slots__ = ("true_branch", "false_branch", "condition")
+
     def __init__(self, token: Token, true_branch: Optional[BlockStatement] = None, false_branch: Optional[BlockStatement] = None, condition: Optional[Expression] = None):
-        self.token = token
+        super().__init__()
         self.true_branch = true_branch
         self.false_branch = false_branch
         self.condition = condition
 
     def token_literal(self):
-        return self.token.Literal
+        return "if"
 
     def __str__(self):
         return f"if {self.condition} {self.true_branch} else {self.false_branch}"
 
     def __eq__(self, other):
-        return self.token.Literal == other.token.Literal and self.true_branch == other.true_branch and self.false_branch == other.false_branch and self.condition == other.condition
+        return isinstance(other, IfExpression) and self.true_branch == other.true_branch and self.false_branch == other.false_branch and self.condition == other.condition
 
 
 class FunctionLiteral(Expression):
-    def __init__(self, token: Token, parameters: Optional[List[Identifier]] = None, body: Optional[BlockStatement] = None):
+    __slots__ = ("parameters", "body")
 
-        self.token = token
+    def __init__(self, token: Token, parameters: Optional[List[Identifier]] = None, body: Optional[BlockStatement] = None):
+        super().__init__()
         self.parameters = parameters
         self.body = body
 
     def token_literal(self):
-        return self.token.Literal
+        return "function"
 
     def __str__(self):
         params = ", ".join(str(param) for param in self.parameters)
@@ -251,13 +301,15 @@ class FunctionLiteral(Expression):
 
 
 class CallExpression(Expression):
+    __slots__ = ("function", "parameters")
+
     def __init__(self, token: Token, function: Optional[Expression] = None, parameters: Optional[List[Expression]] = None):
-        self.token = token
+        super().__init__()
         self.function = function
         self.parameters = parameters
 
     def token_literal(self):
-        return self.token.token_literal()
+        return "("
 
     def __str__(self):
         params = ", ".join(str(param) for param in self.parameters)
@@ -265,12 +317,14 @@ class CallExpression(Expression):
 
 
 class ArrayExpression(Expression):
+    __slots__ = ("elements",)
+
     def __init__(self, token: Token, elements: Optional[List[Expression]] = None):
-        self.token = token
+        super().__init__()
         self.elements = elements
 
     def token_literal(self):
-        return self.token.Literal
+        return "["
 
     def __str__(self):
         elements_str = ", ".join(str(element) for element in self.elements)
@@ -278,45 +332,50 @@ class ArrayExpression(Expression):
 
 
 class IndexExpression(Expression):
+    __slots__ = ("left", "index")
+
     def __init__(self, token: Token, left: Optional[Expression] = None, index: Optional[Expression] = None):
-        self.token = token
+        super().__init__()
         self.left = left
         self.index = index
 
     def token_literal(self):
-        return self.token.Literal
+        return "["
 
     def __str__(self):
         return f"({self.left}[{self.index}])"
 
     def __eq__(self, other):
-        return self.token.Literal == other.token.Literal and self.left == other.left and self.index == other.index
+        return isinstance(other, IndexExpression) and self.left == other.left and self.index == other.index
 
 
 class HashLiteral(Expression):
-    def __init__(self, token: Token, pairs: Optional[Dict[Expression, Expression]] = None, raw_keys: Optional[List[Expression]] = None, raw_values: Optional[List[Expression]] = None):
-        self.token = token
-        self.pairs = pairs
+    __slots__ = ("raw_keys", "raw_values")
+
+    def __init__(self, token: Token, raw_keys: Optional[List[Expression]] = None, raw_values: Optional[List[Expression]] = None):
+        super().__init__()
         self.raw_keys = raw_keys
         self.raw_values = raw_values
 
     def token_literal(self):
-        return self.token.Literal
+        return "{"
 
     def __str__(self):
         pairs_str = ", ".join(f"{key}: {value}" for key,
-                              value in self.pairs.items())
+                              value in zip(self.raw_keys, self.raw_values))
         return f"{{{pairs_str}}}"
 
 
 class Macro(Expression):
+    __slots__ = ("parameters", "body")
+
     def __init__(self, token: Token, parameters: Optional[List[Identifier]] = None, body: Optional[BlockStatement] = None):
-        self.token = token
+        super().__init__()
         self.parameters = parameters
         self.body = body
 
     def token_literal(self):
-        return self.token.Literal
+        return "macro"
 
     def __str__(self):
         params = ", ".join(str(param) for param in self.parameters)
@@ -1,7 +1,11 @@
 import time
+from types import GeneratorType
 from typing import List
 from lexer.lexer import Lexer, TokenTypes, Token
-from .node import ArrayExpression, BlockStatement, BooleanLiteral, CallExpression, EmptyExpression, Expression, ExpressionStatement, FunctionLiteral, HashLiteral, Identifier, IfExpression, IndexExpression, InfixExpression, IntegerLiteral, LetStatement, Macro, PreFixExpression, Program, ReturnStatement, StringLiteral
+from lexer.stream import StreamLexer
+from lexer.token_buffer import TokenBuffer
+from .node import EMPTY_LIST, ArrayExpression, BlockStatement, BooleanLiteral, CallExpression, EmptyExpression, Expression, ExpressionStatement, FunctionLiteral, HashLiteral, Identifier, IfExpression, IndexExpression, InfixExpression, IntegerLiteral, LetStatement, Macro, PreFixExpression, Program, ReturnStatement, StringLiteral
+from .trampoline import run
 from enum import Enum, IntEnum
 
 # 优先级
@@ -43,13 +47,22 @@ class ParseException(Exception):
 # parse_expression {expression contains prefix expression,identifier,integer...}
 # -> try parse_prefix_expression first{contain:integer,identifier,and bang! or others}
 #
+# the parse functions of nodes containing other expressions or statements are
+# generators (see trampoline.py): where they need a sub expression they yield
+# self.expression(priority), or self.statement(), and get the node back.
+# parse_expression and parse_statement run them on an explicit stack, so
+# generated code may nest deeper than the python recursion limit
 
 
 class Parser:
-    def __init__(self, lexer: Lexer):
+    def __init__(self, lexer: Lexer | TokenBuffer | StreamLexer):
+        # tokens come from lexer.next_token(), a Lexer, TokenBuffer or StreamLexer
         self.lexer = lexer
         self.current_token: Token = Token(TokenTypes.ILLEGAL, "")
         self.next_token: Token = Token(TokenTypes.ILLEGAL, "")
+        # source spans of the two tokens, see lexer.token_start
+        self.current_start = self.current_end = 0
+        self.next_start = self.next_end = 0
         self.errors: List[ParseException] = []
         self.advance_token()
         self.advance_token()
@@ -92,7 +105,16 @@ class Parser:
 
     def advance_token(self):
         self.current_token = self.next_token
+        self.current_start, self.current_end = self.next_start, self.next_end
         self.next_token = self.lexer.next_token()
+        self.next_start, self.next_end = self.lexer.token_start, self.lexer.token_end
+
+    def spanned(self, node, start: int):
+        # node covers the source from start to the end of the current token
+        if node is not None:
+            node.start = start
+            node.end = self.current_end
+        return node
 
     def peek_token(self):
         return self.next_token
@@ -133,23 +155,33 @@ class Parser:
 
     def parse_program(self) -> Program:
         root_program = Program()
+        root_program.statements.extend(self.parse_statements())
+        return root_program
+
+    def parse_statements(self):
+        # the top level statements one at a time, each one as soon as it is
+        # parsed, so it can run before the rest of the source is read
         while True:
             if self.current_token.TokenType == TokenTypes.EOF:
                 break
             statement = self.parse_statement()
             if statement is not None:
-                root_program.statements.append(statement)
+                yield statement
             #  this sentence will help us skip the semicolon
             self.advance_token()
-        return root_program
 
     def parse_statement(self):
-        try:
-            #  check if the statement is  let state ment ? return statement?
-            return self.token_to_node_map[self.current_token.TokenType]()
-        except KeyError:
+        return run(self.statement())
+
+    def statement(self):
+        start = self.current_start
+        #  check if the statement is  let state ment ? return statement?
+        parse_function = self.token_to_node_map.get(
+            self.current_token.TokenType)
+        if parse_function is None:
             #  if not,then it is expression statement.(we will add other statement like if while later)
-            return self.parse_expression_statement()
+            parse_function = self.parse_expression_statement
+        return self.spanned((yield parse_function()), start)
 
     def parse_let_statement(self):
         self.cur_expect_token(TokenTypes.LET)
@@ -157,25 +189,25 @@ class Parser:
         if not self.peek_expect_token(TokenTypes.IDENT):
             return None
         self.advance_token()
-        identifier_token = self.current_token
+        identifier = self.spanned(Identifier(self.current_token), self.current_start)
         if not self.peek_expect_token(TokenTypes.ASSIGN):
             return None
         self.advance_token()
         # now current token is =
         self.advance_token()
         # now current token is the start of the exp
-        expression = self.parse_expression(Priority.LOWEST)
+        expression = yield self.expression(Priority.LOWEST)
         if self.next_token.TokenType == TokenTypes.SEMICOLON:
             self.advance_token()
         # now cur token is the ";"
-        return LetStatement(let_token, Identifier(identifier_token), expression)
+        return LetStatement(let_token, identifier, expression)
 
     def parse_return_statement(self):
         self.cur_expect_token(TokenTypes.RETURN)
         return_token = self.current_token
         self.advance_token()
         if self.current_token.TokenType != TokenTypes.SEMICOLON and self.current_token.TokenType != TokenTypes.EOF:
-            expression = self.parse_expression(Priority.LOWEST)
+            expression = yield self.expression(Priority.LOWEST)
 
         else:
             expression = EmptyExpression()
@@ -185,7 +217,7 @@ class Parser:
 
     def parse_expression_statement(self):
         expression = ExpressionStatement(self.current_token, None)
-        expression.expression = self.parse_expression(Priority.LOWEST)
+        expression.expression = yield self.expression(Priority.LOWEST)
         # in normal case we should advance here,so that the parse_program will skip the semicolon
         # only advance if next is ";",this is for repl's sake.
         if self.peek_token().TokenType == TokenTypes.SEMICOLON:
@@ -199,6 +231,9 @@ class Parser:
     # this is diff from parse statement!
 
     def parse_expression(self, priority: Priority):
+        return run(self.expression(priority))
+
+    def expression(self, priority: Priority):
         # i dont like the description in the book about here
         # maybe my explanation will help?
         # priority means the expression being constructed's level.
@@ -209,16 +244,21 @@ class Parser:
         # ,until the final right node is finished
         try:
 
+            start = self.current_start
             prefix_parse_function = self.prefix_parse_functions[self.current_token.TokenType]
             left_expression = prefix_parse_function()
+            if isinstance(left_expression, GeneratorType):
+                left_expression = yield left_expression
+            self.spanned(left_expression, start)
 
             while self.peek_token().TokenType != TokenTypes.SEMICOLON and priority < self.peek_token_priority():
                 self.advance_token()
 
                 # TODO: NO INFIX HANDLE
 
-                left_expression = self.infix_parse_functions[self.current_token.TokenType](
+                left_expression = yield self.infix_parse_functions[self.current_token.TokenType](
                     left=left_expression)
+                self.spanned(left_expression, start)
 
             return left_expression
         except KeyError:
@@ -236,7 +276,7 @@ class Parser:
         return StringLiteral(self.current_token)
 
     def parse_identifier(self):
-        return Identifier(self.current_token)
+        return self.spanned(Identifier(self.current_token), self.current_start)
 
     def parse_boolean(self):
         return BooleanLiteral(self.current_token)
@@ -244,7 +284,7 @@ class Parser:
     def parse_prefix(self):
         expression = PreFixExpression(operator=self.current_token)
         self.advance_token()
-        expression.right = self.parse_expression(Priority.PREFIX)
+        expression.right = yield self.expression(Priority.PREFIX)
         return expression
     # attention:we have a argument left here
 
@@ -254,7 +294,7 @@ class Parser:
             left=left, operator=self.current_token, right=EmptyExpression())
         temp_priority = self.current_token_priority()
         self.advance_token()
-        expression.right = self.parse_expression(temp_priority)
+        expression.right = yield self.expression(temp_priority)
 
         return expression
 
@@ -263,7 +303,7 @@ class Parser:
         # this is not safe
         if self.current_token.TokenType == TokenTypes.RPAREN:
             return None
-        expression = self.parse_expression(Priority.LOWEST)
+        expression = yield self.expression(Priority.LOWEST)
         if not self.peek_expect_token(TokenTypes.RPAREN):
             return None
         self.advance_token()
@@ -271,17 +311,20 @@ class Parser:
         return expression
 
     def parse_block_statement(self, not_consume_last=True):
+        start = self.current_start
         block_statement = BlockStatement(self.current_token)
         if not self.cur_expect_token_advance(TokenTypes.LBRACE):
             return None
         while True:
             if self.current_token.TokenType == TokenTypes.RBRACE:
                 break
-            statement = self.parse_statement()
+            statement = yield self.statement()
             if statement is not None:
                 block_statement.statements.append(statement)
             #  this sentence will help us skip the semicolon
             self.advance_token()
+        # the block ends at its }
+        self.spanned(block_statement, start)
         # consume  }
         if not not_consume_last:
             if not self.cur_expect_token_advance(TokenTypes.RBRACE):
@@ -297,14 +340,14 @@ class Parser:
             return None
 
         # parse condition
-        if_expression.condition = self.parse_expression(Priority.LOWEST)
+        if_expression.condition = yield self.expression(Priority.LOWEST)
         self.advance_token()
         # consume )
         if not self.cur_expect_token_advance(TokenTypes.RPAREN):
             return None
 
         # we dont need consume the { }manually,parseblock will do the work
-        if_expression.true_branch = self.parse_block_statement(
+        if_expression.true_branch = yield self.parse_block_statement(
             not_consume_last=True)
         if not self.cur_expect_token(TokenTypes.RBRACE):
             return None
@@ -315,7 +358,7 @@ class Parser:
             # now is {
             if not self.peek_expect_token_advance(TokenTypes.LBRACE):
                 return None
-            if_expression.false_branch = self.parse_block_statement(
+            if_expression.false_branch = yield self.parse_block_statement(
                 not_consume_last=True)
             if not self.cur_expect_token(TokenTypes.RBRACE):
                 return None
@@ -328,14 +371,14 @@ class Parser:
         while True:
             if self.current_token.TokenType == TokenTypes.RBRACKET:
                 break
-            array_exp.append(self.parse_expression(Priority.LOWEST))
+            array_exp.append((yield self.expression(Priority.LOWEST)))
             self.advance_token()
             if self.current_token.TokenType == TokenTypes.RBRACKET:
                 break
 
             if self.cur_expect_token(TokenTypes.COMMA):
                 self.advance_token()
-        array_literal.elements = array_exp
+        array_literal.elements = array_exp or EMPTY_LIST
         return array_literal
 
     def parse_function_literal(self):
@@ -359,9 +402,9 @@ class Parser:
         # consume )
         if not self.cur_expect_token_advance(TokenTypes.RPAREN):
             return None
-        function_literal.body = self.parse_block_statement(
+        function_literal.body = yield self.parse_block_statement(
             not_consume_last=True)
-        function_literal.parameters = Identifier_list
+        function_literal.parameters = Identifier_list or EMPTY_LIST
 
         return function_literal
 
@@ -386,9 +429,9 @@ class Parser:
         # consume )
         if not self.cur_expect_token_advance(TokenTypes.RPAREN):
             return None
-        macro_literal.body = self.parse_block_statement(
+        macro_literal.body = yield self.parse_block_statement(
             not_consume_last=True)
-        macro_literal.parameters = Identifier_list
+        macro_literal.parameters = Identifier_list or EMPTY_LIST
 
         return macro_literal
 
@@ -397,7 +440,7 @@ class Parser:
         self.advance_token()
         index_exp.left = left
         if self.current_token.TokenType != TokenTypes.RBRACKET:
-            index_exp.index = self.parse_expression(Priority.LOWEST)
+            index_exp.index = yield self.expression(Priority.LOWEST)
             self.advance_token()
         else:
             index_exp.index = None
@@ -414,13 +457,13 @@ class Parser:
         Expression_list = []
         while self.current_token.TokenType != TokenTypes.RPAREN:
 
-            Expression_list.append(self.parse_expression(Priority.LOWEST))
+            Expression_list.append((yield self.expression(Priority.LOWEST)))
             self.advance_token()
             if self.current_token.TokenType != TokenTypes.RPAREN:
                 if not self.cur_expect_token_advance(TokenTypes.COMMA):
                     return None
         callexpression.function = left
-        callexpression.parameters = Expression_list
+        callexpression.parameters = Expression_list or EMPTY_LIST
         return callexpression
 
     def parse_hash_literal(self):
@@ -429,19 +472,19 @@ class Parser:
         value = []
         self.advance_token()
         while self.current_token.TokenType != TokenTypes.RBRACE:
-            k = self.parse_expression(Priority.LOWEST)
+            k = yield self.expression(Priority.LOWEST)
             self.advance_token()
             if not self.cur_expect_token_advance(TokenTypes.COLON):
                 return None
-            v = self.parse_expression(Priority.LOWEST)
+            v = yield self.expression(Priority.LOWEST)
             self.advance_token()
             key.append(k)
             value.append(v)
             if self.current_token.TokenType != TokenTypes.RBRACE:
                 if not self.cur_expect_token_advance(TokenTypes.COMMA):
                     return None
-        hash_literal.raw_keys = key
-        hash_literal.raw_values = value
+        hash_literal.raw_keys = key or EMPTY_LIST
+        hash_literal.raw_values = value or EMPTY_LIST
         if not self.cur_expect_token(TokenTypes.RBRACE):
             return None
         return hash_literal
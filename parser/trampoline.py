@@ -0,0 +1,36 @@
+from typing import Any, Generator, List
+
+# recursion on an explicit stack. a task is a generator that, where a
+# recursive function would call itself, yields the generator of the sub task
+# instead and gets its result back from the yield. run() keeps the suspended
+# tasks in a list, so the nesting depth is bounded by memory and not by
+# sys.getrecursionlimit(). an exception leaving a task is thrown into the
+# task that waits for it, as if the call had been a plain one
+
+Task = Generator[Any, Any, Any]
+
+
+def run(task: Task) -> Any:
+    stack: List[Task] = [task]
+    result = None
+    error = None
+    while True:
+        try:
+            if error is not None:
+                sub_task = stack[-1].throw(error)
+            else:
+                sub_task = stack[-1].send(result)
+        except StopIteration as stop:
+            result, error = stop.value, None
+            stack.pop()
+            if not stack:
+                return result
+            continue
+        except Exception as e:
+            error = e
+            stack.pop()
+            if not stack:
+                raise
+            continue
+        stack.append(sub_task)
+        result, error = None, None
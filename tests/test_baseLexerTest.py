@@ -221,5 +221,32 @@ class BaseLexerTest(unittest.TestCase):
         ])
 
 
+    def test_token_boundaries(self):
+        code = 'x1 12ab letx let>=<= a!=b=="s 1\n'
+        lexer = Lexer(code)
+        tokens = []
+        while True:
+            tokens.append(lexer.next_token())
+            if tokens[-1].TokenType == TokenTypes.EOF:
+                break
+        self.assertEqual(tokens, [
+            Token(TokenTypes.IDENT, "x1"),
+            Token(TokenTypes.INT, "12"),
+            Token(TokenTypes.IDENT, "ab"),
+            Token(TokenTypes.IDENT, "letx"),
+            Token(TokenTypes.LET, "let"),
+            Token(TokenTypes.GTE, ">="),
+            Token(TokenTypes.LTE, "<="),
+            Token(TokenTypes.IDENT, "a"),
+            Token(TokenTypes.NOT_EQ, "!="),
+            Token(TokenTypes.IDENT, "b"),
+            Token(TokenTypes.EQ, "=="),
+            # a string without its closing quote ends with the text
+            Token(TokenTypes.STRING, "s 1\n"),
+            Token(TokenTypes.EOF, ""),
+        ])
+        self.assertEqual(lexer.next_token(), Token(TokenTypes.EOF, ""))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,118 @@
+import gc
+import unittest
+
+from eval.closure_eval import ClosureFunction, _body_codes, closureEval
+from eval.env import Environment
+from eval.eval import ycEval
+from eval.resolver import Scope, declared_names
+from lexer.lexer import Lexer
+from lexer.token import Token, TokenTypes
+from parser.node import Identifier
+from parser.parser import Parser
+
+
+def parse(code: str):
+    return Parser(Lexer(code)).parse_program()
+
+
+class TestClosureEval(unittest.TestCase):
+    def test_same_as_ycEval(self):
+        code = [
+            "5 + 5 * 2 - 10 / 2",
+            "-5 + 10; !true; !!5",
+            '"Hello" + " " + "World"',
+            "1 < 2 == true; 3 >= 3; 1 != 1",
+            "if (1 > 2) { 10 } else { 20 }",
+            "if (false) { 10 }",
+            "let a = 5; let b = a * 2; b + a",
+            "let f = function(x) { return x * 2; 99 }; f(3)",
+            "let f = function(x) { if (x > 1) { return 1; }; 2 }; [f(5), f(0)]",
+            "if (10 > 1) { if (10 > 1) { return 10; } return 1; }",
+            "let add = function(a) { function(b) { a + b } }; add(2)(3)",
+            "let fib = function(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(10)",
+            "let a = [1, 2, 3]; [a[0], a[-1], len(a), first(rest(a)), last(push(a, 4))]",
+            '{"one": 1, true: 2, 3: 3}',
+            'let key = "b"; {"a": 1, "b": 2}[key]',
+            '{"a": 1}["b"]',
+            "[1, 2][5]",
+            "5 + true; 5",
+            "-true",
+            "foobar",
+            "let a = 1; let a = 2;",
+            "let f = function(x) { x }; f(1, 2)",
+            "quote(1 + unquote(2 + 3))",
+            "let f = function(x) { quote(unquote(x) + 1) }; f(2)",
+            "let a = 1; let f = function() { let b = a + 1; let a = 10; a + b }; f()",
+            "let f = function(x) { if (x > 0) { let y = 2; } ; let y = 3; y }; f(1)",
+            "let f = function(x, x) { x }; f(1, 2)",
+            "let f = function(a) { function(b) { function(c) { let d = a + b; d * c } } }; f(1)(2)(3)",
+            "let counter = function(n) { if (n == 0) { 0 } else { let m = n - 1; 1 + counter(m) } }; counter(20)",
+        ]
+        for test_code in code:
+            self.assertEqual(closureEval(parse(test_code), Environment()).inspect(),
+                             ycEval(parse(test_code), Environment()).inspect(),
+                             msg=f" testcode {test_code}")
+
+    def test_functions_are_shared(self):
+        env = Environment()
+        closureEval(parse("let double = function(x) { x * 2 };"), env)
+        self.assertIsInstance(env.variables["double"], ClosureFunction)
+        self.assertEqual(ycEval(parse("double(21)"), env).inspect(), 42)
+        ycEval(parse("let triple = function(x) { return x * 3; };"), env)
+        self.assertEqual(closureEval(parse("triple(double(7))"), env).inspect(), 42)
+
+    def test_tail_calls(self):
+        code = [
+            ["let countdown = function(n) { if (n == 0) { return 0; }; countdown(n - 1) }; countdown(100000)", 0],
+            ["let sum = function(n, acc) { if (n == 0) { acc } else { return sum(n - 1, acc + n); } }; sum(100000, 0)", 5000050000],
+            ["let even = function(n) { if (n == 0) { true } else { odd(n - 1) } }; let odd = function(n) { if (n == 0) { false } else { even(n - 1) } }; even(100001)", False],
+            ["let f = function(n) { n }; let g = function(n) { f(n, n) }; g(1)", "wrong number of arguments: expected 1, got 2"],
+            ["let f = function(n) { n }; f(1)", 1],
+        ]
+        for test_code, result in code:
+            self.assertEqual(closureEval(parse(test_code), Environment()).inspect(), result,
+                             msg=f" testcode {test_code}")
+
+    def test_body_codes_are_dropped(self):
+        # functions made by ycEval are compiled on their first closureEval
+        # call, the compiled body goes away with the AST
+        env = Environment()
+        ycEval(parse("let double = function(x) { x * 2 };"), env)
+        self.assertEqual(closureEval(parse("double(21)"), env).inspect(), 42)
+        body = id(env.variables["double"].body)
+        self.assertIn(body, _body_codes)
+        del env
+        gc.collect()
+        self.assertNotIn(body, _body_codes)
+
+    def test_deep_trees(self):
+        # deeper than compileNode can recurse, these run on ycEval
+        depth = 5000
+        code = [
+            [" + ".join(["1"] * depth), depth],
+            ["[" * depth + "1" + "]" * depth + "[0]" * depth, 1],
+            ["let f = function(x) { x }; " + "f(" * depth + "2" + ")" * depth, 2],
+        ]
+        for test_code, result in code:
+            self.assertEqual(closureEval(parse(test_code), Environment()).inspect(), result,
+                             msg=f" testcode {test_code[:40]}")
+
+    def test_resolver(self):
+        program = parse("function(a, b) { let c = a; if (b) { let d = 1; }; function(e) { let f = e; a + f } }")
+        function = program.statements[0].expression
+        scope = Scope.of_function(function.parameters, function.body, None)
+        self.assertEqual(scope.index, {"a": 0, "b": 1, "c": 2, "d": 3})
+        inner = Scope.of_function([Identifier(Token(TokenTypes.IDENT, "e"))], None, scope)
+        self.assertEqual(inner.resolve("e"), (0, 0))
+        self.assertEqual(inner.resolve("d"), (1, 3))
+        self.assertIsNone(inner.resolve("len"))
+        self.assertEqual(inner.depth(), 2)
+        self.assertEqual(declared_names(function.body), ["c", "d"])
+
+    def test_runtime_error(self):
+        self.assertEqual(closureEval(parse("1 / 0"), Environment()).type(),
+                         ycEval(parse("1 / 0"), Environment()).type())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,8 @@
 import unittest
 
 from eval.env import Environment
-from eval.eval import ycEval
-from eval.object import Boolean, HashAble, HashKey, Integer, String
+from eval.eval import evalStatements, ycEval
+from eval.object import FALSE, NULL, TRUE, Array, Boolean, Hash, HashAble, Integer, String, configure_small_ints, make_integer
 from lexer.lexer import Lexer
 from parser.parser import Parser
 from tests.testUtills import test_integer
@@ -280,6 +280,14 @@ class TestEval(unittest.TestCase):
                 "[1, 2, 3][-1]",
                 3,
             ],
+            [
+                "let a = [1, 2]; let b = push(a, 3); [len(a), len(b), b[2]]",
+                [2, 3, 3],
+            ],
+            [
+                "let a = [1, 2, 3]; let b = rest(a); push(b, 4); [first(a), first(b), len(b)]",
+                [1, 2, 2],
+            ],
 
 
         ]
@@ -291,20 +299,22 @@ class TestEval(unittest.TestCase):
                              msg=f" testcode {test_code}")
 
     def test_hash(self):
-        hashkey1 = HashKey("key1", "123")
-        hashkey2 = HashKey("key2", "456")
-        hashkey3 = HashKey("key1", "123")
-        hashkey4 = HashKey("key1", 123)
-        hashkey5 = HashKey("key1", True)
-        hashkey6 = HashKey("key1", False)
-        self.assertEqual(hashkey1, hashkey3)
-        self.assertNotEqual(hashkey1, hashkey2)
-        self.assertNotEqual(hashkey1, hashkey4)
-        self.assertNotEqual(hashkey1, hashkey5)
-        self.assertNotEqual(hashkey1, hashkey6)
+        self.assertEqual(String("123").hash_key(), String("123").hash_key())
+        self.assertNotEqual(String("123").hash_key(), String("456").hash_key())
+        self.assertNotEqual(String("123").hash_key(), Integer(123).hash_key())
+        self.assertNotEqual(Integer(1).hash_key(), TRUE.hash_key())
+        self.assertNotEqual(Integer(0).hash_key(), FALSE.hash_key())
+        self.assertEqual(Boolean(True).hash_key(), TRUE.hash_key())
         self.assertIsInstance(Integer(1), HashAble)
         self.assertIsInstance(String("123"), HashAble)
         self.assertIsInstance(Boolean(True), HashAble)
+        hash_obj = Hash({})
+        for key, value in [(Integer(1), Integer(10)), (TRUE, Integer(20)), (String("1"), Integer(30))]:
+            hash_obj.pairs[key.hash_key()] = (key, value)
+        self.assertEqual(hash_obj[make_integer(1)], Integer(10))
+        self.assertEqual(hash_obj[TRUE], Integer(20))
+        self.assertEqual(hash_obj[String("1")], Integer(30))
+        self.assertIsNone(hash_obj.get(FALSE))
 
     def test_hash_use(self):
         code = """
@@ -324,6 +334,8 @@ class TestEval(unittest.TestCase):
         program = parser.parse_program()
         self.assertEqual(ycEval(program, Environment()).inspect(), {
                          "one": 1, "two": 2, "three": 3, 4: 4, True: 5, False: 6})
+        self.assertEqual(list(ycEval(program, Environment()).inspect()), [
+                         "one", "two", "three", 4, True, False])
 
     def test_hash_use_2(self):
         code = [[
@@ -360,3 +372,72 @@ class TestEval(unittest.TestCase):
             program = parser.parse_program()
             self.assertEqual(ycEval(program, Environment()).inspect(), result,
                              msg=f" testcode {test_code}")
+
+    def test_tail_calls(self):
+        code = [
+            ["let countdown = function(n) { if (n == 0) { return 0; }; countdown(n - 1) }; countdown(5000)", 0],
+            ["let sum = function(n, acc) { if (n == 0) { acc } else { return sum(n - 1, acc + n); } }; sum(5000, 0)", 12502500],
+            ["let even = function(n) { if (n == 0) { true } else { odd(n - 1) } }; let odd = function(n) { if (n == 0) { false } else { even(n - 1) } }; even(5001)", False],
+            ["let f = function(n) { if (n > 0) { return len([n]); }; 0 }; f(3)", 1],
+            ["let f = function(n) { n }; let g = function(n) { f(n, n) }; g(1)", "wrong number of arguments: expected 1, got 2"],
+        ]
+        for test_code, result in code:
+            program = Parser(Lexer(test_code)).parse_program()
+            self.assertEqual(ycEval(program, Environment()).inspect(), result,
+                             msg=f" testcode {test_code}")
+
+    def test_deep_nesting(self):
+        # trees deeper than the python recursion limit
+        depth = 5000
+        code = [
+            [" + ".join(["1"] * depth), depth],
+            ["[" * depth + "1" + "]" * depth + "[0]" * depth, 1],
+            ["{1: " * depth + "2" + "}" * depth + "[1]" * depth, 2],
+            ["-" * depth + "1", 1],
+            ["let f = function(x) { x }; " + "f(" * depth + "7" + ")" * depth, 7],
+            ["let f = function(n) { if (n == 0) { 0 } else { 1 + f(n - 1) } }; f(" + str(depth) + ")", depth],
+        ]
+        for test_code, result in code:
+            program = Parser(Lexer(test_code)).parse_program()
+            self.assertEqual(ycEval(program, Environment()).inspect(), result,
+                             msg=f" testcode {test_code[:40]}")
+
+    def test_statement_stream(self):
+        code = "let a = 2; a * 3; let b = a + 1; [a, b]; c; a"
+        lexer = Lexer(code)
+        results = evalStatements(Parser(lexer).parse_statements(), Environment())
+        self.assertEqual(next(results).inspect(), "Null")
+        self.assertEqual(next(results).inspect(), 6)
+        # the rest of the source is not lexed yet
+        self.assertLess(lexer.position, len(code) - 10)
+        self.assertEqual([result.inspect() for result in results],
+                         ["Null", [2, 3], "identifier not found:c"])
+
+    def test_canonical_values(self):
+        code = [
+            ["1 + 1", make_integer(2)],
+            ["10 / 5 - 2", make_integer(0)],
+            ["-5", make_integer(-5)],
+            ["1 < 2", TRUE],
+            ["1 == 2", FALSE],
+            ["first([])", NULL],
+            ["len([1, 2])", make_integer(2)],
+        ]
+        for test_code, result in code:
+            program = Parser(Lexer(test_code)).parse_program()
+            self.assertIs(ycEval(program, Environment()), result,
+                          msg=f" testcode {test_code}")
+        self.assertIsNot(make_integer(1000), make_integer(1000))
+        try:
+            configure_small_ints(-10, 1000)
+            self.assertIs(make_integer(1000), make_integer(1000))
+            self.assertIs(make_integer(-10), make_integer(-10))
+        finally:
+            configure_small_ints(-5, 256)
+
+    def test_objects_have_no_dict(self):
+        objects = [Integer(1), String("a"), TRUE, NULL, Array([]), Hash({})]
+        for obj in objects:
+            self.assertFalse(hasattr(obj, "__dict__"), msg=type(obj).__name__)
+        with self.assertRaises(AttributeError):
+            Integer(1).other = 2
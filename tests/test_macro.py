@@ -109,6 +109,15 @@ class TestMacro(unittest.TestCase):
         self.assertEqual(
             modify(program.statements[0], change_one_to_two).expression, two)
 
+    def test_deep_modifier(self):
+        depth = 5000
+        program = Parser(Lexer(" + ".join(["1"] * depth))).parse_program()
+        node = modify(program, change_one_to_two).statements[0].expression
+        for _ in range(depth - 1):
+            self.assertEqual(node.right, two)
+            node = node.left
+        self.assertEqual(node, two)
+
     def test_infix_modifier(self):
         test_ast = InfixExpression(
             left=one, operator=Token(TokenTypes.PLUS, "+"), right=two)
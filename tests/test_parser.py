@@ -1,7 +1,8 @@
 
 import unittest
 from lexer.lexer import Lexer
-from parser.node import ArrayExpression, BlockStatement, BooleanLiteral, Expression, ExpressionStatement, HashLiteral, Identifier, IndexExpression, InfixExpression, IntegerLiteral, LetStatement, PreFixExpression, ReturnStatement, StringLiteral
+from lexer.token_buffer import TokenBuffer
+from parser.node import EMPTY_LIST, ArrayExpression, BlockStatement, BooleanLiteral, Expression, ExpressionStatement, HashLiteral, Identifier, IndexExpression, InfixExpression, IntegerLiteral, LetStatement, PreFixExpression, ReturnStatement, StringLiteral
 from parser.parser import Parser
 from tests.testUtills import print_if_error, test_call_expression, test_function_literal, test_hash_literal, test_if_expression, test_let_statement, test_macro_literal
 
@@ -510,6 +511,56 @@ class TestParser(unittest.TestCase):
         program = parser.parse_program()
         test_macro_literal(self, program.statements[0].expression, [], [])
 
+    def test_deep_nesting(self):
+        # deeper than the python recursion limit
+        depth = 5000
+        code = "[" * depth + "-(" * depth + "1" + ")" * depth + "]" * depth
+        parser = Parser(Lexer(code))
+        program = parser.parse_program()
+        print_if_error(self, parser)
+        node = program.statements[0].expression
+        for _ in range(depth):
+            self.assertIsInstance(node, ArrayExpression)
+            node = node.elements[0]
+        for _ in range(depth):
+            self.assertIsInstance(node, PreFixExpression)
+            node = node.right
+        self.assertIsInstance(node, IntegerLiteral)
+        self.assertEqual(node.value, 1)
+
+        program = Parser(Lexer(" + ".join(["1"] * depth))).parse_program()
+        node = program.statements[0].expression
+        for _ in range(depth - 1):
+            self.assertIsInstance(node, InfixExpression)
+            node = node.left
+        self.assertIsInstance(node, IntegerLiteral)
+        self.assertEqual(node.value, 1)
+
+
+    def test_compact_nodes(self):
+        program = Parser(Lexer("f(); [x, -1]")).parse_program()
+        call = program.statements[0].expression
+        array = program.statements[1].expression
+        for node in (call, call.function, array, array.elements[0], array.elements[1]):
+            self.assertFalse(hasattr(node, "__dict__"), msg=type(node))
+        self.assertIs(call.parameters, EMPTY_LIST)
+        self.assertEqual(array.elements[1].token.Literal, "-")
+
+    def test_node_spans(self):
+        code = 'let x = 1;\nlet f = function(a) {\n  a * (2 + x)\n};\nf("s")'
+        buffer = TokenBuffer(code)
+        program = Parser(buffer).parse_program()
+        let_x, let_f, call = program.statements
+        self.assertEqual(code[let_x.start:let_x.end], "let x = 1;")
+        self.assertEqual(code[let_x.identifier.start:let_x.identifier.end], "x")
+        function = let_f.right_expression
+        self.assertEqual(code[function.start:function.end], "function(a) {\n  a * (2 + x)\n}")
+        self.assertEqual(buffer.line_column(function.body.start), (2, 21))
+        infix = function.body.statements[0].expression
+        self.assertEqual(code[infix.start:infix.end], "a * (2 + x)")
+        self.assertEqual(buffer.line_column(infix.right.start), (3, 7))
+        self.assertEqual(buffer.line_column(call.expression.end), (5, 7))
+
 
 if __name__ == '__main__':
 
@@ -0,0 +1,39 @@
+import unittest
+
+from eval.pvector import PVector
+
+
+class TestPVector(unittest.TestCase):
+    def test_append(self):
+        for n in [0, 1, 32, 33, 1024 + 32, 1024 + 33, 40000]:
+            vector = PVector()
+            for i in range(n):
+                vector = vector.append(i)
+            self.assertEqual(len(vector), n)
+            self.assertEqual(list(vector), list(range(n)), msg=f"n={n}")
+            self.assertTrue(all(vector[i] == i for i in range(n)), msg=f"n={n}")
+            self.assertEqual(vector, PVector.from_iterable(range(n)))
+
+    def test_persistent(self):
+        vector = PVector.from_iterable(range(100))
+        pushed = vector.append(100)
+        rest = vector.rest()
+        self.assertEqual(list(vector), list(range(100)))
+        self.assertEqual(list(pushed), list(range(101)))
+        self.assertEqual(list(rest), list(range(1, 100)))
+        self.assertEqual(list(rest.append(100)), list(range(1, 101)))
+
+    def test_rest(self):
+        vector = PVector.from_iterable(range(70))
+        for i in range(70):
+            self.assertEqual(vector[0], i)
+            self.assertEqual(vector[-1], 69)
+            self.assertEqual(list(vector), list(range(i, 70)))
+            vector = vector.rest()
+        self.assertEqual(len(vector), 0)
+        with self.assertRaises(IndexError):
+            vector[0]
+
+
+if __name__ == '__main__':
+    unittest.main()
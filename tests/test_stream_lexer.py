@@ -0,0 +1,72 @@
+import io
+import mmap
+import os
+import tempfile
+import unittest
+
+from eval.env import Environment
+from eval.eval import ycEval
+from lexer.lexer import Lexer
+from lexer.stream import StreamLexer
+from lexer.token import TokenTypes
+from parser.parser import Parser
+
+
+def read_all(lexer):
+    tokens = []
+    while True:
+        tokens.append(lexer.next_token())
+        if tokens[-1].TokenType == TokenTypes.EOF:
+            return tokens
+
+
+CODES = [
+    "",
+    "  \n\t",
+    'let add = function(x, y) { x + y; }; add(1, 22) >= 3 != !true',
+    '{"key": [1, 2], "": false}["key"][0] <= -5 / 2 * x_1 == y',
+    'let s = "héllo €"; s + "😀" # é € 😀 if macro',
+    'return "not closed',
+]
+
+
+class TestStreamLexer(unittest.TestCase):
+    def test_same_tokens_as_lexer(self):
+        # the smaller the chunks, the more tokens are cut in two
+        for code in CODES:
+            expected = read_all(Lexer(code))
+            for chunk_size in (1, 2, 3, 7, 4096):
+                for source in (code.encode(), memoryview(code.encode()), io.BytesIO(code.encode())):
+                    self.assertEqual(read_all(StreamLexer(source, chunk_size)), expected,
+                                     msg=f"{code} {chunk_size} {type(source)}")
+
+    def test_file_and_mmap(self):
+        code = '{"a": ' + ", ".join(str(i) for i in range(1000)) + '}'
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(code.encode())
+            expected = read_all(Lexer(code))
+            self.assertEqual(read_all(StreamLexer(path, 64)), expected)
+            with open(path, "rb") as file:
+                self.assertEqual(read_all(StreamLexer(file, 64)), expected)
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    self.assertEqual(read_all(StreamLexer(mapped, 64)), expected)
+        finally:
+            os.remove(path)
+
+    def test_long_token(self):
+        text = "x" * 100000
+        tokens = read_all(StreamLexer(('"' + text + '" 1').encode(), 16))
+        self.assertEqual([token.Literal for token in tokens], [text, "1", ""])
+
+    def test_parser_reads_stream(self):
+        code = "let f = function(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }; f(10)"
+        parser = Parser(StreamLexer(code.encode(), 8))
+        program = parser.parse_program()
+        self.assertEqual(parser.errors, [])
+        self.assertEqual(ycEval(program, Environment()).inspect(), 55)
+
+
+if __name__ == '__main__':
+    unittest.main()
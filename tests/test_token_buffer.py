@@ -0,0 +1,64 @@
+import unittest
+
+from eval.env import Environment
+from eval.eval import ycEval
+from lexer.lexer import Lexer
+from lexer.token import Token, TokenTypes
+from lexer.token_buffer import TokenBuffer
+from parser.parser import Parser
+
+
+def read_all(lexer):
+    tokens = []
+    while True:
+        tokens.append(lexer.next_token())
+        if tokens[-1].TokenType == TokenTypes.EOF:
+            return tokens
+
+
+class TestTokenBuffer(unittest.TestCase):
+    def test_same_tokens_as_lexer(self):
+        codes = [
+            "",
+            "   \n",
+            'let add = function(x, y) { x + y; }; add(1, 22) >= 3 != !true',
+            '{"a": [1, 2], "": false}["a"][0] <= -5 / 2 * x_1',
+            'if (a == b) { return "open string } else macro # é',
+        ]
+        for code in codes:
+            self.assertEqual(read_all(TokenBuffer(code)), read_all(Lexer(code)),
+                             msg=code)
+
+    def test_columns(self):
+        buffer = TokenBuffer('let x = 10;\nlet s = "ab";\n\n  s')
+        self.assertEqual(len(buffer), 11)
+        self.assertEqual(buffer.kind(3), TokenTypes.INT)
+        self.assertEqual(buffer.span(3), (8, 10))
+        self.assertEqual(buffer.literal(3), "10")
+        # a string's literal is the part between the quotes
+        self.assertEqual(buffer.kind(8), TokenTypes.STRING)
+        self.assertEqual(buffer.literal(8), "ab")
+        self.assertEqual(buffer.token(6), Token(TokenTypes.IDENT, "s"))
+        self.assertEqual(buffer.token(len(buffer)), Token(TokenTypes.EOF, ""))
+        self.assertEqual(buffer.kinds.typecode, "i")
+
+    def test_line_column(self):
+        buffer = TokenBuffer('let x = 10;\nlet s = "ab";\n\n  s')
+        self.assertEqual(buffer.location(0), (1, 1))
+        self.assertEqual(buffer.location(3), (1, 9))
+        self.assertEqual(buffer.location(5), (2, 1))
+        self.assertEqual(buffer.location(8), (2, 10))
+        self.assertEqual(buffer.location(10), (4, 3))
+        self.assertEqual(buffer.line_column(11), (1, 12))
+        self.assertEqual(buffer.line_column(12), (2, 1))
+
+    def test_parser_reads_buffer(self):
+        code = "let f = function(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }; f(10)"
+        parser = Parser(TokenBuffer(code))
+        program = parser.parse_program()
+        self.assertEqual(parser.errors, [])
+        self.assertEqual(ycEval(program, Environment()).inspect(), 55)
+
+
+if __name__ == '__main__':
+    unittest.main()